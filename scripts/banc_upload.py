@@ -0,0 +1,163 @@
+"""Banc d'essai de l'upload résumable, contre un faux serveur YouTube local.
+
+Le serveur imite le protocole de Google : ouverture de session (POST, adresse
+rendue dans `Location`), morceaux envoyés en PUT avec `Content-Range`, 308
++ `Range` tant que le fichier n'est pas complet, interrogation
+`bytes */taille` pour savoir où en est une session, 404 pour une session
+inconnue. Trois scénarios, chacun dans une base temporaire :
+
+1. le processus meurt après deux morceaux, le suivant reprend la session ;
+2. la session a expiré entre-temps : envoi neuf depuis le début ;
+3. un 503 passager au milieu : nouvel essai dans la foulée.
+
+    python scripts/banc_upload.py
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import threading
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vortex import youtube_client            # noqa: E402
+from vortex.config import Config             # noqa: E402
+from vortex.db import Database, utcnow       # noqa: E402
+
+
+class FauxYouTube(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Gestionnaire)
+        self.sessions: dict[str, dict] = {}
+        self.octets_recus = 0
+        self.pannes_503 = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/upload/youtube/v3/videos"
+
+
+class _Gestionnaire(BaseHTTPRequestHandler):
+    server: FauxYouTube
+
+    def log_message(self, *_a):
+        pass
+
+    def _repondre(self, status: int, corps: bytes = b"", entetes: dict | None = None):
+        self.send_response(status)
+        for cle, valeur in (entetes or {}).items():
+            self.send_header(cle, valeur)
+        self.send_header("Content-Length", str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+    def do_POST(self):
+        corps = self.rfile.read(int(self.headers["Content-Length"]))
+        jeton = str(uuid.uuid4())
+        self.server.sessions[jeton] = {
+            "taille": int(self.headers["X-Upload-Content-Length"]),
+            "meta": json.loads(corps), "donnees": bytearray(),
+        }
+        self._repondre(200, entetes={"Location": f"{self.server.url}?upload_id={jeton}"})
+
+    def do_PUT(self):
+        corps = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        session = self.server.sessions.get(self.path.rsplit("upload_id=", 1)[-1])
+        if session is None:
+            return self._repondre(404, b'{"error": {"message": "session inconnue"}}')
+        if corps and self.server.pannes_503:
+            self.server.pannes_503 -= 1
+            return self._repondre(503, b'{"error": {"message": "indisponible"}}')
+        plage = re.match(r"bytes (\d+)-(\d+)/(\d+)", self.headers["Content-Range"])
+        if plage:
+            debut = int(plage.group(1))
+            if debut != len(session["donnees"]):
+                return self._repondre(400, b'{"error": {"message": "trou dans le fichier"}}')
+            session["donnees"] += corps
+            self.server.octets_recus += len(corps)
+        recu = len(session["donnees"])
+        if recu >= session["taille"]:
+            return self._repondre(200, json.dumps({"id": "faux" + str(recu)}).encode())
+        self._repondre(308, entetes={"Range": f"bytes=0-{recu - 1}"} if recu else {})
+
+
+class _Plantage(Exception):
+    """Simule la mort du processus entre deux morceaux."""
+
+
+def _scenario(nom: str, serveur: FauxYouTube, dossier: Path, *, plantage_apres: int = 0,
+              expirer: bool = False, pannes: int = 0) -> None:
+    cfg = Config(source_dir=dossier, tokkit_db=dossier / "absent.sqlite",
+                 data_dir=dossier / nom, client_secret_file=dossier / "cs.json",
+                 token_file=dossier / "tok.json")
+    cfg.ensure_dirs()
+    db = Database(cfg.db_file)
+    video = dossier / "rendu.mp4"
+    now = utcnow()
+    video_id = db.conn.execute(
+        "INSERT INTO videos (name, path, state, created_at, updated_at) VALUES (?,?,'UPLOADING',?,?)",
+        (nom, str(video), now, now)).lastrowid
+    db.conn.commit()
+    quand = (datetime.now(timezone.utc) + timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    envoi = dict(path=str(video), title="Titre", description="", tags=[],
+                 publish_at_utc=quand, db=db, video_id=video_id, url=serveur.url,
+                 jeton=lambda _renouveler: "jeton-de-test")
+    serveur.octets_recus = 0
+
+    if plantage_apres:
+        memoriser = db.memoriser_session_upload
+        compte = [0]
+
+        def _mourir(*a, **kw):
+            memoriser(*a, **kw)
+            compte[0] += 1
+            if compte[0] > plantage_apres:
+                raise _Plantage
+
+        db.memoriser_session_upload = _mourir
+        try:
+            youtube_client.upload_video(cfg, None, **envoi)
+        except _Plantage:
+            pass
+        del db.memoriser_session_upload
+        garde = db.session_upload(video_id)
+        print(f"  plantage : session gardée à {garde['offset_bytes'] >> 20} Mo")
+        if expirer:
+            serveur.sessions.clear()
+    serveur.pannes_503 = pannes
+
+    youtube_id = youtube_client.upload_video(cfg, None, **envoi)
+    taille = video.stat().st_size
+    reste = db.session_upload(video_id)
+    print(f"  {youtube_id} : {serveur.octets_recus >> 20} Mo envoyés pour un fichier de "
+          f"{taille >> 20} Mo, session {'encore en base' if reste else 'effacée'}")
+    db.close()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.WARNING, format="  %(levelname)s %(message)s")
+    serveur = FauxYouTube()
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    with tempfile.TemporaryDirectory(prefix="vortex-upload-") as tmp:
+        dossier = Path(tmp)
+        (dossier / "rendu.mp4").write_bytes(os.urandom(30 << 20))
+        print("1. reprise après plantage")
+        _scenario("reprise", serveur, dossier, plantage_apres=2)
+        print("2. session expirée")
+        _scenario("expiree", serveur, dossier, plantage_apres=2, expirer=True)
+        print("3. panne passagère (503)")
+        _scenario("panne", serveur, dossier, pannes=1)
+    serveur.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""Compte les requêtes SQLite émises par vidéo dans les boucles render et thumbs.
+
+Sert à vérifier ce que coûtent les contrôles de schéma : avant les migrations
+versionnées, `render_video`, `generate_thumb` et leurs boucles relançaient un
+`PRAGMA table_info(videos)` à chaque appel, donc à chaque vidéo.
+
+Les outils externes (FFmpeg, Chromium) sont remplacés par des doublures qui
+écrivent un fichier vide : seul le travail de la base est mesuré. Tout se
+passe dans un dossier temporaire, la vraie base n'est jamais ouverte.
+
+    python scripts/mesure_requetes.py [N]
+"""
+
+from __future__ import annotations
+
+import logging
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vortex import render, thumbs            # noqa: E402
+from vortex.config import Config             # noqa: E402
+from vortex.db import Database, utcnow       # noqa: E402
+
+
+def _faux_ffmpeg(cmd, **_kw):
+    """Doublure de render._lancer_ffmpeg : crée la sortie (dernier argument)."""
+    Path(cmd[-1]).write_bytes(b"")
+    return 0, b"", None
+
+
+def _faux_html(_html, out_jpg, **_kw) -> bool:
+    Path(out_jpg).write_bytes(b"")
+    return True
+
+
+def _peupler(db: Database, dossier: Path, n: int) -> None:
+    now = utcnow()
+    for i in range(n):
+        source = dossier / f"hedjav_{i}.mp4"
+        source.write_bytes(b"")
+        db.conn.execute(
+            "INSERT INTO videos (name, path, duration_s, width, height, category, "
+            "title, state, created_at, updated_at) VALUES (?,?,?,?,?,?,?,'READY',?,?)",
+            (source.stem, str(source), 42.0, 576, 1024, "short",
+             f"Titre de la vidéo {i}", now, now),
+        )
+    db.conn.commit()
+
+
+def _mesurer(db: Database, boucle, cfg: Config, n: int) -> Counter:
+    requetes: Counter = Counter()
+
+    def _trace(sql: str) -> None:
+        mot = sql.lstrip().split(None, 2)
+        cle = " ".join(mot[:2]).upper() if mot and mot[0].upper() in ("PRAGMA", "ALTER") \
+            else (mot[0].upper() if mot else "?")
+        requetes[cle] += 1
+
+    db.conn.set_trace_callback(_trace)
+    try:
+        boucle(cfg, db, limit=n)
+    finally:
+        db.conn.set_trace_callback(None)
+    return requetes
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    logging.basicConfig(level=logging.ERROR)
+    render.find_ffmpeg = lambda: "ffmpeg"
+    render._lancer_ffmpeg = _faux_ffmpeg
+    render._face_top_fraction = lambda *_a, **_kw: None
+    thumbs._render_html = _faux_html
+    thumbs._portrait_raw = lambda *_a, **_kw: None
+    thumbs._portrait_video = lambda *_a, **_kw: None
+
+    with tempfile.TemporaryDirectory(prefix="vortex-mesure-") as tmp:
+        dossier = Path(tmp)
+        cfg = Config(source_dir=dossier, tokkit_db=dossier / "absent.sqlite",
+                     data_dir=dossier / "data", client_secret_file=dossier / "cs.json",
+                     token_file=dossier / "tok.json", daily_limit=n)
+        cfg.ensure_dirs()
+
+        depart = time.perf_counter()
+        db = Database(cfg.db_file)
+        ouverture = (time.perf_counter() - depart) * 1000
+        _peupler(db, dossier, n)
+        db.close()
+
+        # Réouverture : c'est le cas courant, une base déjà à jour.
+        depart = time.perf_counter()
+        db = Database(cfg.db_file)
+        reouverture = (time.perf_counter() - depart) * 1000
+
+        print(f"Ouverture : base neuve {ouverture:.1f} ms, base existante {reouverture:.1f} ms")
+        for nom, boucle in (("thumbs", thumbs.thumbs_pending), ("render", render.render_pending)):
+            requetes = _mesurer(db, boucle, cfg, n)
+            total = sum(requetes.values())
+            schema = sum(v for k, v in requetes.items() if k.startswith(("PRAGMA", "ALTER")))
+            print(f"{nom:<7} {n} vidéos : {total / n:.2f} requêtes/vidéo, "
+                  f"dont {schema / n:.2f} de contrôle de schéma "
+                  f"({', '.join(f'{k}={v}' for k, v in sorted(requetes.items()))})")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -140,7 +140,7 @@ def main() -> int:
     if not CLE.is_file():
         sys.exit(f"Cle SSH introuvable : {CLE}")
 
-    from vortex import ecoute
+    from vortex import audio, ecoute
     from vortex.config import load_config
 
     cfg = load_config()
@@ -162,10 +162,11 @@ def main() -> int:
         print(f"  {(s['titre'] or '')[:66]}")
         print(f"  {s['youtube_id']} — {duree // 60} min — {s['etat']}")
         try:
-            vue = ecoute.reperer(s["youtube_id"], duree,
+            vue = ecoute.reperer(s["youtube_id"], duree, cache=audio.cache_de(cfg),
                                  largeur_max_s=cfg.opus_fenetre_max_s,
                                  largeur_min_s=cfg.opus_fenetre_min_s,
-                                 modele=args.modele)
+                                 modele=args.modele,
+                                 socket_chemin=cfg.whisper_socket)
         except Exception as exc:
             print(f"  ECHEC : {exc}\n")
             continue
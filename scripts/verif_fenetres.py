@@ -0,0 +1,196 @@
+"""Vérification de la lecture partielle de l'audio d'un direct (audio.pcm_fenetres).
+
+`pcm_fenetres` ne doit demander à l'hébergeur que les octets des fenêtres
+sondées (requêtes Range), une connexion à la fois, et rendre un PCM où la
+fenêtre i commence à `i * duree_s`. Ici un serveur HTTP LOCAL sert un WAV
+SYNTHÉTIQUE de 3 h (16 kHz mono, engendré à la volée : rien n'est écrit sur
+le disque) dont chaque seconde porte une valeur constante qui en donne le
+numéro. Le serveur note chaque requête, son Range et les octets envoyés.
+On vérifie :
+
+1. que le PCM produit a la taille attendue et que chaque fenêtre porte les
+   secondes demandées (la dernière dépasse la fin : silence au-delà) ;
+2. que chaque requête commence dans l'en-tête du WAV ou dans une fenêtre ;
+3. que les octets servis hors des fenêtres restent sous `TOLERANCE` par
+   requête (tampons TCP et lecture anticipée de FFmpeg) ;
+4. que deux fenêtres ne sont jamais servies en même temps (une même
+   recherche peut, elle, ouvrir sa nouvelle connexion avant de fermer
+   l'ancienne).
+
+    python scripts/verif_fenetres.py
+
+FFmpeg réel requis (`find_ffmpeg`), pas de réseau. Code de sortie 1 au
+premier écart.
+"""
+
+from __future__ import annotations
+
+import re
+import socket
+import struct
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vortex import audio                         # noqa: E402
+
+DUREE = 3 * 3600
+ECHANTILLON = 10
+# Fenêtres de sondage ; la dernière déborde de la fin du direct.
+DEPARTS = [30, 600, 3601, 7200, 9000, DUREE - 4]
+ENTETE_WAV = 44
+TAILLE = ENTETE_WAV + DUREE * audio.OCTETS_PAR_S
+# Octets servis au-delà de ce que la fenêtre demande, par requête : tampons
+# d'envoi et de réception, lecture anticipée d'AVIOContext.
+TOLERANCE = 1024 ** 2
+
+
+def _valeur(seconde: int) -> int:
+    return seconde * 3 + 1
+
+
+def _entete() -> bytes:
+    donnees = DUREE * audio.OCTETS_PAR_S
+    return (b"RIFF" + struct.pack("<I", 36 + donnees) + b"WAVE"
+            + b"fmt " + struct.pack("<IHHIIHH", 16, 1, 1, audio.ECHANTILLONNAGE,
+                                    audio.OCTETS_PAR_S, 2, 16)
+            + b"data" + struct.pack("<I", donnees))
+
+
+def _octets(debut: int, fin: int) -> bytes:
+    """Octets [debut, fin[ du WAV synthétique."""
+    entete = _entete()
+    morceaux = [entete[debut:fin]] if debut < ENTETE_WAV else []
+    position = max(debut, ENTETE_WAV)
+    while position < fin:
+        seconde, reste = divmod(position - ENTETE_WAV, audio.OCTETS_PAR_S)
+        bout = min(fin - position, audio.OCTETS_PAR_S - reste)
+        morceaux.append((struct.pack("<h", _valeur(seconde)) * (audio.OCTETS_PAR_S // 2))
+                        [reste:reste + bout])
+        position += bout
+    return b"".join(morceaux)
+
+
+class _Serveur(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _Gestionnaire)
+        self.requetes: list[tuple[int, int]] = []     # (début, octets envoyés)
+        self.actives: list[int] = []               # fenêtres en cours d'envoi
+        self.simultanees = 0
+        self.verrou = threading.Lock()
+
+
+class _Gestionnaire(BaseHTTPRequestHandler):
+    def log_message(self, *_args):
+        pass
+
+    def do_GET(self):
+        serveur = self.server
+        plage = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+        debut = int(plage.group(1)) if plage else 0
+        fenetre = _zone(debut)
+        with serveur.verrou:
+            serveur.actives.append(fenetre)
+            serveur.simultanees = max(serveur.simultanees,
+                                      len(set(serveur.actives) - {None, 0}))
+        envoyes = 0
+        try:
+            # Petit tampon d'envoi : les octets comptés sont ceux que FFmpeg lit.
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 16384)
+            fin = min(int(plage.group(2)) + 1, TAILLE) if plage and plage.group(2) else TAILLE
+            self.send_response(206 if plage else 200)
+            self.send_header("Content-Type", "audio/wav")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(fin - debut))
+            if plage:
+                self.send_header("Content-Range", f"bytes {debut}-{fin - 1}/{TAILLE}")
+            self.end_headers()
+            position = debut
+            while position < fin:
+                bout = _octets(position, min(fin, position + 16384))
+                self.wfile.write(bout)
+                envoyes += len(bout)
+                position += len(bout)
+        except (BrokenPipeError, ConnectionResetError):
+            pass                           # FFmpeg a lu sa fenêtre et raccroche
+        finally:
+            with serveur.verrou:
+                serveur.actives.remove(fenetre)
+                serveur.requetes.append((debut, envoyes))
+
+
+def _zones() -> list[tuple[int, int]]:
+    """Plages d'octets légitimes : l'en-tête (et le début des données, où le
+    démultiplexeur WAV se replace après l'avoir lu), puis chaque fenêtre."""
+    zones = [(0, ENTETE_WAV + 1)]
+    for depart in DEPARTS:
+        debut = ENTETE_WAV + depart * audio.OCTETS_PAR_S
+        zones.append((debut, min(TAILLE, debut + ECHANTILLON * audio.OCTETS_PAR_S)))
+    return zones
+
+
+def _zone(octet: int) -> int | None:
+    """Rang dans `_zones()` de la zone où tombe `octet` (0 : l'en-tête)."""
+    return next((i for i, (a, b) in enumerate(_zones()) if a <= octet < max(b, a + 1)), None)
+
+
+def _verifier_pcm(fichier: Path) -> list[str]:
+    ecarts = []
+    attendue = len(DEPARTS) * ECHANTILLON * audio.OCTETS_PAR_S
+    if fichier.stat().st_size != attendue:
+        ecarts.append(f"PCM de {fichier.stat().st_size} octets au lieu de {attendue}")
+        return ecarts
+    for i, depart in enumerate(DEPARTS):
+        for j in range(ECHANTILLON):
+            tranche = audio.lire(fichier, i * ECHANTILLON + j, 1)
+            valeurs = {round(v * 32768) for v in tranche.tolist()}
+            voulu = {_valeur(depart + j) if depart + j < DUREE else 0}
+            if valeurs != voulu:
+                ecarts.append(f"fenêtre {depart} s, seconde {j} : {sorted(valeurs)[:3]} "
+                              f"au lieu de {voulu}")
+                break
+    return ecarts
+
+
+def main() -> int:
+    serveur = _Serveur()
+    threading.Thread(target=serveur.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{serveur.server_address[1]}/direct.wav"
+    ecarts = []
+    with tempfile.TemporaryDirectory(prefix="vortex-verif-fenetres-") as tmp:
+        cache = audio.Cache(Path(tmp), 1024 ** 3)
+        fichier = audio.pcm_fenetres(url, DEPARTS, ECHANTILLON, cache=cache, cle="verif",
+                                     entetes={"User-Agent": "vortex-verif"})
+        ecarts += _verifier_pcm(fichier)
+    serveur.shutdown()
+
+    zones = _zones()
+    servis = 0
+    for debut, envoyes in sorted(serveur.requetes):
+        rang = _zone(debut)
+        if rang is None:
+            ecarts.append(f"requête hors fenêtre : octet {debut}")
+            continue
+        zone = zones[rang]
+        servis += envoyes
+        if envoyes > (zone[1] - debut) + TOLERANCE:
+            ecarts.append(f"requête à l'octet {debut} : {envoyes} octets servis "
+                          f"pour une zone de {zone[1] - debut}")
+    if serveur.simultanees > 1:
+        ecarts.append(f"{serveur.simultanees} fenêtres servies en même temps")
+    print(f"{len(serveur.requetes)} requêtes, {servis / 1024 ** 2:.1f} Mo servis "
+          f"sur {TAILLE / 1024 ** 2:.0f} Mo, au plus {serveur.simultanees} fenêtre(s) à la fois")
+
+    for ecart in ecarts:
+        print(f"ÉCART : {ecart}")
+    return 1 if ecarts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Vérification de bout en bout du rendu partiel (vortex/rendu_partiel.py).
+
+Le rendu partiel recolle des segments réencodés par x264 et des segments
+copiés de la source. Ce script le fait tourner pour de vrai, avec FFmpeg,
+sur des sources SYNTHÉTIQUES (mire `testsrc2`, GOP fermé, bip sinusoïdal)
+de profils différents, et vérifie sur chaque résultat :
+
+1. que le flux H.264 recollé se décode sans la moindre erreur (`-xerror`) ;
+2. qu'il a exactement autant d'images que la source ;
+3. que profil, niveau, cadence, couleurs et base de temps sont ceux de la
+   source (ce que les segments réencodés doivent reproduire) ;
+4. qu'une source que x264 ne sait pas reproduire (High 4:4:4) est écartée :
+   `rendre` rend None et l'appelant encode tout ;
+5. que cet encodage complet, par render.py avec `rendu_partiel` actif,
+   porte le filigrane permanent : hors des incrustations, le haut de
+   l'image diffère de la source.
+
+    python scripts/verif_rendu_partiel.py
+
+Code de sortie 1 au premier écart.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from vortex import render, rendu_partiel         # noqa: E402
+from vortex.config import load_config            # noqa: E402
+from vortex.db import Database                   # noqa: E402
+from vortex.textdetect import find_ffmpeg        # noqa: E402
+
+DUREE = 12
+# (nom, profil x264, niveau, cadence, format de pixels, espace colorimétrique)
+SOURCES = [
+    ("high_30", "high", "4.0", "30", "yuv420p", "bt709"),
+    ("main_25", "main", "3.1", "25", "yuv420p", "bt470bg"),
+    ("baseline_30000_1001", "baseline", "3.0", "30000/1001", "yuv420p", ""),
+    ("high444_30", "high444", "4.0", "30", "yuv444p", ""),
+]
+# Un bandeau de 2 s au milieu : seuls les GOP qui le portent sont réencodés.
+BANDEAU = (5.0, 7.0)
+FILTRE = "drawbox=x=20:y=20:w=200:h=60:color=red@0.8:t=fill:enable='between(t,5,7)'"
+
+
+def _generer(ffmpeg: str, dossier: Path, nom: str, profil: str, niveau: str, cadence: str,
+             pixels: str, couleurs: str) -> Path:
+    chemin = dossier / f"{nom}.mp4"
+    signalisation = (["-colorspace", couleurs, "-color_primaries", couleurs,
+                      "-color_trc", couleurs if couleurs == "bt709" else "gamma28",
+                      "-color_range", "tv"] if couleurs else [])
+    subprocess.run(
+        [ffmpeg, "-nostdin", "-v", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc2=size=640x360:rate={cadence}:duration={DUREE}",
+         "-f", "lavfi", "-i", f"sine=frequency=330:sample_rate=48000:duration={DUREE}",
+         "-c:v", "libx264", "-preset", "veryfast", "-profile:v", profil, "-level:v", niveau,
+         "-pix_fmt", pixels, "-g", "30", "-keyint_min", "30", "-sc_threshold", "0",
+         "-flags", "+cgop", *signalisation,
+         "-c:a", "aac", "-b:a", "96k", "-shortest", "-movflags", "+faststart", str(chemin)],
+        check=True, capture_output=True, timeout=600)
+    return chemin
+
+
+def _images(ffprobe: str, chemin: Path) -> int:
+    sortie = subprocess.run(
+        [ffprobe, "-v", "error", "-select_streams", "v:0", "-count_frames",
+         "-show_entries", "stream=nb_read_frames", "-of", "csv=p=0", str(chemin)],
+        capture_output=True, text=True, timeout=600)
+    return int(sortie.stdout.strip() or 0)
+
+
+def _erreurs_decodage(ffmpeg: str, chemin: Path) -> str:
+    sortie = subprocess.run(
+        [ffmpeg, "-nostdin", "-v", "error", "-xerror", "-i", str(chemin), "-f", "null", "-"],
+        capture_output=True, text=True, timeout=600)
+    return sortie.stderr.strip() if sortie.returncode or sortie.stderr.strip() else ""
+
+
+def _verifier(ffmpeg: str, ffprobe: str, source: Path, cible: Path) -> list[str]:
+    ecarts = []
+    erreurs = _erreurs_decodage(ffmpeg, cible)
+    if erreurs:
+        ecarts.append(f"décodage : {erreurs[:300]}")
+    attendues, obtenues = _images(ffprobe, source), _images(ffprobe, cible)
+    if attendues != obtenues:
+        ecarts.append(f"{obtenues} images au lieu de {attendues}")
+    avant = rendu_partiel.flux_video(ffprobe, source) or {}
+    apres = rendu_partiel.flux_video(ffprobe, cible) or {}
+    for champ in rendu_partiel.SIGNATURE + ("time_base",):
+        if avant.get(champ) != apres.get(champ):
+            ecarts.append(f"{champ} : {apres.get(champ)} au lieu de {avant.get(champ)}")
+    return ecarts
+
+
+def _bande_haute(ffmpeg: str, chemin: Path, instant: float) -> bytes:
+    """Huitième haut de l'image à `instant`, en niveaux de gris."""
+    return subprocess.run(
+        [ffmpeg, "-nostdin", "-v", "error", "-ss", f"{instant:.2f}", "-i", str(chemin),
+         "-frames:v", "1", "-vf", "crop=iw:ih/8:0:0,format=gray", "-f", "rawvideo", "-"],
+        check=True, capture_output=True, timeout=600).stdout
+
+
+def _verifier_filigrane(ffmpeg: str, dossier: Path) -> list[str]:
+    """Rendu d'un clip hedjav High 4:4:4 avec `rendu_partiel` : écarté du
+    rendu partiel, il doit sortir en encodage complet AVEC son filigrane."""
+    duree = 30
+    source = dossier / "hedjav_filigrane.mp4"
+    # Aplat uni : la moindre incrustation se voit ; 1080 px de large pour
+    # garder la définition (condition du rendu partiel).
+    subprocess.run(
+        [ffmpeg, "-nostdin", "-v", "error", "-y",
+         "-f", "lavfi", "-i", f"color=c=0x336699:size=1080x1920:rate=30:duration={duree}",
+         "-f", "lavfi", "-i", f"sine=frequency=330:sample_rate=48000:duration={duree}",
+         "-c:v", "libx264", "-preset", "veryfast", "-profile:v", "high444",
+         "-pix_fmt", "yuv444p", "-c:a", "aac", "-shortest", str(source)],
+        check=True, capture_output=True, timeout=600)
+    cfg = dataclasses.replace(load_config(), data_dir=dossier / "data", rendu_partiel=True,
+                              render_cache_froid=None)
+    db = Database(dossier / "verif.db")
+    video_id, _ = db.upsert_video({"name": source.stem, "path": str(source),
+                                   "size_bytes": source.stat().st_size, "duration_s": duree,
+                                   "width": 1080, "height": 1920})
+    db.update_fields(video_id, has_text="texte")          # pas d'accroche
+    job = render._preparer_rendu(cfg, db, video_id)
+    if not job or not job.get("partiel"):
+        return ["rendu partiel non prévu : la vérification ne porte sur rien"]
+    plages = job["partiel"]["plages"]
+    code, stderr, _ = render._executer_rendu(job)
+    if code != 0:
+        return [f"rendu : {stderr.decode('utf-8', 'replace')[-300:]}"]
+    if "repli" in job:
+        return ["la source High 4:4:4 n'a pas été écartée du rendu partiel"]
+    # Le plus long intervalle sans incrustation : seul le filigrane y paraît.
+    bornes = [0.0, *[b for p in plages for b in p], float(duree)]
+    trous = [(bornes[i], bornes[i + 1]) for i in range(0, len(bornes) - 1, 2)]
+    debut, fin = max(trous, key=lambda t: t[1] - t[0])
+    instant = (debut + fin) / 2
+    avant = _bande_haute(ffmpeg, source, instant)
+    apres = _bande_haute(ffmpeg, job["out"], instant)
+    marques = sum(abs(a - b) > 60 for a, b in zip(avant, apres))
+    if marques < 200:
+        return [f"pas de filigrane à {instant:.1f} s ({marques} pixels marqués)"]
+    return []
+
+
+def main() -> int:
+    ffmpeg = find_ffmpeg()
+    ffprobe = rendu_partiel._ffprobe(ffmpeg)
+    echecs = 0
+    with tempfile.TemporaryDirectory(prefix="vortex-verif-partiel-") as tmp:
+        dossier = Path(tmp)
+        for nom, profil, niveau, cadence, pixels, couleurs in SOURCES:
+            source = _generer(ffmpeg, dossier, nom, profil, niveau, cadence, pixels, couleurs)
+            cible = dossier / f"{nom}-partiel.mp4"
+            fait = rendu_partiel.rendre(
+                ffmpeg, source, cible, vf=FILTRE, plages=[BANDEAU], duree=DUREE,
+                x264=["-preset", "veryfast", "-crf", "20"], audio=["-c:a", "copy"],
+                timeout=600)
+            if pixels != "yuv420p":
+                ok = fait is None
+                print(f"{nom:<22} {'écarté, encodage complet' if ok else 'ACCEPTÉ à tort'}")
+                echecs += not ok
+                continue
+            if fait is None or fait[0] != 0:
+                detail = "écarté" if fait is None else fait[1].decode("utf-8", "replace")[-300:]
+                print(f"{nom:<22} ÉCHEC : {detail}")
+                echecs += 1
+                continue
+            ecarts = _verifier(ffmpeg, ffprobe, source, cible)
+            print(f"{nom:<22} {'conforme' if not ecarts else 'ÉCART : ' + ' ; '.join(ecarts)}")
+            echecs += bool(ecarts)
+        ecarts = _verifier_filigrane(ffmpeg, dossier)
+        print(f"{'filigrane_repli':<22} {'conforme' if not ecarts else 'ÉCART : ' + ' ; '.join(ecarts)}")
+        echecs += bool(ecarts)
+    return 1 if echecs else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Vérification des décalages des sondages d'écoute (vortex/ecoute.py).
+
+`transcrire_par_sondages` ne passe à Whisper que des tranches d'un PCM du
+cache audio : la piste entière (décalage = départ du sondage) ou les seules
+fenêtres sondées mises bout à bout (décalage = rang × durée d'un sondage).
+Une erreur d'un côté ou de l'autre ne se voit pas dans le journal : Whisper
+transcrit alors une autre minute du direct, et la fenêtre de prédication
+est cherchée au mauvais endroit.
+
+Ici, un PCM SYNTHÉTIQUE porte dans chaque seconde une valeur constante qui
+en donne le numéro, et un modèle factice répond par le numéro de la
+seconde qu'il reçoit en premier. On vérifie :
+
+1. `audio.lire` : tranche au bon endroit, de la bonne longueur ;
+2. `transcripteur._inferer` : la demande (`debut_s`, `duree_s`) sur un .pcm
+   arrive au modèle comme cette tranche ;
+3. `transcrire_par_sondages`, piste entière puis fenêtres seules : chaque
+   réplique revient horodatée au départ de SON sondage.
+
+    python scripts/verif_sondages.py
+
+Ni réseau, ni FFmpeg, ni faster-whisper : numpy seulement. Code de sortie 1
+au premier écart.
+"""
+
+from __future__ import annotations
+
+import sys
+import tempfile
+import types
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np                                  # noqa: E402
+
+from vortex import audio, ecoute, transcripteur     # noqa: E402
+
+DUREE = 1200          # 20 min de « direct »
+PAS = 120
+ECHANTILLON = 10
+
+
+def _valeur(seconde: int) -> int:
+    return seconde * 3 + 1
+
+
+def _seconde(echantillon: float) -> float:
+    return (round(echantillon * 32768) - 1) / 3
+
+
+def _pcm(chemin: Path, secondes: list[int]) -> Path:
+    """PCM dont la i-ème seconde vaut `_valeur(secondes[i])`."""
+    valeurs = np.repeat(np.array([_valeur(s) for s in secondes], dtype="<i2"),
+                        audio.ECHANTILLONNAGE)
+    valeurs.tofile(chemin)
+    return chemin
+
+
+class _Modele:
+    """Répond par la seconde du premier échantillon reçu ; note la longueur."""
+
+    def __init__(self):
+        self.recus: list[tuple[float, float, int]] = []
+
+    def transcribe(self, tranche, **_options):
+        premiere, derniere = _seconde(tranche[0]), _seconde(tranche[-1])
+        self.recus.append((premiere, derniere, len(tranche)))
+        segment = SimpleNamespace(start=0.0, end=len(tranche) / audio.ECHANTILLONNAGE,
+                                  text=f" {premiere:g}", words=[])
+        return iter([segment]), SimpleNamespace(language="fr", language_probability=1.0)
+
+
+def main() -> int:
+    ecarts = []
+    modele = _Modele()
+    transcripteur.modele = lambda *_a, **_kw: modele
+    # Le modèle est remplacé : faster-whisper n'a pas à être installé, mais
+    # ecoute vérifie sa présence quand le démon ne répond pas.
+    sys.modules.setdefault("faster_whisper", types.ModuleType("faster_whisper"))
+
+    with tempfile.TemporaryDirectory(prefix="vortex-verif-sondages-") as tmp:
+        dossier = Path(tmp)
+        cache = audio.Cache(dossier / "audio", 1024 ** 3)
+        cache.dossier.mkdir()
+        complet = _pcm(cache.dossier / "complet.pcm", list(range(DUREE)))
+
+        # 1. audio.lire
+        tranche = audio.lire(complet, 37, 5)
+        if len(tranche) != 5 * audio.ECHANTILLONNAGE or _seconde(tranche[0]) != 37 \
+                or _seconde(tranche[-1]) != 41:
+            ecarts.append(f"lire(37, 5) : {_seconde(tranche[0]):g}-{_seconde(tranche[-1]):g} s, "
+                          f"{len(tranche)} échantillons")
+
+        # 2. transcripteur._inferer
+        reponse = transcripteur._inferer({"modele": "factice", "fichier": str(complet),
+                                          "debut_s": 600, "duree_s": ECHANTILLON})
+        if modele.recus[-1] != (600, 600 + ECHANTILLON - 1, ECHANTILLON * audio.ECHANTILLONNAGE):
+            ecarts.append(f"_inferer(600, {ECHANTILLON}) : reçu {modele.recus[-1]}")
+        if reponse["segments"][0]["text"].strip() != "600":
+            ecarts.append(f"_inferer : réponse {reponse['segments'][0]['text']!r}")
+
+        # 3. transcrire_par_sondages, les deux chemins
+        points = list(range(0, DUREE - ECHANTILLON, PAS))
+        attendu = [(float(p), str(p)) for p in points]
+        fenetres = _pcm(cache.dossier / "fenetres.pcm",
+                        [p + i for p in points for i in range(ECHANTILLON)])
+        socket_absent = dossier / "pas-de-demon.sock"
+        for nom, partiel in (("piste entière", False), ("fenêtres seules", True)):
+            ecoute._audio_complet = lambda *_a: complet
+            ecoute._audio_sondages = lambda *_a: fenetres
+            modele.recus.clear()
+            lignes = ecoute.transcrire_par_sondages(
+                "synthetique", DUREE, cache=cache, pas_s=PAS, echantillon_s=ECHANTILLON,
+                fils=2, partiel=partiel, socket_chemin=socket_absent)
+            lignes = sorted((float(t), texte) for t, texte in lignes)
+            longueurs = {n for _, _, n in modele.recus}
+            ok = lignes == attendu and longueurs == {ECHANTILLON * audio.ECHANTILLONNAGE}
+            print(f"{nom:<16} {len(lignes)} sondages {'conformes' if ok else 'DÉCALÉS'}")
+            if not ok:
+                ecarts.append(f"{nom} : {lignes[:4]}… au lieu de {attendu[:4]}…, "
+                              f"longueurs {sorted(longueurs)}")
+
+    for ecart in ecarts:
+        print(f"ÉCART : {ecart}")
+    return 1 if ecarts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,19 @@
 """Interface en ligne de commande.
 
-    python -m vortex scan                  # détecter les vidéos (états DISCOVERED)
+    python -m vortex scan [--jobs J]       # détecter les vidéos (états DISCOVERED)
+    python -m vortex scan --watch          # veille continue : inscrit chaque fichier à son arrivée
+    python -m vortex rehash [-n N]         # compléter les SHA-256 en tâche de fond
     python -m vortex transcribe [-n N]     # transcrire N vidéos (Whisper local)
+    python -m vortex loudness [-n N]       # mesurer la sonie des vidéos transcrites avant la mesure
+    python -m vortex whisper-daemon [--inactif-min M]  # garder Whisper chargé (socket Unix)
     python -m vortex prepare [-n N]        # générer titre/description/tags
     python -m vortex plan [-n N]           # SIMULATION : afficher le plan de publication
     python -m vortex publish [-n N] --live # upload privé + programmation RÉELLE
     python -m vortex sync-channel          # lister les vidéos déjà sur la chaîne
+    python -m vortex social-worker [-j J]  # vider la file Facebook/Instagram
     python -m vortex status                # compteurs par état
+    python -m vortex perf [-n N]           # passages FFmpeg : étapes lentes, tendance (30 j)
+    python -m vortex bench render          # banc d'essai du rendu (sources synthétiques, JSON)
     python -m vortex auth                  # lancer/valider l'authentification OAuth
 
 Découpage des longues vidéos YouTube (Submagic) :
@@ -18,6 +25,7 @@ Découpage des longues vidéos YouTube (Submagic) :
     python -m vortex livrer [-n N]         # expédier les extraits retenus par courriel
     python -m vortex tiktok --live         # programmer les extraits sur TikTok (via Submagic)
     python -m vortex clips                 # état du découpage
+    python -m vortex habiller --source F [--sans-nettete]  # bandeaux ; sans netteté : rendu partiel
 
 Par défaut TOUT est en simulation : seul `publish --live` touche YouTube
 (et `sync-channel` / `auth`, en lecture seule ou consentement).
@@ -47,20 +55,29 @@ def setup_logging(cfg) -> None:
 def main(argv: list[str] | None = None) -> int:
     parser = argparse.ArgumentParser(prog="vortex", description="Vortex Automator — pipeline YouTube")
     parser.add_argument("command", choices=[
-        "scan", "transcribe", "prepare", "plan", "publish", "sync-channel", "status", "auth",
+        "scan", "rehash", "transcribe", "prepare", "plan", "publish", "sync-channel", "status", "auth",
         "retry", "engage", "detect-text", "render", "thumbs",
-        "story", "backfill-social", "detect-speaker",
+        "story", "backfill-social", "social-worker", "detect-speaker",
         "veille", "clip", "recolter", "livrer", "clips", "tiktok", "opus",
-        "confirmer", "valider", "habiller", "bilan",
+        "confirmer", "valider", "habiller", "bilan", "perf", "bench", "loudness",
+        "whisper-daemon",
     ])
+    parser.add_argument("banc", nargs="?", default=None,
+                        help="`bench` : banc à lancer (render)")
     parser.add_argument("--source", default=None,
-                        help="`opus` : identifiant YouTube de la vidéo à traiter")
+                        help="`opus` : identifiant YouTube de la vidéo à traiter ; "
+                             "`bench` : ne mesurer que cette source synthétique")
     parser.add_argument("--debut", default=None,
                         help="`opus` : forcer le début de la fenêtre (1:53:00)")
     parser.add_argument("--fin", default=None,
                         help="`opus` : forcer la fin de la fenêtre (2:53:00)")
     parser.add_argument("-n", "--count", type=int, default=5,
                         help="nombre de vidéos à traiter (défaut : 5)")
+    parser.add_argument("-j", "--jobs", type=int, default=0,
+                        help="`scan` : fichiers sondés/hachés en parallèle (défaut : un par cœur) ; "
+                             "`social-worker` : envois simultanés (défaut : 2)")
+    parser.add_argument("--watch", action="store_true",
+                        help="`scan` : rester à l'écoute du dossier source (inotify, sinon relevé)")
     parser.add_argument("--resoudre", action="store_true",
                         help="`veille` : afficher l'identifiant UC… de chaque chaîne configurée")
     parser.add_argument("--live", action="store_true",
@@ -68,6 +85,11 @@ def main(argv: list[str] | None = None) -> int:
     parser.add_argument("--maintenant", action="store_true",
                         help="publie tout de suite, hors grille horaire "
                              "(contenu d'actualité : conférence, direct du jour)")
+    parser.add_argument("--sans-nettete", action="store_true",
+                        help="`habiller` : ne pas accentuer l'image ; seules les secondes "
+                             "des bandeaux sont alors réencodées (rendu partiel)")
+    parser.add_argument("--inactif-min", type=int, default=30,
+                        help="`whisper-daemon` : libérer les modèles après M minutes sans demande")
     parser.add_argument("--config", default=None, help="chemin du config.toml")
     args = parser.parse_args(argv)
 
@@ -78,17 +100,41 @@ def main(argv: list[str] | None = None) -> int:
 
     try:
         if args.command == "scan":
-            from .scanner import scan
-            stats = scan(cfg, db)
+            from .scanner import scan, watch
+            if args.watch:
+                try:
+                    watch(cfg, db, jobs=args.jobs)
+                except KeyboardInterrupt:
+                    print("Veille arrêtée.")
+                return 0
+            stats = scan(cfg, db, jobs=args.jobs)
             print(f"Scan : {stats['seen']} vues, {stats['new']} nouvelles, "
                   f"{stats['known']} déjà connues, {stats['blocked']} bloquées, "
-                  f"{stats['too_short']} trop courtes")
+                  f"{stats['too_short']} trop courtes, "
+                  f"{stats['cached']} servies par le cache")
+
+        elif args.command == "rehash":
+            from .scanner import rehash_pending
+            n = rehash_pending(db, limit=args.count if args.count != 5 else 0)
+            print(f"{n} empreinte(s) SHA-256 complétée(s)")
 
         elif args.command == "transcribe":
             from .transcribe import transcribe_pending
             n = transcribe_pending(cfg, db, limit=args.count)
             print(f"{n} vidéo(s) transcrite(s)")
 
+        elif args.command == "loudness":
+            from .sonie import mesurer_en_attente
+            n = mesurer_en_attente(cfg, db, limit=args.count if args.count != 5 else 0)
+            print(f"{n} vidéo(s) mesurée(s) (sonie EBU R128)")
+
+        elif args.command == "whisper-daemon":
+            from .transcripteur import servir
+            try:
+                servir(cfg.whisper_socket, inactif_min=args.inactif_min)
+            except KeyboardInterrupt:
+                print("Démon Whisper arrêté.")
+
         elif args.command == "prepare":
             from .metadata import prepare_pending
             n = prepare_pending(cfg, db, limit=args.count)
@@ -135,7 +181,14 @@ def main(argv: list[str] | None = None) -> int:
         elif args.command == "backfill-social":
             from .pipeline import backfill_social
             n = backfill_social(cfg, db, count=args.count if args.count != 5 else 12)
-            print(f"Backfill : {n} clip(s) posté(s) sur Facebook + Instagram")
+            print(f"Backfill : {n} clip(s) mis en file pour Facebook + Instagram")
+
+        elif args.command == "social-worker":
+            from .social import drainer
+            bilan = drainer(cfg, db, limite=args.count if args.count != 5 else 0,
+                            jobs=args.jobs or 2)
+            print(f"File sociale : {bilan['envoyes']} envoyé(s), {bilan['reportes']} reporté(s), "
+                  f"{bilan['echecs']} abandonné(s) — en file : {db.compteurs_outbox()}")
 
         elif args.command == "retry":
             from .pipeline import retry_failed
@@ -319,7 +372,7 @@ def main(argv: list[str] | None = None) -> int:
                 return 1
             entree = _P(args.source)
             sortie = entree.with_name(f"{entree.stem}-habille.mp4")
-            print(f"Habillage -> {habiller(entree, sortie)}")
+            print(f"Habillage -> {habiller(entree, sortie, nettete=not args.sans_nettete)}")
 
         elif args.command == "bilan":
             from .bilan import composer, envoyer
@@ -349,6 +402,40 @@ def main(argv: list[str] | None = None) -> int:
             if bilan.get("raison"):
                 print(f"  ({bilan['raison']})")
 
+        elif args.command == "perf":
+            from datetime import datetime, timedelta, timezone
+            depuis = (datetime.now(timezone.utc) - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+            bilan = db.bilan_etapes(depuis)
+            if not bilan:
+                print("Aucun passage FFmpeg relevé depuis 30 jours.")
+                return 0
+            print("Étapes (30 j)     passages  échecs  moyenne     max   total  vitesse  cœurs  pic Mo")
+            for e in bilan:
+                print(f"  {e['etape']:<16} {e['n']:>7} {e['echecs']:>7} {e['mur_moy']:>7.1f}s "
+                      f"{e['mur_max']:>6.0f}s {e['mur_total'] / 60:>5.0f}mn "
+                      f"{'×%.2f' % e['vitesse'] if e['vitesse'] else '—':>8} "
+                      f"{'%.1f' % e['coeurs'] if e['coeurs'] else '—':>6} {e['pic_mo'] or '—':>7}")
+            print(f"Les {args.count} passages les plus lents :")
+            for p in db.passages_les_plus_lents(depuis, args.count):
+                print(f"  {p['mur_s']:>7.0f}s  {p['etape']:<16} {p['debut'][:16]}  "
+                      f"{p['name'] or '—'}{'  (échec %d)' % p['code'] if p['code'] else ''}")
+            print("Tendance par semaine (passages réussis) :")
+            precedente: dict = {}
+            for t in db.tendance_etapes(depuis):
+                avant = precedente.get(t["etape"])
+                ecart = f"  {100 * (t['mur_moy'] / avant - 1):+.0f} %" if avant else ""
+                precedente[t["etape"]] = t["mur_moy"]
+                print(f"  {t['etape']:<16} {t['semaine']}  {t['n']:>5} × {t['mur_moy']:>7.1f}s"
+                      f"{'  ×%.2f' % t['vitesse'] if t['vitesse'] else ''}{ecart}")
+
+        elif args.command == "bench":
+            from .banc import SOURCES, banc_rendu
+            if args.banc != "render" or (args.source and args.source not in SOURCES):
+                print(f"Usage : vortex bench render [--source {'|'.join(SOURCES)}]")
+                return 1
+            fichier = banc_rendu(cfg, [args.source] if args.source else None)
+            print(f"Résultats -> {fichier}")
+
         elif args.command == "status":
             counts = db.counts()
             total = sum(counts.values())
@@ -356,6 +443,9 @@ def main(argv: list[str] | None = None) -> int:
             for state, n in sorted(counts.items()):
                 print(f"  {state:<12} {n}")
     finally:
+        # Passages FFmpeg relevés pendant la commande (vortex/lanceur.py).
+        from .lanceur import enregistrer
+        enregistrer(db)
         db.close()
     return 0
 
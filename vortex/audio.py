@@ -0,0 +1,269 @@
+"""Audio décodé une fois : PCM 16 kHz mono, partagé par tous ses lecteurs.
+
+La même piste était décodée plusieurs fois : Whisper par PyAV, la mesure de
+sonie par FFmpeg, la VAD du chemin par lots par `decode_audio`, chacun sur
+la vidéo d'origine (H.264 compris dans le conteneur à parcourir). Ici un
+seul passage FFmpeg écrit l'audio en PCM brut (`s16le`, 16 kHz, mono — le
+format de travail de Whisper et de sa VAD) dans `<data_dir>/audio/`. Les lecteurs
+l'ouvrent en `numpy.memmap` et n'en lisent que la tranche voulue : une
+fenêtre de 45 s d'un direct de 3 h ne charge que ses 1,4 Mo.
+
+Le même passage mesure la sonie (vortex/sonie.py) sur une seconde branche,
+à partir de l'audio D'ORIGINE : la normalisation en deux passes s'applique
+à la piste stéréo 48 kHz du rendu, une mesure sur le PCM mono 16 kHz serait
+décalée (+3 LU pour une stéréo à deux canaux identiques). La mesure est
+gardée à côté du PCM (`.sonie.json`) : une entrée en cache la rend sans
+rien relire.
+
+Entiers 16 bits plutôt que float16 : même taille (115 Mo par heure),
+aucune perte sur une source déjà en AAC, et lisible tel quel par FFmpeg.
+
+Une entrée vaut pour un fichier précis (chemin, taille, date de
+modification dans la clé) ; une source retéléchargée en produit une
+nouvelle, l'ancienne vieillit et part. Le dossier est borné (`[whisper]
+audio_cache_mo`, voir `Cache`) : au-delà, les entrées lues le moins
+récemment sont effacées (la date de modification sert de date de dernier
+accès, `atime` n'étant pas fiable).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+log = logging.getLogger("vortex.audio")
+
+ECHANTILLONNAGE = 16000
+OCTETS_PAR_S = 2 * ECHANTILLONNAGE
+# Attente maximale entre deux tentatives de reconnexion d'une lecture HTTP.
+RECONNEXION_MAX_S = 30
+
+
+class AudioError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class Cache:
+    """Dossier du cache et plafond en octets (voir `cache_de`)."""
+    dossier: Path
+    budget: int
+
+
+def cache_de(cfg) -> Cache:
+    """Cache audio de la configuration : `<data_dir>/audio`, borné à
+    `audio_cache_mo`."""
+    return Cache(Path(cfg.data_dir) / "audio", int(cfg.audio_cache_mo) * 1024 ** 2)
+
+
+def _fichier(cache: Cache, source: Path, cle: str | None = None) -> Path:
+    if cle:
+        return cache.dossier / f"{cle}.pcm"
+    infos = source.stat()
+    cle = hashlib.sha1(f"{source.resolve()}|{infos.st_size}|{infos.st_mtime_ns}"
+                       .encode("utf-8")).hexdigest()[:12]
+    return cache.dossier / f"{source.stem}-{cle}.pcm"
+
+
+def _fichier_sonie(pcm_fichier: Path) -> Path:
+    return pcm_fichier.with_suffix(".sonie.json")
+
+
+def _evincer(cache: Cache, garder: Path) -> None:
+    """Ramène le cache sous son budget, les entrées les moins récemment lues
+    d'abord (avec leur mesure de sonie)."""
+    entrees = []
+    for f in cache.dossier.glob("*.pcm"):
+        try:
+            infos = f.stat()
+        except OSError:
+            continue                       # effacé par un autre processus
+        entrees.append((infos.st_mtime, infos.st_size, f))
+    total = sum(taille for _, taille, _ in entrees)
+    for _, taille, f in sorted(entrees):
+        if total <= cache.budget:
+            break
+        if f == garder:
+            continue
+        f.unlink(missing_ok=True)
+        _fichier_sonie(f).unlink(missing_ok=True)
+        total -= taille
+        log.debug("Audio évincé du cache : %s", f.name)
+
+
+def _decoder(cache: Cache, source: Path, cible: Path, *, sonie: bool, video_id: int | None):
+    from .lanceur import lancer
+    from .textdetect import find_ffmpeg
+
+    provisoire = cible.with_suffix(f".{os.getpid()}.part")
+    cmd = [find_ffmpeg(), "-hide_banner", "-nostdin", "-i", str(source)]
+    if sonie:
+        from .sonie import CIBLE
+        cmd += ["-map", "0:a:0", "-af", f"loudnorm={CIBLE}:print_format=json",
+                "-f", "null", "-"]
+    cmd += ["-map", "0:a:0", "-ac", "1", "-ar", str(ECHANTILLONNAGE),
+            "-f", "s16le", "-y", str(provisoire)]
+    cache.dossier.mkdir(parents=True, exist_ok=True)
+    passage = lancer(cmd, etape="audio", video_id=video_id, timeout=3600)
+    if passage.code != 0 or not provisoire.is_file():
+        provisoire.unlink(missing_ok=True)
+        erreur = passage.stderr.decode("utf-8", "replace")
+        if "matches no streams" in erreur or "does not contain any stream" in erreur:
+            # Même exception que PyAV : transcribe en fait un BLOCKED.
+            raise IndexError(f"aucune piste audio dans {source.name}")
+        derniere = (erreur.strip().splitlines() or [f"code {passage.code}"])[-1]
+        raise AudioError(f"décodage audio de {source.name} : {derniere}")
+    provisoire.replace(cible)
+    return passage
+
+
+def en_cache(cle: str, *, cache: Cache) -> Path | None:
+    """PCM gardé sous `cle` (voir `pcm`), ou None."""
+    fichier = _fichier(cache, Path(), cle)
+    try:
+        os.utime(fichier)
+    except OSError:
+        return None
+    return fichier
+
+
+def pcm(source: str | Path, *, cache: Cache, video_id: int | None = None,
+        cle: str | None = None) -> Path:
+    """Fichier PCM de `source`, décodé au premier appel.
+
+    `cle` : nom d'entrée choisi par l'appelant, pour une source éphémère
+    (audio d'un direct téléchargé dans un dossier temporaire) dont il
+    garantit l'identité ; `en_cache(cle)` la retrouve sans la source.
+
+    FileNotFoundError si FFmpeg ou la source manquent, IndexError si la
+    source n'a pas de piste audio, AudioError sinon.
+    """
+    return pcm_et_sonie(source, cache=cache, video_id=video_id, sonie=False, cle=cle)[0]
+
+
+def pcm_et_sonie(source: str | Path, *, cache: Cache, video_id: int | None = None,
+                 sonie: bool = True, cle: str | None = None) -> tuple[Path, dict | None]:
+    """(PCM, mesures de sonie) de `source` en un seul décodage.
+
+    PCM déjà en cache : la mesure est relue dans son `.sonie.json`. Elle
+    n'est refaite (sonie.mesurer, audio seul) que pour une entrée décodée
+    sans elle.
+    """
+    from . import sonie as mod_sonie
+
+    source = Path(source)
+    cible = _fichier(cache, source, cle)
+    mesure = None
+    if cible.is_file():
+        os.utime(cible)                    # lue à l'instant : la dernière à partir
+        if sonie:
+            try:
+                mesure = json.loads(_fichier_sonie(cible).read_text(encoding="utf-8"))["sonie"]
+            except (OSError, ValueError, KeyError):
+                from .textdetect import find_ffmpeg
+                mesure = mod_sonie.mesurer(find_ffmpeg(), source, video_id=video_id)
+                _garder_sonie(cible, mesure)
+        return cible, mesure
+    passage = _decoder(cache, source, cible, sonie=sonie, video_id=video_id)
+    if sonie:
+        mesure = mod_sonie.bilan(passage, source)
+        _garder_sonie(cible, mesure)
+    _evincer(cache, cible)
+    return cible, mesure
+
+
+def _garder_sonie(cible: Path, mesure: dict | None) -> None:
+    """Mesure écrite à côté du PCM. Une mesure nulle (source muette) est
+    gardée aussi : elle ne changerait pas à la relecture."""
+    try:
+        _fichier_sonie(cible).write_text(json.dumps({"sonie": mesure}), encoding="utf-8")
+    except OSError as exc:
+        log.debug("Sonie non gardée pour %s : %s", cible.name, exc)
+
+
+def pcm_fenetres(url: str, departs: list[int], duree_s: int, *, cache: Cache, cle: str,
+                 entetes: dict[str, str] | None = None) -> Path:
+    """PCM des seules fenêtres [depart, depart + duree_s] de `url`, bout à bout.
+
+    La fenêtre i commence à `i * duree_s` dans le fichier produit ; une
+    fenêtre qui dépasse la fin de la source est complétée de silence, pour
+    que ce calcul reste juste. Chaque fenêtre est lue par son propre FFmpeg,
+    cherché AVANT lecture (`-ss` devant `-i`) : sur une adresse HTTP, il ne
+    demande que les octets de la fenêtre (requêtes Range), plus l'index du
+    conteneur.
+
+    Les fenêtres sont lues l'une après l'autre, une connexion à la fois : un
+    seul FFmpeg à une entrée par fenêtre ouvrait d'un coup autant de
+    connexions (36 pour un direct de 3 h), de quoi se faire couper par
+    l'hébergeur. Une connexion coupée en cours de fenêtre est reprise
+    (`-reconnect`, au plus `RECONNEXION_MAX_S` d'attente).
+
+    `entetes` : en-têtes HTTP exigés par l'hébergeur (ceux que yt-dlp
+    fournit avec l'adresse). Mêmes exceptions que `pcm`.
+    """
+    from .lanceur import lancer
+    from .textdetect import find_ffmpeg
+
+    cible = _fichier(cache, Path(), cle)
+    if not departs:
+        raise ValueError("aucune fenêtre demandée")
+    entree = [find_ffmpeg(), "-hide_banner", "-nostdin"]
+    if url.startswith(("http:", "https:")):
+        entree += ["-reconnect", "1", "-reconnect_streamed", "1",
+                   "-reconnect_delay_max", str(RECONNEXION_MAX_S)]
+        if entetes:
+            entree += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in entetes.items())]
+    taille = duree_s * OCTETS_PAR_S
+    provisoire = cible.with_suffix(f".{os.getpid()}.part")
+    morceau = cible.with_suffix(f".{os.getpid()}.fenetre")
+    cache.dossier.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(provisoire, "wb") as sortie:
+            for depart in departs:
+                cmd = entree + ["-ss", str(depart), "-t", str(duree_s), "-i", url,
+                                "-map", "0:a:0", "-ac", "1", "-ar", str(ECHANTILLONNAGE),
+                                "-f", "s16le", "-y", str(morceau)]
+                passage = lancer(cmd, etape="audio_fenetres", duree=duree_s, timeout=600)
+                if passage.code != 0 or not morceau.is_file():
+                    erreur = passage.stderr.decode("utf-8", "replace")
+                    derniere = (erreur.strip().splitlines() or [f"code {passage.code}"])[-1]
+                    raise AudioError(f"fenêtre {depart} s de {cle} : {derniere}")
+                # Exactement duree_s secondes : la fenêtre suivante commence à i * duree_s.
+                donnees = morceau.read_bytes()[:taille]
+                sortie.write(donnees + bytes(taille - len(donnees)))
+    except BaseException:
+        provisoire.unlink(missing_ok=True)
+        raise
+    finally:
+        morceau.unlink(missing_ok=True)
+    provisoire.replace(cible)
+    _evincer(cache, cible)
+    return cible
+
+
+def duree(fichier: Path) -> float:
+    """Durée en secondes d'un fichier PCM du cache."""
+    return fichier.stat().st_size / OCTETS_PAR_S
+
+
+def lire(fichier: Path, debut_s: float = 0.0, duree_s: float | None = None):
+    """Tranche [debut_s, debut_s + duree_s] d'un PCM, en float32 dans [-1, 1]
+    (ce que Whisper et sa VAD attendent). Seule la tranche est lue du disque."""
+    import numpy as np
+
+    if fichier.stat().st_size < 2:          # np.memmap refuse un fichier vide
+        return np.zeros(0, dtype=np.float32)
+    pcm_mm = np.memmap(fichier, dtype="<i2", mode="r")
+    debut = max(0, int(debut_s * ECHANTILLONNAGE))
+    fin = len(pcm_mm) if duree_s is None else debut + int(duree_s * ECHANTILLONNAGE)
+    return pcm_mm[debut:fin].astype(np.float32) / 32768.0
+
+
+def charger(source: str | Path, debut_s: float = 0.0, duree_s: float | None = None,
+            *, cache: Cache, video_id: int | None = None):
+    """Tranche de l'audio de `source`, décodée au besoin puis lue du cache."""
+    return lire(pcm(source, cache=cache, video_id=video_id), debut_s, duree_s)
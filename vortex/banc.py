@@ -0,0 +1,165 @@
+"""Banc d'essai du rendu : `python -m vortex bench render`.
+
+Les réglages de `render.py` (preset, CRF, `-threads 2`, plafond 12 Mbit/s)
+ont été fixés sur des constats ponctuels (« ~10 min/clip en 2K sur ce
+VPS »). Ce banc les mesure sur des sources SYNTHÉTIQUES et reproductibles,
+générées par les sources `lavfi` de FFmpeg (mire `testsrc2` + grain à graine
+fixe, bip sinusoïdal), pour trois cas réels :
+
+- TikTok vertical 576p (habillage léger hedjav) ;
+- vidéo horizontale 1080p (habillage cinéma) ;
+- extrait vertical de 5 min (habillage cinéma d'un long extrait).
+
+Chaque rendu passe par le VRAI graphe : `build_ass` (accroche, badges,
+karaoké sur des mots synthétiques), `graphe_video`, `commande_rendu`, en
+faisant varier preset, nombre de fils et largeur de sortie. On relève
+images/s, vitesse, pic de mémoire, débit produit et SSIM contre la source
+(ramenée à la même définition : les incrustations baissent le SSIM de la
+même quantité à chaque essai, seules les différences comptent).
+
+Les résultats vont dans `data/bench/render-<date>-<commit>.json` ; chaque
+essai est comparé au fichier précédent, pour voir une régression d'un
+commit à l'autre.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+import logging
+import re
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .config import REPO_ROOT, Config
+
+log = logging.getLogger("vortex.banc")
+
+SOURCES = {
+    "tiktok_576p": {"largeur": 576, "hauteur": 1024, "duree": 30, "leger": True},
+    "horizontal_1080p": {"largeur": 1920, "hauteur": 1080, "duree": 30, "leger": False},
+    "extrait_5min": {"largeur": 1080, "hauteur": 1920, "duree": 300, "leger": False},
+}
+PRESETS = ("veryfast", "fast", "medium")
+FILS = (1, 2, 4)
+LARGEURS = (0, 1440)          # 0 : le choix de render.definition_sortie
+
+_PHRASE = ("la foi vient de ce qu'on entend et ce qu'on entend vient de la parole "
+           "de dieu ne crains pas car je suis avec toi").split()
+
+
+def _generer_source(ffmpeg: str, nom: str, dossier: Path) -> Path:
+    """Source synthétique, générée une fois puis réutilisée."""
+    spec = SOURCES[nom]
+    chemin = dossier / f"{nom}.mp4"
+    if chemin.is_file():
+        return chemin
+    dossier.mkdir(parents=True, exist_ok=True)
+    taille, duree = f"{spec['largeur']}x{spec['hauteur']}", spec["duree"]
+    subprocess.run(
+        [ffmpeg, "-nostdin", "-v", "error", "-y",
+         "-f", "lavfi", "-i", f"testsrc2=size={taille}:rate=30:duration={duree}",
+         "-f", "lavfi", "-i", f"sine=frequency=220:beep_factor=4:sample_rate=48000:duration={duree}",
+         # Grain à graine fixe : une mire nue se compresse trop bien pour
+         # ressembler à une captation d'église.
+         "-vf", "noise=alls=12:allf=t:all_seed=7",
+         "-c:v", "libx264", "-preset", "ultrafast", "-crf", "16", "-g", "60",
+         "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "128k", "-shortest", str(chemin)],
+        check=True, capture_output=True, timeout=3600)
+    return chemin
+
+
+def _mots(duree: float, chemin: Path) -> Path:
+    """Mots minutés factices pour que le karaoké du .ass soit rendu aussi."""
+    mots, t = [], 0.0
+    for mot in itertools.cycle(_PHRASE):
+        if t + 0.35 > duree:
+            break
+        mots.append({"w": mot, "s": round(t, 2), "e": round(t + 0.35, 2)})
+        t += 0.4
+    chemin.write_text(json.dumps(mots), encoding="utf-8")
+    return chemin
+
+
+def _ssim(ffmpeg: str, rendu: Path, source: Path, largeur: int, hauteur: int) -> float | None:
+    try:
+        sortie = subprocess.run(
+            [ffmpeg, "-nostdin", "-hide_banner", "-i", str(rendu), "-i", str(source),
+             "-lavfi", f"[1:v]scale={largeur}:{hauteur}:flags=lanczos[ref];[0:v][ref]ssim",
+             "-f", "null", "-"],
+            capture_output=True, text=True, timeout=3600)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    m = re.search(r"All:([\d.]+)", sortie.stderr)
+    return float(m.group(1)) if m else None
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip()
+    except OSError:
+        return ""
+
+
+def banc_rendu(cfg: Config, sources: list[str] | None = None) -> Path:
+    """Lance la matrice d'essais ; retourne le fichier JSON écrit."""
+    from . import render
+    from .lanceur import lancer
+
+    ffmpeg = render.find_ffmpeg()
+    dossier = cfg.data_dir / "bench"
+    precedent = max(dossier.glob("render-*.json"), default=None, key=lambda p: p.stat().st_mtime)
+    anciens = {}
+    if precedent:
+        for r in json.loads(precedent.read_text(encoding="utf-8"))["resultats"]:
+            anciens[(r["source"], r["preset"], r["fils"], r["sortie"])] = r
+
+    resultats = []
+    for nom in sources or list(SOURCES):
+        spec = SOURCES[nom]
+        src = _generer_source(ffmpeg, nom, dossier / "sources")
+        mots = None if spec["leger"] else _mots(spec["duree"], dossier / f"{nom}.json")
+        definitions = sorted({render.definition_sortie(spec["largeur"], spec["hauteur"],
+                                                       spec["leger"], l) for l in LARGEURS})
+        for (out_w, out_h), preset, fils in itertools.product(definitions, PRESETS, FILS):
+            ass = dossier / f"{nom}.ass"
+            ass.write_text(render.build_ass(
+                cfg, width=out_w, height=out_h, duration=spec["duree"],
+                title="Dieu ne t'a pas oublié, relève la tête", words_file=mots,
+                lifted=spec["leger"], video_id=1, luminous=True), encoding="utf-8")
+            vf, _preset, crf = render.graphe_video(out_w, out_h, spec["leger"], ass)
+            sortie = dossier / f"{nom}-{out_w}-{preset}-{fils}.mp4"
+            passage = lancer(render.commande_rendu(ffmpeg, src, sortie, vf=vf, preset=preset,
+                                                   crf=crf, threads=fils, fils_x264=fils),
+                             etape="banc_rendu", sortie=sortie, duree=spec["duree"],
+                             timeout=3600, banc=True)
+            r = {"source": nom, "preset": preset, "fils": fils, "sortie": f"{out_w}x{out_h}",
+                 "crf": crf, "code": passage.code, "mur_s": round(passage.mur_s, 2),
+                 "cpu_s": passage.cpu_s and round(passage.cpu_s, 2),
+                 "fps": passage.fps, "vitesse": passage.vitesse, "pic_mo": passage.pic_mo,
+                 "debit_kbps": passage.octets and round(passage.octets * 8 / spec["duree"] / 1000),
+                 "ssim": _ssim(ffmpeg, sortie, src, out_w, out_h) if passage.code == 0 else None}
+            sortie.unlink(missing_ok=True)
+            ancien = anciens.get((nom, preset, fils, r["sortie"]))
+            ecart = ""
+            if ancien and ancien.get("fps") and r["fps"]:
+                ecart = f"  {100 * (r['fps'] / ancien['fps'] - 1):+.0f} % img/s"
+            print(f"{nom:<17} {r['sortie']:>9} {preset:<8} {fils} fil(s) : "
+                  f"{r['fps'] or 0:>6.1f} img/s  ×{r['vitesse'] or 0:<5.2f} "
+                  f"{r['pic_mo'] or 0:>5} Mo  {r['debit_kbps'] or 0:>6} kb/s  "
+                  f"SSIM {'%.4f' % r['ssim'] if r['ssim'] else '—'}{ecart}")
+            resultats.append(r)
+        (dossier / f"{nom}.ass").unlink(missing_ok=True)
+
+    horodatage = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    commit = _commit()
+    fichier = dossier / f"render-{horodatage}-{commit or 'sans-git'}.json"
+    fichier.write_text(json.dumps({
+        "commit": commit, "date": horodatage,
+        "ffmpeg": render._version_ffmpeg(ffmpeg),
+        "coeurs": render.coeurs_disponibles(), "memoire_mo": render.memoire_disponible_mo(),
+        "precedent": precedent.name if precedent else None,
+        "resultats": resultats}, indent=1, ensure_ascii=False), encoding="utf-8")
+    return fichier
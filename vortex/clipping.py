@@ -243,40 +243,49 @@ def _trier_et_enregistrer(cfg: Config, db: Database, src, projet_id: str,
     retenus = sum(1 for c in db.clips_de_source(src["youtube_id"]) if c["etat"] == "RETENU")
     ecartes = 0
 
-    for rang, extrait in enumerate(extraits):
-        assez_bon = extrait["score_total"] >= cfg.note_minimale
-        dans_le_quota = retenus < cfg.clips_retenus_par_source
-        etat = "RETENU" if (assez_bon and dans_le_quota) else "ECARTE"
-
-        nouveau = db.ajouter_clip({
-            "id": extrait["id"] or f"{projet_id}-{rang}",
-            "source_id": src["youtube_id"],
-            "submagic_projet": projet_id,
-            "titre": extrait["titre"],
-            "duree_s": extrait["duree_s"],
-            "score_total": extrait["score_total"],
-            # OpusClip ne rend qu'une note globale ; Submagic la détaille en
-            # quatre. On lit donc en tolérant l'absence plutôt que d'exiger
-            # des champs qu'un seul des deux moteurs fournit.
-            "score_hook": extrait.get("score_hook"),
-            "score_partage": extrait.get("score_partage"),
-            "score_histoire": extrait.get("score_histoire"),
-            "score_emotion": extrait.get("score_emotion"),
-            "download_url": extrait["download_url"],
-            "direct_url": extrait["direct_url"],
-            "preview_url": extrait.get("preview_url", ""),
-            "etat": etat,
-        })
-        if not nouveau:
-            continue
-        if etat == "ECARTE":
-            ecartes += 1
-            continue
+    # Les inscriptions partent en un seul commit ; les légendes, elles,
+    # attendent l'IA et le réseau : on les rédige HORS transaction, pour ne
+    # pas tenir le verrou d'écriture pendant un appel distant ni perdre les
+    # inscriptions si l'un d'eux échoue.
+    a_rediger: list[tuple[str, dict]] = []
+    with db.transaction():
+        for rang, extrait in enumerate(extraits):
+            assez_bon = extrait["score_total"] >= cfg.note_minimale
+            dans_le_quota = retenus < cfg.clips_retenus_par_source
+            etat = "RETENU" if (assez_bon and dans_le_quota) else "ECARTE"
+
+            clip_id = extrait["id"] or f"{projet_id}-{rang}"
+            nouveau = db.ajouter_clip({
+                "id": clip_id,
+                "source_id": src["youtube_id"],
+                "submagic_projet": projet_id,
+                "titre": extrait["titre"],
+                "duree_s": extrait["duree_s"],
+                "score_total": extrait["score_total"],
+                # OpusClip ne rend qu'une note globale ; Submagic la détaille en
+                # quatre. On lit donc en tolérant l'absence plutôt que d'exiger
+                # des champs qu'un seul des deux moteurs fournit.
+                "score_hook": extrait.get("score_hook"),
+                "score_partage": extrait.get("score_partage"),
+                "score_histoire": extrait.get("score_histoire"),
+                "score_emotion": extrait.get("score_emotion"),
+                "download_url": extrait["download_url"],
+                "direct_url": extrait["direct_url"],
+                "preview_url": extrait.get("preview_url", ""),
+                "etat": etat,
+            })
+            if not nouveau:
+                continue
+            if etat == "ECARTE":
+                ecartes += 1
+                continue
+
+            retenus += 1
+            a_rediger.append((clip_id, extrait))
 
-        retenus += 1
+    for clip_id, extrait in a_rediger:
         legende, hashtags = _rediger_legende(cfg, src, extrait)
-        db.maj_clip(extrait["id"] or f"{projet_id}-{rang}",
-                    legende=legende, hashtags=" ".join(f"#{h}" for h in hashtags))
+        db.maj_clip(clip_id, legende=legende, hashtags=" ".join(f"#{h}" for h in hashtags))
     return retenus, ecartes
 
 
@@ -81,6 +81,14 @@ class Config:
     whisper_model: str = "small"
     whisper_device: str = "cpu"
     whisper_compute: str = "int8"
+    # Transcriptions simultanées et fenêtres de 30 s par passe du pipeline
+    # par lots (0 = un clip à la fois, comme avant). Voir transcribe.py.
+    whisper_workers: int = 1
+    whisper_batch: int = 0
+    # Cache de l'audio décodé (vortex/audio.py), dans data_dir/audio. Deux
+    # Gio : une vingtaine d'heures, les clips en attente de transcription et
+    # quelques directs à écouter.
+    audio_cache_mo: int = 2048
 
     # SEO
     channel_name: str = "Sophos PropheTikos"
@@ -92,6 +100,31 @@ class Config:
     # Vidéo
     shorts_max_seconds: int = 180
     min_duration_seconds: int = 5
+    # Rendus FFmpeg simultanés (0 = un par paire de cœurs accordés au
+    # conteneur) et mémoire qu'ils peuvent se partager (0 = plafond du cgroup,
+    # moins une marge). Voir render.render_pending.
+    render_jobs: int = 0
+    render_memoire_mo: int = 0
+    # Habillage léger : ne réencoder que les segments où une incrustation
+    # paraît, copier le reste (voir vortex/rendu_partiel.py).
+    rendu_partiel: bool = False
+    # Habillage cinéma des longs extraits : nombre de segments encodés en
+    # parallèle (0 = un seul FFmpeg). Chaque segment prend FFMPEG_THREADS
+    # cœurs et la mémoire d'un rendu entier.
+    render_segments: int = 0
+    # Sorties produites dans la même passe que le master : "story" (58 s,
+    # sinon découpée à la publication) et "apercu" (360 px, tableau de bord).
+    # Voir vortex/plan_rendu.py.
+    render_sorties: list[str] = field(default_factory=list)
+    # Rendu juste-à-temps : habiller chaque vidéo d'après le créneau qu'elle
+    # occupera plutôt que tenir deux jours d'avance (render._calendrier_jit).
+    # Marge avant le créneau, et intervalle entre deux passages du pipeline.
+    render_jit: bool = False
+    render_jit_marge_min: int = 90
+    render_jit_cycle_min: int = 360
+    # Volume froid (disque moins cher) où chaque rendu est copié sous son
+    # empreinte : un rendu effacé des exports s'y récupère sans réencoder.
+    render_cache_froid: Path | None = None
 
     # Découpage des longues vidéos YouTube (Submagic)
     chaines_surveillees: list[dict] = field(default_factory=list)
@@ -141,6 +174,10 @@ class Config:
     def db_file(self) -> Path:
         return self.data_dir / "vortex.db"
 
+    @property
+    def whisper_socket(self) -> Path:
+        return self.data_dir / "whisper.sock"
+
     @property
     def transcripts_dir(self) -> Path:
         return self.data_dir / "transcripts"
@@ -211,6 +248,9 @@ def load_config(config_file: Path | None = None) -> Config:
         whisper_model=whisper.get("model", "small"),
         whisper_device=whisper.get("device", "cpu"),
         whisper_compute=whisper.get("compute_type", "int8"),
+        whisper_workers=int(whisper.get("workers", 1)),
+        whisper_batch=int(whisper.get("batch_size", 0)),
+        audio_cache_mo=int(whisper.get("audio_cache_mo", 2048)),
         channel_name=seo.get("channel_name", "Sophos PropheTikos"),
         known_speakers=list(seo.get("known_speakers", ["Jacques Amessan", "Mohammed Sanogo"])),
         hashtags=list(seo.get("hashtags", ["#foi", "#motivation", "#predication"])),
@@ -218,6 +258,16 @@ def load_config(config_file: Path | None = None) -> Config:
         tags_count=int(seo.get("tags_count", 15)),
         shorts_max_seconds=int(video.get("shorts_max_seconds", 180)),
         min_duration_seconds=int(video.get("min_duration_seconds", 5)),
+        render_jobs=int(video.get("render_jobs", 0)),
+        render_memoire_mo=int(video.get("render_memoire_mo", 0)),
+        rendu_partiel=bool(video.get("rendu_partiel", False)),
+        render_segments=int(video.get("render_segments", 0)),
+        render_sorties=list(video.get("render_sorties", [])),
+        render_jit=bool(video.get("render_jit", False)),
+        render_jit_marge_min=int(video.get("render_jit_marge_min", 90)),
+        render_jit_cycle_min=int(video.get("render_jit_cycle_min", 360)),
+        render_cache_froid=(_path(paths["render_cache_froid"])
+                            if paths.get("render_cache_froid") else None),
         # [[clipping.chaines]] est une liste de tables TOML : chaque entrée est
         # déjà un dict {handle, id, nom, pasteur, eglise, pasteur_unique}.
         chaines_surveillees=list(clipping.get("chaines", [])),
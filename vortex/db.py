@@ -8,7 +8,10 @@ avec FAILED / BLOCKED / SKIPPED possibles à tout moment.
 from __future__ import annotations
 
 import json
+import re
 import sqlite3
+import unicodedata
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
 
@@ -24,6 +27,7 @@ CREATE TABLE IF NOT EXISTS videos (
     path TEXT NOT NULL,
     tiktok_id TEXT,
     sha256 TEXT UNIQUE,
+    fast_fp TEXT,                  -- taille + hash début/milieu/fin (voir scanner)
     size_bytes INTEGER,
     duration_s REAL,
     width INTEGER,
@@ -52,14 +56,139 @@ CREATE TABLE IF NOT EXISTS events (
     detail TEXT,
     at TEXT NOT NULL
 );
+CREATE TABLE IF NOT EXISTS replied_comments (
+    comment_id TEXT PRIMARY KEY,
+    video_youtube_id TEXT,
+    replied_at TEXT
+);
 CREATE TABLE IF NOT EXISTS channel_videos (
     youtube_id TEXT PRIMARY KEY,
     title TEXT,
     published_at TEXT,
-    fetched_at TEXT NOT NULL
+    fetched_at TEXT NOT NULL,
+    nb_jetons INTEGER
 );
+-- Index inversé des titres en ligne (mot normalisé -> vidéo), tenu à jour par
+-- `record_channel_video`. L'anti-republication n'examine ainsi que les
+-- vidéos qui partagent au moins un mot avec la candidate.
+CREATE TABLE IF NOT EXISTS channel_tokens (
+    token TEXT NOT NULL,
+    youtube_id TEXT NOT NULL,
+    PRIMARY KEY (token, youtube_id)
+) WITHOUT ROWID;
 CREATE INDEX IF NOT EXISTS idx_videos_state ON videos(state);
 
+-- Empreintes déjà calculées, par fichier. Un fichier dont la taille, la date
+-- de modification (ns) et l'inode n'ont pas bougé n'est ni relu ni sondé.
+CREATE TABLE IF NOT EXISTS scan_cache (
+    path TEXT PRIMARY KEY,
+    size_bytes INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    fast_fp TEXT NOT NULL,
+    sha256 TEXT,                   -- NULL tant que le hachage complet n'est pas fait
+    probe TEXT,                    -- JSON de probe() ; NULL = fichier illisible
+    checked_at TEXT NOT NULL
+);
+-- Légendes TikTok d'origine, importées au fil des scans depuis la base de
+-- 4K Tokkit. `tokkit_rowid` sert de repère : seules les lignes au-delà du
+-- plus grand déjà vu sont relues.
+CREATE TABLE IF NOT EXISTS tokkit_captions (
+    tiktok_id TEXT PRIMARY KEY,
+    caption TEXT NOT NULL,
+    tokkit_rowid INTEGER NOT NULL
+);
+
+-- Upload YouTube en cours : URI de la session résumable et octets déjà
+-- accusés par le serveur. `updated_at` avance à chaque morceau envoyé et
+-- sert de signe de vie (voir requalify_stale_uploads).
+CREATE TABLE IF NOT EXISTS upload_sessions (
+    video_id INTEGER PRIMARY KEY REFERENCES videos(id),
+    session_uri TEXT NOT NULL,
+    offset_bytes INTEGER NOT NULL,
+    empreinte TEXT NOT NULL,
+    publish_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+-- File d'envoi vers Facebook et Instagram, vidée par `vortex social-worker`.
+-- `cle` empêche de poster deux fois la même chose sur le même canal (un clip
+-- publié puis repris par le rattrapage, une story relancée dans l'heure).
+CREATE TABLE IF NOT EXISTS social_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cle TEXT NOT NULL UNIQUE,
+    canal TEXT NOT NULL,              -- facebook_video|instagram_reel|facebook_story|instagram_story
+    path TEXT NOT NULL,
+    legende TEXT,
+    origine TEXT,                     -- publish|backfill|story
+    etat TEXT NOT NULL DEFAULT 'A_ENVOYER',  -- A_ENVOYER|EN_COURS|ENVOYE|ECHEC
+    bail TEXT,                        -- EN_COURS : échéance, prolongée tant que le worker envoie
+    essais INTEGER NOT NULL DEFAULT 0,
+    prochain_essai TEXT NOT NULL,
+    resultat TEXT,                    -- identifiant du post renvoyé par Meta
+    erreur TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_etat ON social_outbox(etat, prochain_essai);
+
+-- Pic de mémoire (RSS) mesuré pour chaque profil de rendu FFmpeg
+-- (définition, preset, léger ou cinéma). L'ordonnanceur de `render_pending`
+-- s'en sert pour corriger son estimation quand le réel la dépasse.
+CREATE TABLE IF NOT EXISTS render_rss (
+    profil TEXT PRIMARY KEY,
+    pic_mo INTEGER NOT NULL,
+    mesures INTEGER NOT NULL,
+    updated_at TEXT NOT NULL
+);
+
+-- Manifeste des rendus, adressé par contenu : `cle` condense l'empreinte de
+-- la source, le .ass, le graphe de filtres, les réglages d'encodage et la
+-- version de FFmpeg. Deux rendus de même clé sont identiques octet pour
+-- octet, on réutilise donc l'un plutôt que de réencoder. `cout_s` (durée de
+-- l'encodage) dit ce que coûterait de le refaire : free_space.py efface
+-- d'abord ce qui se refait vite.
+CREATE TABLE IF NOT EXISTS render_cache (
+    cle TEXT PRIMARY KEY,
+    video_id INTEGER,
+    path TEXT NOT NULL,               -- rendu dans data/exports (peut avoir été effacé)
+    froid TEXT,                       -- copie sur le volume froid, NULL sans
+    taille INTEGER NOT NULL,
+    cout_s REAL NOT NULL,
+    created_at TEXT NOT NULL,
+    used_at TEXT NOT NULL
+);
+
+-- Fichiers produits par un rendu, un par rôle : `youtube` (le master,
+-- aussi dans videos.render_path), `story`, `apercu` (vortex/plan_rendu.py).
+CREATE TABLE IF NOT EXISTS render_outputs (
+    video_id INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    path TEXT NOT NULL,
+    taille INTEGER NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (video_id, role)
+);
+
+-- Un passage FFmpeg par ligne (rendu, habillage, story, images OCR), relevé
+-- par vortex/lanceur.py : durée réelle, temps CPU, pic de mémoire, taille
+-- produite, dernières images/s et vitesse annoncées. Lu par `vortex perf`.
+CREATE TABLE IF NOT EXISTS stage_runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    video_id INTEGER,
+    etape TEXT NOT NULL,
+    debut TEXT NOT NULL,
+    mur_s REAL NOT NULL,
+    cpu_s REAL,
+    pic_mo INTEGER,
+    octets INTEGER,
+    fps REAL,
+    vitesse REAL,
+    code INTEGER NOT NULL,
+    banc INTEGER NOT NULL DEFAULT 0   -- essai de `vortex bench`, hors statistiques
+);
+CREATE INDEX IF NOT EXISTS idx_stage_runs_etape ON stage_runs(etape, debut);
+
 -- ------------------------------------------------------------------------
 -- Découpage des longues vidéos YouTube (Submagic). Tables séparées de
 -- `videos` : une source n'est pas une vidéo à publier, c'est un gisement de
@@ -112,29 +241,29 @@ CREATE INDEX IF NOT EXISTS idx_clips_etat ON clips(etat);
 """
 
 
-def utcnow() -> str:
-    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
-
-
-class Database:
-    def __init__(self, db_file: Path):
-        db_file.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(db_file, timeout=15)
-        self.conn.row_factory = sqlite3.Row
-        self.conn.execute("PRAGMA busy_timeout = 15000")
-        self.conn.execute("PRAGMA journal_mode = WAL")
-        self.conn.executescript(SCHEMA)
-        self._migrer()
-        self.conn.commit()
-
-    def _migrer(self) -> None:
-        """Ajoute les colonnes apparues après la création d'une base.
-
-        `CREATE TABLE IF NOT EXISTS` ne touche pas une table déjà présente :
-        sans ceci, une base créée avant l'ajout d'une colonne resterait
-        incomplète et le pipeline planterait sur un `no such column`.
-        """
-        ajouts = {
+# Migrations versionnées, appliquées dans l'ordre à l'ouverture de la base.
+# Ne JAMAIS modifier une migration déjà livrée : en ajouter une à la fin.
+# Chaque entrée peut ajouter des colonnes (ignorées si déjà présentes) et
+# exécuter du SQL.
+MIGRATIONS: list[dict] = [
+    # 1 — tout ce qui était ajouté avant le versionnage, dont les colonnes que
+    # render, thumbs, textdetect, metadata et engage créaient à la volée à
+    # chaque appel (PRAGMA table_info, souvent une fois par vidéo).
+    {
+        "colonnes": {
+            "videos": {
+                # Empreinte rapide (taille + début/milieu/fin). Le SHA-256
+                # complet n'est calculé qu'en cas de collision, ou plus tard
+                # par `vortex rehash`.
+                "fast_fp": "TEXT",
+                "render_path": "TEXT",       # rendu habillé (data/exports)
+                "thumb_path": "TEXT",        # miniature Vortex (data/thumbs)
+                "has_text": "TEXT",          # texte incrusté : texte|sans_texte|douteux
+                "speaker": "TEXT",           # pasteur lu à l'écran ou validé par l'IA
+                "thumb_title": "TEXT",       # accroche courte (miniature + hook)
+                "thumb_theme": "TEXT",       # ambiance visuelle du fond de miniature
+                "seed_comment_id": "TEXT",   # question épinglée (engage)
+            },
             "clips": {
                 "programme_at": "TEXT",
                 "publication_id": "TEXT",
@@ -161,36 +290,196 @@ class Database:
                 "fenetre_source": "TEXT",
                 "fenetre_raison": "TEXT",
             },
-        }
-        for table, colonnes in ajouts.items():
-            existantes = {r["name"] for r in
-                          self.conn.execute(f"PRAGMA table_info({table})").fetchall()}
-            for nom, type_sql in colonnes.items():
-                if nom not in existantes:
-                    self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {nom} {type_sql}")
+        },
+        # Premier cache du scanner : SHA-256 obligatoire, pas d'empreinte
+        # rapide. Ce n'est qu'un cache — le vider coûte un scan complet.
+        "sql": """
+            CREATE INDEX IF NOT EXISTS idx_videos_fast_fp ON videos(fast_fp);
+            DROP TABLE IF EXISTS scan_cache;
+        """,
+        # Les jumeaux ne se cherchent plus que par empreinte rapide : on la
+        # calcule pour les vidéos déjà inscrites dont le fichier est là.
+        "reprise": "_remplir_empreintes_rapides",
+    },
+    # 2 — index inversé des titres de la chaîne, rempli pour les vidéos déjà
+    # synchronisées avant lui.
+    {
+        "colonnes": {"channel_videos": {"nb_jetons": "INTEGER"}},
+        "sql": """
+            CREATE TABLE IF NOT EXISTS channel_tokens (
+                token TEXT NOT NULL,
+                youtube_id TEXT NOT NULL,
+                PRIMARY KEY (token, youtube_id)
+            ) WITHOUT ROWID;
+        """,
+        "reprise": "_indexer_titres_chaine",
+    },
+    # 3 — sonie EBU R128 de la source, mesurée à la transcription (voir
+    # vortex/sonie.py) : le rendu normalise en deux passes sans la refaire.
+    {
+        "colonnes": {
+            "videos": {
+                "sonie_i": "REAL",           # sonie intégrée, LUFS
+                "sonie_lra": "REAL",         # plage de sonie, LU
+                "sonie_tp": "REAL",          # pic vrai, dBTP
+                "sonie_seuil": "REAL",       # seuil de blocage, LUFS
+                "sonie_decalage": "REAL",    # target_offset de loudnorm, LU
+            },
+        },
+    },
+    # 4 — passages du banc d'essai (vortex/banc.py) marqués : leurs sources
+    # synthétiques et leurs réglages hors production fausseraient `vortex perf`.
+    {
+        "colonnes": {"stage_runs": {"banc": "INTEGER NOT NULL DEFAULT 0"}},
+    },
+    # 5 — bail des envois en cours : un upload Facebook plus long qu'une
+    # heure n'est plus repris (et posté deux fois) par un autre worker.
+    {
+        "colonnes": {"social_outbox": {"bail": "TEXT"}},
+    },
+]
+
+
+def normaliser_titre(text: str) -> set[str]:
+    """Mots d'au moins trois lettres, sans casse ni accents."""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return set(re.findall(r"[a-z0-9]{3,}", text))
+
+
+def utcnow() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _dans(minutes: float) -> str:
+    """Horodatage `utcnow` décalé de `minutes` (négatif : dans le passé)."""
+    from datetime import timedelta
+    return (datetime.now(timezone.utc) + timedelta(minutes=minutes)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Database:
+    def __init__(self, db_file: Path):
+        db_file.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_file, timeout=15)
+        self.conn.row_factory = sqlite3.Row
+        # Profondeur des `transaction()` imbriquées et événements en attente.
+        self._differe = 0
+        self._evenements: list[tuple] = []
+        self.conn.execute("PRAGMA busy_timeout = 15000")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.executescript(SCHEMA)
+        self._migrer()
+        self.conn.commit()
+
+    def _migrer(self) -> None:
+        """Applique, une seule fois chacune, les migrations pas encore passées.
+
+        `CREATE TABLE IF NOT EXISTS` ne touche pas une table déjà présente :
+        sans ceci, une base créée avant l'ajout d'une colonne resterait
+        incomplète et le pipeline planterait sur un `no such column`.
+        `PRAGMA user_version` retient la dernière migration appliquée : une
+        base à jour ne coûte qu'une lecture de ce numéro à l'ouverture.
+        """
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= len(MIGRATIONS):
+            return
+        for numero, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            for table, colonnes in migration.get("colonnes", {}).items():
+                existantes = {r["name"] for r in
+                              self.conn.execute(f"PRAGMA table_info({table})").fetchall()}
+                for nom, type_sql in colonnes.items():
+                    if nom not in existantes:
+                        self.conn.execute(f"ALTER TABLE {table} ADD COLUMN {nom} {type_sql}")
+            if migration.get("sql"):
+                self.conn.executescript(migration["sql"])
+            if migration.get("reprise"):
+                getattr(self, migration["reprise"])()
+            self.conn.execute(f"PRAGMA user_version = {numero}")
+        # Une table supprimée par une migration repart du schéma courant.
+        self.conn.executescript(SCHEMA)
 
     def close(self) -> None:
         self.conn.close()
 
+    # --------------------------------------------------------- unité de travail
+    @contextmanager
+    def transaction(self):
+        """Regroupe toutes les écritures du bloc en un seul commit.
+
+        Chaque méthode d'écriture committe d'ordinaire aussitôt : c'est sûr,
+        mais chaque commit est un fsync, et sur le disque du VPS une
+        synchronisation de chaîne (plusieurs centaines de vidéos) ou un scan
+        passait l'essentiel de son temps à attendre le disque. Dans le bloc,
+        les commits sont différés et les lignes du journal `events` mises de
+        côté, puis écrites d'un seul `executemany` juste avant l'unique commit.
+
+        Les blocs s'imbriquent : seul le plus extérieur committe. Une
+        exception annule TOUT le bloc (rollback) avant d'être relancée — à
+        l'appelant de garder ses blocs courts s'il veut conserver le travail
+        déjà fait, et de ne pas y attendre le réseau : le verrou d'écriture
+        SQLite reste pris jusqu'au commit.
+        """
+        self._differe += 1
+        try:
+            yield self
+        except BaseException:
+            self._differe -= 1
+            if not self._differe:
+                self._evenements.clear()
+                self.conn.rollback()
+            raise
+        self._differe -= 1
+        if not self._differe:
+            self._commit()
+
+    def _commit(self) -> None:
+        """Committe, sauf à l'intérieur d'une `transaction()`."""
+        if self._differe:
+            return
+        if self._evenements:
+            self.conn.executemany(
+                "INSERT INTO events (video_id, from_state, to_state, detail, at) VALUES (?,?,?,?,?)",
+                self._evenements,
+            )
+            self._evenements.clear()
+        self.conn.commit()
+
+    def _journaliser(self, video_id: int, from_state: str | None, to_state: str,
+                     detail: str, at: str) -> None:
+        """Ajoute une ligne au journal, écrite au prochain commit effectif."""
+        self._evenements.append((video_id, from_state, to_state, detail, at))
+
     # ------------------------------------------------------------------ vidéos
     def upsert_video(self, info: dict) -> tuple[int, bool]:
         """Insère une vidéo découverte. Retourne (id, est_nouvelle).
 
         Le dédoublonnage se fait sur sha256 (résiste au renommage) puis sur name.
+        Le scanner ne fournit le sha256 que si l'empreinte rapide `fast_fp`
+        collisionne déjà en base ; sans collision, aucun doublon n'est
+        possible. Une ligne dont le sha256 n'est pas encore calculé (et dont
+        le fichier a disparu) est reconnue sur son empreinte rapide.
         """
         cur = self.conn.cursor()
         row = None
         if info.get("sha256"):
             row = cur.execute("SELECT * FROM videos WHERE sha256 = ?", (info["sha256"],)).fetchone()
+        if row is None and info.get("fast_fp"):
+            row = cur.execute("SELECT * FROM videos WHERE fast_fp = ? AND sha256 IS NULL",
+                              (info["fast_fp"],)).fetchone()
         if row is None:
             row = cur.execute("SELECT * FROM videos WHERE name = ?", (info["name"],)).fetchone()
         if row is not None:
             video_id = int(row["id"])
+            modifie = (
+                (info.get("fast_fp") and row["fast_fp"] and info["fast_fp"] != row["fast_fp"])
+                or (info.get("sha256") and row["sha256"] and info["sha256"] != row["sha256"])
+            )
             # Fichier modifié depuis (téléchargement terminé, remplacement…) :
             # on rafraîchit les métadonnées et on redonne sa chance à la vidéo.
-            if info.get("sha256") and row["sha256"] and info["sha256"] != row["sha256"]:
+            if modifie:
                 self.update_fields(
-                    video_id, sha256=info["sha256"], path=info["path"],
+                    video_id, sha256=info.get("sha256"), fast_fp=info.get("fast_fp"),
+                    path=info["path"],
                     size_bytes=info.get("size_bytes"), duration_s=info.get("duration_s"),
                     width=info.get("width"), height=info.get("height"),
                     category=info.get("category"),
@@ -206,29 +495,31 @@ class Database:
                     updates["cover_path"] = info["cover_path"]
                 if info.get("caption") and not row["caption"]:
                     updates["caption"] = info["caption"]
+                if info.get("sha256") and not row["sha256"]:
+                    updates["sha256"] = info["sha256"]
+                if info.get("fast_fp") and not row["fast_fp"]:
+                    updates["fast_fp"] = info["fast_fp"]
                 if updates:
                     self.update_fields(video_id, **updates)
             return video_id, False
 
         now = utcnow()
         cur.execute(
-            """INSERT INTO videos (name, path, tiktok_id, sha256, size_bytes, duration_s,
+            """INSERT INTO videos (name, path, tiktok_id, sha256, fast_fp, size_bytes, duration_s,
                                    width, height, category, caption, cover_path,
                                    state, created_at, updated_at)
-               VALUES (?,?,?,?,?,?,?,?,?,?,?,'DISCOVERED',?,?)""",
+               VALUES (?,?,?,?,?,?,?,?,?,?,?,?,'DISCOVERED',?,?)""",
             (
                 info["name"], info["path"], info.get("tiktok_id"), info.get("sha256"),
+                info.get("fast_fp"),
                 info.get("size_bytes"), info.get("duration_s"), info.get("width"),
                 info.get("height"), info.get("category"), info.get("caption"),
                 info.get("cover_path"), now, now,
             ),
         )
         video_id = cur.lastrowid
-        cur.execute(
-            "INSERT INTO events (video_id, from_state, to_state, detail, at) VALUES (?,?,?,?,?)",
-            (video_id, None, "DISCOVERED", "scan", now),
-        )
-        self.conn.commit()
+        self._journaliser(video_id, None, "DISCOVERED", "scan", now)
+        self._commit()
         return int(video_id), True
 
     def set_state(self, video_id: int, state: str, detail: str = "", **fields) -> None:
@@ -243,11 +534,8 @@ class Database:
             f"UPDATE videos SET state = ?, updated_at = ?{', ' + sets if sets else ''} WHERE id = ?",
             [state, now, *params, video_id],
         )
-        cur.execute(
-            "INSERT INTO events (video_id, from_state, to_state, detail, at) VALUES (?,?,?,?,?)",
-            (video_id, old["state"] if old else None, state, detail, now),
-        )
-        self.conn.commit()
+        self._journaliser(video_id, old["state"] if old else None, state, detail, now)
+        self._commit()
 
     def update_fields(self, video_id: int, **fields) -> None:
         if not fields:
@@ -257,7 +545,7 @@ class Database:
             f"UPDATE videos SET {sets}, updated_at = ? WHERE id = ?",
             [*fields.values(), utcnow(), video_id],
         )
-        self.conn.commit()
+        self._commit()
 
     def get(self, video_id: int) -> sqlite3.Row | None:
         return self.conn.execute("SELECT * FROM videos WHERE id = ?", (video_id,)).fetchone()
@@ -297,38 +585,291 @@ class Database:
             "WHERE id = ? AND state = 'READY'",
             (publish_at, utcnow(), video_id),
         )
-        self.conn.commit()
+        # Dans une `transaction()`, le verrou d'écriture est déjà tenu depuis
+        # le premier UPDATE : la réservation reste atomique, commit différé.
+        self._commit()
         if cur.rowcount == 1:
-            self.conn.execute(
-                "INSERT INTO events (video_id, from_state, to_state, detail, at) VALUES (?,?,?,?,?)",
-                (video_id, "READY", "UPLOADING", "réservation upload", utcnow()),
-            )
-            self.conn.commit()
+            self._journaliser(video_id, "READY", "UPLOADING", "réservation upload", utcnow())
+            self._commit()
             return True
         return False
 
-    def requalify_stale_uploads(self, max_age_hours: int = 6) -> int:
-        """Repasse en READY les UPLOADING orphelins (crash/coupure pendant l'upload)."""
+    def requalify_stale_uploads(self, max_age_hours: int = 6, silence_min: int = 20) -> int:
+        """Repasse en READY les UPLOADING orphelins (crash/coupure pendant l'upload).
+
+        Un upload qui a une session en base donne signe de vie à chaque
+        morceau envoyé : sans nouvelles depuis `silence_min` minutes, il est
+        orphelin, et sa session reprendra là où elle s'était arrêtée. Sans
+        session, seul l'âge de la réservation compte.
+        """
         from datetime import datetime, timedelta, timezone
-        cutoff = (datetime.now(timezone.utc) - timedelta(hours=max_age_hours)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        now = datetime.now(timezone.utc)
+        cutoff = (now - timedelta(hours=max_age_hours)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        silence = (now - timedelta(minutes=silence_min)).strftime("%Y-%m-%dT%H:%M:%SZ")
         rows = self.conn.execute(
-            "SELECT id FROM videos WHERE state = 'UPLOADING' AND updated_at < ?", (cutoff,)
+            "SELECT v.id FROM videos v LEFT JOIN upload_sessions s ON s.video_id = v.id "
+            "WHERE v.state = 'UPLOADING' AND CASE WHEN s.video_id IS NULL "
+            "THEN v.updated_at < ? ELSE s.updated_at < ? END",
+            (cutoff, silence),
         ).fetchall()
-        for r in rows:
-            self.set_state(r["id"], "READY", "upload orphelin requalifié")
+        with self.transaction():
+            for r in rows:
+                self.set_state(r["id"], "READY", "upload orphelin requalifié")
         return len(rows)
 
+    def session_upload(self, video_id: int) -> sqlite3.Row | None:
+        return self.conn.execute(
+            "SELECT * FROM upload_sessions WHERE video_id = ?", (video_id,)
+        ).fetchone()
+
+    def memoriser_session_upload(self, video_id: int, *, session_uri: str, offset_bytes: int,
+                                 empreinte: str, publish_at: str) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO upload_sessions (video_id, session_uri, offset_bytes, "
+            "empreinte, publish_at, updated_at) VALUES (?,?,?,?,?,?)",
+            (video_id, session_uri, offset_bytes, empreinte, publish_at, utcnow()),
+        )
+        self._commit()
+
+    def oublier_session_upload(self, video_id: int) -> None:
+        self.conn.execute("DELETE FROM upload_sessions WHERE video_id = ?", (video_id,))
+        self._commit()
+
+    def pic_rss_rendu(self, profil: str) -> int | None:
+        row = self.conn.execute("SELECT pic_mo FROM render_rss WHERE profil = ?",
+                                (profil,)).fetchone()
+        return int(row["pic_mo"]) if row else None
+
+    def noter_pic_rss_rendu(self, profil: str, pic_mo: int) -> None:
+        """Retient le plus gros pic observé pour ce profil."""
+        self.conn.execute(
+            "INSERT INTO render_rss (profil, pic_mo, mesures, updated_at) VALUES (?,?,1,?) "
+            "ON CONFLICT(profil) DO UPDATE SET pic_mo = MAX(pic_mo, excluded.pic_mo), "
+            "mesures = mesures + 1, updated_at = excluded.updated_at",
+            (profil, pic_mo, utcnow()),
+        )
+        self._commit()
+
+    def rendu_en_cache(self, cle: str) -> sqlite3.Row | None:
+        return self.conn.execute("SELECT * FROM render_cache WHERE cle = ?",
+                                 (cle,)).fetchone()
+
+    def noter_rendu_cache(self, cle: str, *, video_id: int, path: str, taille: int,
+                          cout_s: float | None = None, froid: str | None = None) -> None:
+        """Inscrit un rendu au manifeste, ou note sa réutilisation.
+
+        Une réutilisation ne connaît pas le coût d'encodage : celui de la
+        première fois est gardé, de même que la copie froide.
+        """
+        now = utcnow()
+        self.conn.execute(
+            "INSERT INTO render_cache (cle, video_id, path, froid, taille, cout_s, "
+            "created_at, used_at) VALUES (?,?,?,?,?,?,?,?) "
+            "ON CONFLICT(cle) DO UPDATE SET video_id = excluded.video_id, "
+            "path = excluded.path, taille = excluded.taille, "
+            "froid = COALESCE(excluded.froid, froid), used_at = excluded.used_at, "
+            "cout_s = CASE WHEN ? IS NULL THEN cout_s ELSE excluded.cout_s END",
+            (cle, video_id, path, froid, taille, cout_s or 0.0, now, now, cout_s),
+        )
+        self._commit()
+
+    def durees_rendu(self, limit: int = 60) -> list[sqlite3.Row]:
+        """Derniers encodages réels (hors reprises du cache), avec la durée
+        et le nom de leur vidéo : base des prévisions du rendu juste-à-temps."""
+        return self.conn.execute(
+            "SELECT c.cout_s, v.duration_s, v.name FROM render_cache c "
+            "JOIN videos v ON v.id = c.video_id "
+            "WHERE c.cout_s > 0 AND v.duration_s > 0 ORDER BY c.created_at DESC LIMIT ?",
+            (limit,)).fetchall()
+
+    def noter_sorties_rendu(self, video_id: int, sorties: list[tuple[str, str, int]]) -> None:
+        """Inscrit les fichiers (rôle, chemin, taille) d'un rendu réussi."""
+        now = utcnow()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO render_outputs (video_id, role, path, taille, created_at) "
+            "VALUES (?,?,?,?,?)",
+            [(video_id, role, path, taille, now) for role, path, taille in sorties])
+        self._commit()
+
+    def sortie_rendu(self, video_id: int, role: str) -> Path | None:
+        """Fichier de ce rôle s'il a été produit et existe encore."""
+        row = self.conn.execute(
+            "SELECT path FROM render_outputs WHERE video_id = ? AND role = ?",
+            (video_id, role)).fetchone()
+        if row and Path(row["path"]).is_file():
+            return Path(row["path"])
+        return None
+
+    # ------------------------------------------------------ passages FFmpeg
+    def noter_passages(self, passages: list[dict]) -> None:
+        self.conn.executemany(
+            "INSERT INTO stage_runs (video_id, etape, debut, mur_s, cpu_s, pic_mo, octets, "
+            "fps, vitesse, code, banc) VALUES (:video_id, :etape, :debut, :mur_s, :cpu_s, "
+            ":pic_mo, :octets, :fps, :vitesse, :code, :banc)", passages)
+        self._commit()
+
+    def bilan_etapes(self, depuis: str) -> list[sqlite3.Row]:
+        """Par étape, depuis `depuis` (ISO) : nombre, durées, vitesse, mémoire.
+        Les essais du banc (`banc = 1`) sont écartés, ici comme plus bas."""
+        return self.conn.execute(
+            "SELECT etape, COUNT(*) AS n, SUM(code != 0) AS echecs, AVG(mur_s) AS mur_moy, "
+            "MAX(mur_s) AS mur_max, SUM(mur_s) AS mur_total, AVG(cpu_s / mur_s) AS coeurs, "
+            "AVG(vitesse) AS vitesse, MAX(pic_mo) AS pic_mo "
+            "FROM stage_runs WHERE debut >= ? AND banc = 0 GROUP BY etape ORDER BY mur_total DESC",
+            (depuis,)).fetchall()
+
+    def passages_les_plus_lents(self, depuis: str, limit: int = 10) -> list[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT s.*, v.name FROM stage_runs s LEFT JOIN videos v ON v.id = s.video_id "
+            "WHERE s.debut >= ? AND s.banc = 0 ORDER BY s.mur_s DESC LIMIT ?",
+            (depuis, limit)).fetchall()
+
+    def tendance_etapes(self, depuis: str) -> list[sqlite3.Row]:
+        """Durée et vitesse moyennes par étape et par semaine."""
+        return self.conn.execute(
+            "SELECT etape, strftime('%Y-S%W', debut) AS semaine, COUNT(*) AS n, "
+            "AVG(mur_s) AS mur_moy, AVG(vitesse) AS vitesse FROM stage_runs "
+            "WHERE debut >= ? AND code = 0 AND banc = 0 GROUP BY etape, semaine "
+            "ORDER BY etape, semaine",
+            (depuis,)).fetchall()
+
+    # ------------------------------------------------------- cache du scanner
+    def cached_fingerprint(self, path: str, size_bytes: int, mtime_ns: int,
+                           inode: int) -> tuple[str, str | None, dict | None] | None:
+        """(fast_fp, sha256, probe) déjà connus pour ce fichier, ou None s'il a changé.
+
+        La clé complète (chemin, taille, mtime en ns, inode) doit correspondre :
+        un fichier remplacé sous le même nom change toujours l'un des trois.
+        """
+        row = self.conn.execute(
+            "SELECT fast_fp, sha256, probe FROM scan_cache "
+            "WHERE path = ? AND size_bytes = ? AND mtime_ns = ? AND inode = ?",
+            (path, size_bytes, mtime_ns, inode),
+        ).fetchone()
+        if row is None:
+            return None
+        return (row["fast_fp"], row["sha256"],
+                json.loads(row["probe"]) if row["probe"] else None)
+
+    def remember_fingerprint(self, path: str, size_bytes: int, mtime_ns: int, inode: int,
+                             fast_fp: str, sha256: str | None, probe: dict | None) -> None:
+        self.conn.execute(
+            "INSERT OR REPLACE INTO scan_cache "
+            "(path, size_bytes, mtime_ns, inode, fast_fp, sha256, probe, checked_at) "
+            "VALUES (?,?,?,?,?,?,?,?)",
+            (path, size_bytes, mtime_ns, inode, fast_fp, sha256,
+             json.dumps(probe) if probe is not None else None, utcnow()),
+        )
+        self._commit()
+
+    def videos_par_empreinte_rapide(self, fast_fp: str) -> list[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT id, path, sha256 FROM videos WHERE fast_fp = ?", (fast_fp,)
+        ).fetchall()
+
+    def tailles_sans_empreinte_rapide(self) -> set[int]:
+        """Tailles des vidéos connues par leur seul SHA-256 : inscrites avant
+        l'empreinte rapide, fichier disparu depuis (voir
+        `_remplir_empreintes_rapides`)."""
+        return {r["size_bytes"] for r in self.conn.execute(
+            "SELECT DISTINCT size_bytes FROM videos WHERE fast_fp IS NULL "
+            "AND sha256 IS NOT NULL AND size_bytes IS NOT NULL").fetchall()}
+
+    def _remplir_empreintes_rapides(self) -> None:
+        """Empreinte rapide des vidéos inscrites avant elle. Un fichier
+        disparu ou illisible n'en a pas : sa vidéo reste reconnue par son
+        SHA-256 (le scanner hache tout fichier de même taille)."""
+        from .scanner import fast_fingerprint
+
+        for r in self.conn.execute("SELECT id, path FROM videos WHERE fast_fp IS NULL").fetchall():
+            try:
+                fast_fp = fast_fingerprint(Path(r["path"]))
+            except OSError:
+                continue
+            self.conn.execute("UPDATE videos SET fast_fp = ? WHERE id = ?", (fast_fp, r["id"]))
+
+    def sans_hash_complet(self) -> list[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT id, name, path FROM videos WHERE sha256 IS NULL ORDER BY rowid DESC"
+        ).fetchall()
+
+    def tokkit_rowid_max(self) -> int:
+        row = self.conn.execute("SELECT MAX(tokkit_rowid) AS m FROM tokkit_captions").fetchone()
+        return int(row["m"] or 0)
+
+    def ajouter_legendes_tokkit(self, lignes: list[tuple[int, str, str]]) -> None:
+        """Enregistre des légendes (rowid 4K Tokkit, id TikTok, texte)."""
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO tokkit_captions (tokkit_rowid, tiktok_id, caption) VALUES (?,?,?)",
+            lignes,
+        )
+        self._commit()
+
+    def rebaser_legendes_tokkit(self) -> None:
+        """Remet le repère à zéro (base 4K Tokkit recréée) sans perdre les légendes."""
+        self.conn.execute("UPDATE tokkit_captions SET tokkit_rowid = 0")
+        self._commit()
+
+    def tokkit_caption(self, tiktok_id: str) -> str | None:
+        row = self.conn.execute(
+            "SELECT caption FROM tokkit_captions WHERE tiktok_id = ?", (tiktok_id,)
+        ).fetchone()
+        return row["caption"] if row else None
+
     # -------------------------------------------------------- chaîne existante
     def record_channel_video(self, youtube_id: str, title: str, published_at: str) -> None:
+        jetons = normaliser_titre(title or "")
         self.conn.execute(
-            "INSERT OR REPLACE INTO channel_videos (youtube_id, title, published_at, fetched_at) VALUES (?,?,?,?)",
-            (youtube_id, title, published_at, utcnow()),
+            "INSERT OR REPLACE INTO channel_videos (youtube_id, title, published_at, fetched_at, nb_jetons) "
+            "VALUES (?,?,?,?,?)",
+            (youtube_id, title, published_at, utcnow(), len(jetons)),
         )
-        self.conn.commit()
+        self._indexer_titre(youtube_id, jetons)
+        self._commit()
+
+    def _indexer_titre(self, youtube_id: str, jetons: set[str]) -> None:
+        self.conn.execute("DELETE FROM channel_tokens WHERE youtube_id = ?", (youtube_id,))
+        self.conn.executemany(
+            "INSERT INTO channel_tokens (token, youtube_id) VALUES (?,?)",
+            [(j, youtube_id) for j in jetons],
+        )
+
+    def _indexer_titres_chaine(self) -> None:
+        """(Re)construit l'index inversé à partir de `channel_videos`."""
+        self.conn.execute("DELETE FROM channel_tokens")
+        for r in self.conn.execute("SELECT youtube_id, title FROM channel_videos").fetchall():
+            jetons = normaliser_titre(r["title"] or "")
+            self.conn.execute("UPDATE channel_videos SET nb_jetons = ? WHERE youtube_id = ?",
+                              (len(jetons), r["youtube_id"]))
+            self._indexer_titre(r["youtube_id"], jetons)
 
     def channel_titles(self) -> list[str]:
         return [r["title"] for r in self.conn.execute("SELECT title FROM channel_videos").fetchall()]
 
+    def titre_en_ligne_proche(self, jetons: set[str], recouvrement: float = 0.7,
+                              communs_min: int = 4) -> str | None:
+        """Premier titre en ligne qui partage assez de mots avec `jetons`.
+
+        Comparaison sur l'index inversé : seules les vidéos ayant au moins
+        `communs_min` mots en commun sont examinées, et le nombre de mots de
+        chaque titre est déjà stocké. Même verdict, et même titre renvoyé, que
+        la comparaison avec chaque titre de la chaîne (ordre de la table).
+        """
+        if not jetons:
+            return None
+        marques = ",".join("?" * len(jetons))
+        row = self.conn.execute(
+            f"""SELECT cv.title FROM channel_tokens t
+                JOIN channel_videos cv ON cv.youtube_id = t.youtube_id
+                WHERE t.token IN ({marques})
+                GROUP BY cv.rowid
+                HAVING COUNT(*) >= ?
+                   AND CAST(COUNT(*) AS REAL) / MIN(?, cv.nb_jetons) >= ?
+                ORDER BY cv.rowid LIMIT 1""",
+            [*jetons, communs_min, len(jetons), recouvrement],
+        ).fetchone()
+        return row["title"] if row else None
+
     # ------------------------------------------------- sources longues YouTube
     def source_connue(self, youtube_id: str) -> bool:
         return self.conn.execute(
@@ -416,7 +957,7 @@ class Database:
                 info.get("etat", "REPERE"), now, now,
             ),
         )
-        self.conn.commit()
+        self._commit()
 
     def sources_par_etat(self, etat: str, limit: int = 0) -> list[sqlite3.Row]:
         # Le plus récent d'abord, et à fraîcheur égale la plus regardée : un
@@ -436,7 +977,7 @@ class Database:
             f"UPDATE sources_yt SET {sets}, updated_at = ? WHERE youtube_id = ?",
             [*champs.values(), utcnow(), youtube_id],
         )
-        self.conn.commit()
+        self._commit()
 
     def credits_depenses_depuis(self, iso_utc: str) -> int:
         """Crédits OpusClip réellement engagés depuis une date.
@@ -476,7 +1017,7 @@ class Database:
                 info.get("preview_url"), info.get("etat", "RETENU"), now, now,
             ),
         )
-        self.conn.commit()
+        self._commit()
         return cur.rowcount == 1
 
     def clips_par_etat(self, etat: str, limit: int = 0) -> list[sqlite3.Row]:
@@ -498,7 +1039,7 @@ class Database:
             f"UPDATE clips SET {sets}, updated_at = ? WHERE id = ?",
             [*champs.values(), utcnow(), clip_id],
         )
-        self.conn.commit()
+        self._commit()
 
     def creneaux_tiktok_reserves(self) -> list[str]:
         """Créneaux TikTok déjà pris. Indépendant de la grille YouTube :
@@ -507,6 +1048,80 @@ class Database:
             "SELECT programme_at FROM clips WHERE programme_at IS NOT NULL"
         ).fetchall()]
 
+    # ------------------------------------------------ file Facebook/Instagram
+    def mettre_en_outbox(self, cle: str, canal: str, path: str, legende: str = "",
+                         origine: str = "") -> bool:
+        """Ajoute un envoi à la file. False si cette clé y est déjà."""
+        now = utcnow()
+        cur = self.conn.execute(
+            "INSERT OR IGNORE INTO social_outbox (cle, canal, path, legende, origine, "
+            "prochain_essai, created_at, updated_at) VALUES (?,?,?,?,?,?,?,?)",
+            (cle, canal, path, legende, origine, now, now, now),
+        )
+        self._commit()
+        return cur.rowcount == 1
+
+    def outbox_a_envoyer(self, limit: int = 0) -> list[sqlite3.Row]:
+        sql = ("SELECT * FROM social_outbox WHERE etat = 'A_ENVOYER' AND prochain_essai <= ? "
+               "ORDER BY id")
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self.conn.execute(sql, (utcnow(),)).fetchall()
+
+    def reserver_outbox(self, envoi_id: int, bail_min: int = 15) -> bool:
+        """A_ENVOYER -> EN_COURS, atomique (deux workers ne postent pas deux fois).
+
+        La réservation est un bail de `bail_min` minutes, que le worker
+        prolonge tant que l'envoi tourne (`prolonger_outbox`).
+        """
+        cur = self.conn.execute(
+            "UPDATE social_outbox SET etat = 'EN_COURS', bail = ?, updated_at = ? "
+            "WHERE id = ? AND etat = 'A_ENVOYER'",
+            (_dans(bail_min), utcnow(), envoi_id),
+        )
+        self._commit()
+        return cur.rowcount == 1
+
+    def prolonger_outbox(self, envoi_ids: list[int], bail_min: int = 15) -> None:
+        """Repousse l'échéance du bail des envois encore en cours."""
+        if not envoi_ids:
+            return
+        marques = ",".join("?" * len(envoi_ids))
+        self.conn.execute(
+            f"UPDATE social_outbox SET bail = ? WHERE etat = 'EN_COURS' AND id IN ({marques})",
+            (_dans(bail_min), *envoi_ids),
+        )
+        self._commit()
+
+    def maj_outbox(self, envoi_id: int, **champs) -> None:
+        if not champs:
+            return
+        sets = ", ".join(f"{k} = ?" for k in champs)
+        self.conn.execute(
+            f"UPDATE social_outbox SET {sets}, updated_at = ? WHERE id = ?",
+            [*champs.values(), utcnow(), envoi_id],
+        )
+        self._commit()
+
+    def requalifier_outbox(self, max_age_min: int = 60) -> int:
+        """Remet en file les EN_COURS d'un worker mort en plein envoi.
+
+        Mort = bail échu : un worker vivant le prolonge, aussi long que soit
+        l'upload. Une réservation d'avant les baux garde l'ancienne règle
+        (`max_age_min` sans nouvelle).
+        """
+        cur = self.conn.execute(
+            "UPDATE social_outbox SET etat = 'A_ENVOYER', bail = NULL, updated_at = ? "
+            "WHERE etat = 'EN_COURS' AND (bail < ? OR (bail IS NULL AND updated_at < ?))",
+            (utcnow(), utcnow(), _dans(-max_age_min)),
+        )
+        self._commit()
+        return cur.rowcount
+
+    def compteurs_outbox(self) -> dict[str, int]:
+        return {r["etat"]: r["n"] for r in self.conn.execute(
+            "SELECT etat, COUNT(*) AS n FROM social_outbox GROUP BY etat").fetchall()}
+
     def compteurs_clipping(self) -> dict[str, dict[str, int]]:
         sources = {r["etat"]: r["n"] for r in self.conn.execute(
             "SELECT etat, COUNT(*) AS n FROM sources_yt GROUP BY etat").fetchall()}
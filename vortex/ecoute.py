@@ -9,9 +9,10 @@ Pourquoi ce module existe (constaté le 10/08/2026) :
    de datacenter (« Sign in to confirm you're not a bot »), quels que soient
    les cookies. Les mêmes cookies fonctionnent depuis le PC de Michel.
 
-Ce module tourne donc SUR LE PC. Il télécharge la piste audio, en écoute des
-échantillons répartis sur toute la durée, et rend un relevé de paroles
-horodaté — exactement la forme que `fenetre.trouver()` attend en entrée.
+Ce module tourne donc SUR LE PC. Il lit la piste audio — seulement les
+passages écoutés quand c'est possible —, en écoute des échantillons répartis
+sur toute la durée, et rend un relevé de paroles horodaté — exactement la
+forme que `fenetre.trouver()` attend en entrée.
 
 On ne transcrit PAS les trois heures : à 45 secondes toutes les 5 minutes, on
 couvre la vidéo entière pour un dixième du temps de calcul, et c'est amplement
@@ -21,6 +22,7 @@ commence — on cherche un CHANGEMENT DE NATURE du discours, pas un verbatim.
 
 from __future__ import annotations
 
+import json
 import logging
 import os
 import shutil
@@ -29,6 +31,8 @@ import sys
 import tempfile
 from pathlib import Path
 
+from .audio import Cache
+
 log = logging.getLogger(__name__)
 
 REPO = Path(__file__).resolve().parent.parent
@@ -37,6 +41,10 @@ REPO = Path(__file__).resolve().parent.parent
 # fait 36 sondages, 27 minutes d'audio écoutées au lieu de 180.
 PAS_S = 300
 ECHANTILLON_S = 45
+# Sondages transcrits en même temps. Sans démon, le modèle est chargé avec
+# autant de fils d'inférence et les cœurs partagés entre eux ; le démon, lui,
+# les reçoit en file.
+FILS_SONDAGE = 3
 
 
 class EcouteError(RuntimeError):
@@ -105,63 +113,158 @@ def telecharger_audio(youtube_id: str, dossier: Path) -> Path:
     return fichiers[0]
 
 
-def _extraire(source: Path, debut_s: int, duree_s: int, cible: Path) -> bool:
-    """Découpe un échantillon en WAV 16 kHz mono (le format attendu par Whisper)."""
+def adresse_audio(youtube_id: str) -> tuple[str, dict[str, str]]:
+    """Adresse directe de la piste audio, et les en-têtes HTTP qui vont avec.
+
+    Rien n'est téléchargé : yt-dlp ne fait que résoudre le format. FFmpeg
+    lira ensuite cette adresse par morceaux (`audio.pcm_fenetres`).
+    """
     commande = [
-        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
-        "-ss", str(debut_s), "-t", str(duree_s), "-i", str(source),
-        "-ac", "1", "-ar", "16000", "-vn", str(cible),
+        sys.executable, "-m", "yt_dlp",
+        "-f", "bestaudio/best", "-j",
+        "--no-playlist", "--quiet", "--no-warnings",
+        f"https://www.youtube.com/watch?v={youtube_id}",
     ]
-    subprocess.run(commande, capture_output=True, timeout=180)
-    return cible.is_file() and cible.stat().st_size > 1000
-
-
-def transcrire_par_sondages(youtube_id: str, duree_s: int, *,
+    cookies = _cookies()
+    if cookies:
+        commande += ["--cookies", cookies]
+    commande += _moteur_js()
+    resultat = subprocess.run(commande, capture_output=True, text=True, timeout=300)
+    try:
+        infos = json.loads(resultat.stdout.strip().splitlines()[-1])
+        return infos["url"], infos.get("http_headers") or {}
+    except (IndexError, ValueError, KeyError) as exc:
+        detail = (resultat.stderr or "").strip()[:300]
+        raise EcouteError(f"adresse audio de {youtube_id} introuvable : {detail}") from exc
+
+
+def _audio_complet(youtube_id: str, cache: Cache) -> Path:
+    """PCM de toute la piste : téléchargée, décodée une fois, gardée."""
+    from . import audio
+
+    cle = f"youtube-{youtube_id}"
+    fichier = audio.en_cache(cle, cache=cache)
+    if fichier is not None:
+        log.info("Audio de %s déjà décodé (%s)", youtube_id, fichier.name)
+        return fichier
+    with tempfile.TemporaryDirectory(prefix="vortex-ecoute-") as tmp:
+        source = telecharger_audio(youtube_id, Path(tmp))
+        try:
+            return audio.pcm(source, cache=cache, cle=cle)
+        except FileNotFoundError as exc:
+            raise EcouteError("ffmpeg absent du système") from exc
+        except (IndexError, audio.AudioError) as exc:
+            raise EcouteError(f"audio de {youtube_id} illisible : {exc}") from exc
+
+
+def _audio_sondages(youtube_id: str, points: list[int], echantillon_s: int,
+                    cache: Cache) -> Path | None:
+    """PCM des seules fenêtres sondées, lues à distance ; None en cas d'échec
+    (l'appelant retombe sur le téléchargement complet)."""
+    from . import audio
+
+    cle = f"youtube-{youtube_id}-{points[-1]}-{len(points)}x{echantillon_s}"
+    fichier = audio.en_cache(cle, cache=cache)
+    if fichier is not None:
+        return fichier
+    try:
+        url, entetes = adresse_audio(youtube_id)
+        log.info("Lecture partielle de %s : %d fenêtres de %d s", youtube_id,
+                 len(points), echantillon_s)
+        return audio.pcm_fenetres(url, points, echantillon_s, cache=cache, cle=cle,
+                                  entetes=entetes)
+    except (EcouteError, FileNotFoundError, audio.AudioError) as exc:
+        log.warning("Lecture partielle impossible (%s) — téléchargement complet", exc)
+        return None
+
+
+def _sonder(fichier: Path, depart: int, decalage: float, duree_s: int, modele: str,
+            fils: int, socket_chemin: Path | None = None) -> list[tuple[float, str]]:
+    """Répliques du sondage `depart`, lues à `decalage` dans le PCM (tranche
+    du memmap)."""
+    from .transcripteur import transcrire
+
+    segments, _ = transcrire(
+        fichier, modele_nom=modele, socket_chemin=socket_chemin, debut_s=decalage,
+        duree_s=duree_s, workers=fils, language="fr", vad_filter=True, condition_on_previous_text=False,
+    )
+    return [(depart + seg.start, (seg.text or "").strip())
+            for seg in segments if (seg.text or "").strip()]
+
+
+def transcrire_par_sondages(youtube_id: str, duree_s: int, *, cache: Cache,
                             modele: str = "small", pas_s: int = PAS_S,
                             echantillon_s: int = ECHANTILLON_S,
+                            fils: int = FILS_SONDAGE, partiel: bool = True,
+                            socket_chemin: Path | None = None,
                             ) -> list[tuple[float, str]]:
     """Relevé de paroles horodaté, obtenu par échantillonnage.
 
     Retourne une liste de (seconde, texte) directement exploitable par
     `fenetre.resumer_par_tranches()` puis `fenetre.trouver(lignes=…)`.
-    """
-    try:
-        from faster_whisper import WhisperModel
-    except ImportError as exc:  # pragma: no cover
-        raise EcouteError("faster-whisper absent — `pip install faster-whisper`") from exc
 
-    if not shutil.which("ffmpeg"):
-        raise EcouteError("ffmpeg absent du système")
+    Avec `partiel`, seules les fenêtres sondées sont lues sur YouTube
+    (`audio.pcm_fenetres`, requêtes Range) : 27 minutes d'audio sur 180 pour
+    un direct de 3 h. Sinon, ou si la lecture partielle échoue, la piste
+    entière est téléchargée puis décodée (gardée sous `youtube-<id>` :
+    relancer le repérage du même direct ne retélécharge rien).
 
-    lignes: list[tuple[float, str]] = []
-    with tempfile.TemporaryDirectory(prefix="vortex-ecoute-") as tmp:
-        dossier = Path(tmp)
-        audio = telecharger_audio(youtube_id, dossier)
-
-        log.info("Chargement du modèle Whisper « %s »…", modele)
-        moteur = WhisperModel(modele, device="cpu", compute_type="int8")
+    Dans les deux cas l'audio est décodé UNE fois en PCM 16 kHz
+    (vortex/audio.py) ; chaque sondage n'est qu'une tranche de ce fichier
+    mappé en mémoire, passée à Whisper telle quelle : ni WAV intermédiaire,
+    ni FFmpeg par sondage. `fils` sondages sont transcrits en même temps.
 
+    `cache` : cache audio de la configuration (`audio.cache_de(cfg)`).
+    `socket_chemin` : socket du démon Whisper (`cfg.whisper_socket`), comme
+    pour vortex/transcribe.py ; à défaut, celui du config.toml livré.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    from . import audio
+    from .transcripteur import SOCKET_DEFAUT
+
+    # Sans démon Whisper (vortex/transcripteur.py), le modèle est chargé
+    # ici : faster-whisper doit alors être installé.
+    if not (socket_chemin or SOCKET_DEFAUT).exists():
+        try:
+            import faster_whisper  # noqa: F401
+        except ImportError as exc:  # pragma: no cover
+            raise EcouteError("faster-whisper absent — `pip install faster-whisper`") from exc
+
+    # Durée inconnue (0) : pas de fenêtres à viser, la piste entière la donnera.
+    points = list(range(0, max(0, duree_s - echantillon_s), pas_s)) if duree_s else []
+    fichier = None
+    # Sondages couvrant plus de la moitié de la vidéo, ou piste entière déjà
+    # décodée : autant tout lire.
+    if (partiel and points and len(points) * echantillon_s < duree_s / 2
+            and audio.en_cache(f"youtube-{youtube_id}", cache=cache) is None):
+        fichier = _audio_sondages(youtube_id, points, echantillon_s, cache)
+    if fichier is not None:
+        decalages = [i * echantillon_s for i in range(len(points))]
+    else:
+        fichier = _audio_complet(youtube_id, cache)
+        # La durée annoncée par YouTube peut dépasser l'audio réel de
+        # quelques secondes : on sonde ce qui existe.
+        reelle = int(audio.duree(fichier))
+        duree_s = min(duree_s, reelle) if duree_s else reelle
         points = list(range(0, max(0, duree_s - echantillon_s), pas_s))
-        log.info("%d sondages de %d s sur %d min de vidéo",
-                 len(points), echantillon_s, duree_s // 60)
-
-        for i, depart in enumerate(points, 1):
-            morceau = dossier / f"s{depart}.wav"
-            if not _extraire(audio, depart, echantillon_s, morceau):
-                continue
-            try:
-                segments, _ = moteur.transcribe(
-                    str(morceau), language="fr", vad_filter=True,
-                    condition_on_previous_text=False,
-                )
-                for seg in segments:
-                    texte = (seg.text or "").strip()
-                    if texte:
-                        lignes.append((depart + seg.start, texte))
-            except Exception:
-                log.exception("Sondage à %ds illisible", depart)
-            finally:
-                morceau.unlink(missing_ok=True)
+        decalages = points
+    log.info("%d sondages de %d s sur %d min de vidéo (%d à la fois)",
+             len(points), echantillon_s, duree_s // 60, fils)
+
+    def sonder(fenetre: tuple[int, float]) -> list[tuple[float, str]]:
+        depart, decalage = fenetre
+        try:
+            return _sonder(fichier, depart, decalage, echantillon_s, modele, fils,
+                           socket_chemin)
+        except Exception:
+            log.exception("Sondage à %ds illisible", depart)
+            return []
+
+    lignes: list[tuple[float, str]] = []
+    with ThreadPoolExecutor(max_workers=max(1, fils), thread_name_prefix="vortex-sondage") as pool:
+        for i, repliques in enumerate(pool.map(sonder, zip(points, decalages)), 1):
+            lignes += repliques
             if i % 6 == 0:
                 log.info("  … %d/%d sondages", i, len(points))
 
@@ -169,12 +272,14 @@ def transcrire_par_sondages(youtube_id: str, duree_s: int, *,
     return lignes
 
 
-def reperer(youtube_id: str, duree_s: int, *, largeur_max_s: int,
-            largeur_min_s: int = 600, modele: str = "small") -> dict:
+def reperer(youtube_id: str, duree_s: int, *, cache: Cache, largeur_max_s: int,
+            largeur_min_s: int = 600, modele: str = "small",
+            socket_chemin: Path | None = None) -> dict:
     """Fenêtre de prédication, sous-titres YouTube d'abord, transcription ensuite.
 
     L'ordre compte : les sous-titres sont gratuits et immédiats quand ils
     existent. On ne dépense du temps de calcul que lorsqu'ils manquent.
+    `cache`, `socket_chemin` : voir `transcrire_par_sondages`.
     """
     from . import fenetre as mod_fenetre
 
@@ -192,7 +297,8 @@ def reperer(youtube_id: str, duree_s: int, *, largeur_max_s: int,
         log.info("Pas de sous-titres pour %s (%s) — on écoute la vidéo",
                  youtube_id, exc)
 
-    lignes = transcrire_par_sondages(youtube_id, duree_s, modele=modele)
+    lignes = transcrire_par_sondages(youtube_id, duree_s, cache=cache, modele=modele,
+                                     socket_chemin=socket_chemin)
     if not lignes:
         raise EcouteError(f"aucune parole relevée sur {youtube_id}")
     resultat = mod_fenetre.trouver(youtube_id, duree_s,
@@ -85,20 +85,6 @@ def _deepseek_json(prompt: str) -> dict | None:
         return None
 
 
-def _ensure_columns(db: Database) -> None:
-    cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-    if "seed_comment_id" not in cols:
-        db.conn.execute("ALTER TABLE videos ADD COLUMN seed_comment_id TEXT")
-    db.conn.executescript("""
-        CREATE TABLE IF NOT EXISTS replied_comments (
-            comment_id TEXT PRIMARY KEY,
-            video_youtube_id TEXT,
-            replied_at TEXT
-        );
-    """)
-    db.conn.commit()
-
-
 def mark_published(db: Database, service) -> int:
     """SCHEDULED dont l'heure est passée -> vérifie sur YouTube -> PUBLISHED."""
     now = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
@@ -208,7 +194,6 @@ def reply_to_comments(cfg: Config, db: Database, service, budget: list[int]) ->
 
 
 def run_engagement(cfg: Config, db: Database, max_actions: int = 20) -> dict:
-    _ensure_columns(db)
     service = youtube_client.get_service(cfg)
     budget = [max_actions]
     published = mark_published(db, service)
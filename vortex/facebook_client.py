@@ -230,10 +230,18 @@ def post_story_to_facebook(cfg: Config, video_path: str) -> str | None:
         return None
 
 
-def _story_ready_clip(cfg: Config, video_path: str, max_s: int = 58) -> str:
+def _story_ready_clip(cfg: Config, video_path: str, max_s: int = 58,
+                      deja: Path | None = None, video_id: int | None = None) -> str:
     """Une Story IG est limitée à 60 s (erreur 2207082 au-delà). Si le clip est plus
     long, on produit un extrait des premières max_s s dans data/exports (servi
-    publiquement). Retourne le chemin utilisable pour la Story."""
+    publiquement). Retourne le chemin utilisable pour la Story.
+
+    `deja` : story inscrite par le rendu (`db.sortie_rendu(id, "story")`),
+    produite dans la même passe que le master avec `render_sorties =
+    ["story"]` : elle sert telle quelle, sans sonde ni découpe."""
+    if deja is not None:
+        return str(deja)
+    out = Path(cfg.data_dir) / "exports" / f"story_{Path(video_path).stem}.mp4"
     from .textdetect import find_ffmpeg
     ff = find_ffmpeg()
     try:
@@ -245,13 +253,21 @@ def _story_ready_clip(cfg: Config, video_path: str, max_s: int = 58) -> str:
         dur = 0
     if dur and dur <= max_s + 1:
         return video_path
-    out = Path(cfg.data_dir) / "exports" / f"story_{Path(video_path).stem}.mp4"
+    # Écrit à côté puis renommé : le fichier servi publiquement n'est jamais
+    # visible à moitié écrit.
+    provisoire = out.with_name(out.name + ".part")
     cmd = [ff, "-v", "error", "-i", video_path, "-t", str(max_s),
-           "-c", "copy", "-movflags", "+faststart", "-y", str(out)]
+           "-c", "copy", "-movflags", "+faststart", "-f", "mp4", "-y", str(provisoire)]
+    from .lanceur import lancer
     try:
-        subprocess.run(cmd, capture_output=True, timeout=300, check=True)
-        return str(out) if out.exists() else video_path
+        fait = lancer(cmd, etape="story", video_id=video_id, sortie=provisoire,
+                      duree=max_s, timeout=300)
+        if fait.code != 0 or not provisoire.exists():
+            raise RuntimeError(fait.stderr.decode("utf-8", "replace")[-300:] or fait.code)
+        provisoire.replace(out)
+        return str(out)
     except Exception as exc:
+        provisoire.unlink(missing_ok=True)
         log.warning("Story : découpe ≤%ds échouée (%s) — clip original", max_s, exc)
         return video_path
 
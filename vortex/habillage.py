@@ -178,6 +178,8 @@ def habiller(source: str | Path, cible: str | Path, *, graine: str = "",
 
     import tempfile
 
+    from .lanceur import lancer
+
     longueur = duree(source)
     police = Path(_police())
     bandeaux = plan_bandeaux(longueur, graine or source.stem)
@@ -191,6 +193,18 @@ def habiller(source: str | Path, cible: str | Path, *, graine: str = "",
             fichier.write_text(texte, encoding="utf-8")
             filtres.append(_bandeau(fichier, debut, longueur_bandeau, police))
 
+        if not nettete:
+            # Sans accentuage, seules les secondes des bandeaux changent : on
+            # ne réencode qu'elles (voir vortex/rendu_partiel.py).
+            from .rendu_partiel import rendre
+            fait = rendre("ffmpeg", source, cible, vf=",".join(filtres),
+                          plages=[(d, d + n) for _t, d, n in bandeaux], duree=longueur,
+                          x264=["-preset", "slow", "-crf", crf], audio=["-c:a", "copy"],
+                          timeout=3600, etape="habillage_partiel")
+            if fait is not None:
+                if fait[0] != 0 or not cible.is_file():
+                    raise HabillageError(fait[1].decode("utf-8", "replace")[-500:])
+                return cible
         commande = [
             "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
             "-i", str(source),
@@ -204,7 +218,8 @@ def habiller(source: str | Path, cible: str | Path, *, graine: str = "",
         ]
         log.info("Habillage de %s (%.0f s, %d bandeau(x))…",
                  source.name, longueur, len(bandeaux))
-        fait = subprocess.run(commande, capture_output=True, text=True, timeout=3600)
-    if fait.returncode != 0 or not cible.is_file():
-        raise HabillageError((fait.stderr or "")[-500:])
+        fait = lancer(commande, etape="habillage", sortie=cible, duree=longueur,
+                      timeout=3600)
+    if fait.code != 0 or not cible.is_file():
+        raise HabillageError(fait.stderr.decode("utf-8", "replace")[-500:])
     return cible
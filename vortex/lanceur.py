@@ -0,0 +1,151 @@
+"""Lanceur FFmpeg commun : progression en direct et relevé de chaque passage.
+
+Avant, chaque appel FFmpeg (rendu, habillage, découpe de story, images pour
+l'OCR) passait par `subprocess.run(capture_output=True)` : aucune nouvelle
+avant la fin, ou avant le SIGKILL au bout de deux heures. Ici :
+
+- `-progress pipe:1` fait écrire à FFmpeg, à chaque demi-seconde, l'image
+  en cours, les images/s, la vitesse (×temps réel) et la position dans la
+  sortie ; on en tire une ligne de journal toutes les PALIER_S secondes ;
+- `wait4` donne, à la fin, le temps CPU et le pic de mémoire (RSS) de CE
+  processus (sous Windows, sans `wait4`, ces deux mesures manquent) ;
+- chaque passage est gardé en mémoire puis versé dans la table
+  `stage_runs` par `enregistrer(db)`, depuis le fil principal : les
+  passages tournent souvent dans des fils de pool (rendus, envois sociaux),
+  qui ne touchent jamais la base.
+
+`vortex perf` lit ensuite la table : étapes les plus lentes et tendance.
+
+La sortie standard de FFmpeg est réservée à la progression : aucun appelant
+n'y écrit de vidéo (toutes les sorties sont des fichiers).
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import subprocess
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from .db import Database, utcnow
+
+log = logging.getLogger("vortex.lanceur")
+
+# Une ligne de progression par tranche : assez pour suivre un rendu de dix
+# minutes sans noyer le journal du cron.
+PALIER_S = 30.0
+
+# Code rendu quand le délai est dépassé (celui de timeout(1)) : FFmpeg est
+# alors tué par SIGKILL comme par le noyau à court de mémoire, mais les deux
+# ne s'analysent pas pareil.
+DELAI_DEPASSE = 124
+
+_journal: list[dict] = []
+_verrou = threading.Lock()
+
+
+@dataclass
+class Passage:
+    etape: str
+    video_id: int | None
+    code: int
+    stderr: bytes
+    mur_s: float
+    cpu_s: float | None = None
+    pic_mo: int | None = None
+    octets: int | None = None
+    fps: float | None = None
+    vitesse: float | None = None
+    position_s: float | None = None
+
+
+def _nombre(valeur: str | None) -> float | None:
+    try:
+        return float((valeur or "").rstrip("x"))
+    except ValueError:
+        return None
+
+
+def lancer(cmd: list[str], *, etape: str, video_id: int | None = None,
+           sortie: Path | None = None, duree: float | None = None,
+           timeout: float = 7200, banc: bool = False) -> Passage:
+    """Lance FFmpeg (`cmd[0]`), suit sa progression, relève le passage.
+
+    `sortie` : fichier produit, dont on note la taille ; `duree` : durée
+    attendue de la sortie, pour afficher un pourcentage. Tué au bout de
+    `timeout` secondes : le code est alors DELAI_DEPASSE, pas -9. `banc` :
+    essai du banc (vortex/banc.py), gardé dans `stage_runs` mais hors des
+    statistiques de `vortex perf`.
+    """
+    cmd = [cmd[0], "-progress", "pipe:1", "-nostats", *cmd[1:]]
+    debut, depart = utcnow(), time.monotonic()
+    proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE)
+    erreurs: list[bytes] = []
+    lecteur = threading.Thread(target=lambda: erreurs.append(proc.stderr.read()), daemon=True)
+    lecteur.start()
+    expire = threading.Event()
+
+    def _tuer() -> None:
+        expire.set()
+        proc.kill()
+
+    minuteur = threading.Timer(timeout, _tuer)
+    minuteur.start()
+    etat: dict[str, str] = {}
+    prochain_log = depart + PALIER_S
+    try:
+        for brut in proc.stdout:
+            cle, _, valeur = brut.decode("utf-8", "replace").strip().partition("=")
+            etat[cle] = valeur
+            if cle != "progress" or time.monotonic() < prochain_log:
+                continue
+            prochain_log = time.monotonic() + PALIER_S
+            position = (_nombre(etat.get("out_time_us")) or 0) / 1e6
+            avance = f"{100 * position / duree:.0f} %" if duree else f"{position:.0f} s"
+            log.info("%s%s : %s · %s img/s · ×%s", etape,
+                     f" #{video_id}" if video_id else "", avance,
+                     etat.get("fps", "?"), (etat.get("speed") or "?").rstrip("x"))
+        proc.stdout.close()
+        cpu = pic = None
+        if hasattr(os, "wait4"):
+            _pid, statut, usage = os.wait4(proc.pid, 0)
+            proc.returncode = os.waitstatus_to_exitcode(statut)
+            cpu, pic = usage.ru_utime + usage.ru_stime, usage.ru_maxrss // 1024
+        else:
+            proc.wait()
+    finally:
+        minuteur.cancel()
+    lecteur.join()
+    if expire.is_set() and proc.returncode != 0:
+        proc.returncode = DELAI_DEPASSE
+
+    octets = None
+    if sortie is not None and proc.returncode == 0:
+        try:
+            octets = Path(sortie).stat().st_size
+        except OSError:
+            pass
+    passage = Passage(etape=etape, video_id=video_id, code=proc.returncode,
+                      stderr=erreurs[0] if erreurs else b"",
+                      mur_s=time.monotonic() - depart, cpu_s=cpu, pic_mo=pic, octets=octets,
+                      fps=_nombre(etat.get("fps")), vitesse=_nombre(etat.get("speed")),
+                      position_s=(_nombre(etat.get("out_time_us")) or 0) / 1e6 or None)
+    with _verrou:
+        _journal.append({"video_id": video_id, "etape": etape, "debut": debut,
+                         "mur_s": passage.mur_s, "cpu_s": cpu, "pic_mo": pic,
+                         "octets": octets, "fps": passage.fps, "vitesse": passage.vitesse,
+                         "code": passage.code, "banc": int(banc)})
+    return passage
+
+
+def enregistrer(db: Database) -> int:
+    """Verse les passages relevés dans `stage_runs`. Fil principal seulement."""
+    with _verrou:
+        lot, _journal[:] = list(_journal), []
+    if lot:
+        db.noter_passages(lot)
+    return len(lot)
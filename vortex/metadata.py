@@ -295,11 +295,6 @@ def prepare_video(cfg: Config, db: Database, video_id: int) -> bool:
         title = (generated["title"] + suffix)[:100]
         description = generated["description"]
         tags = generated["tags"]
-        cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-        for col in ("thumb_title", "speaker", "thumb_theme"):
-            if col not in cols:
-                db.conn.execute(f"ALTER TABLE videos ADD COLUMN {col} TEXT")
-                db.conn.commit()
         thumb = generated.get("thumb_title") or derive_thumb_title(title, generated.get("hook", ""))
         if thumb:
             db.update_fields(video_id, thumb_title=thumb)
@@ -315,10 +310,6 @@ def prepare_video(cfg: Config, db: Database, video_id: int) -> bool:
         tags = build_tags(cfg, caption, transcript)
         # Repli local : garantir une accroche courte (jamais le titre long à l'écran)
         thumb = derive_thumb_title(title, clean_caption(caption, cfg.known_speakers))
-        cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-        if "thumb_title" not in cols:
-            db.conn.execute("ALTER TABLE videos ADD COLUMN thumb_title TEXT")
-            db.conn.commit()
         if thumb:
             db.update_fields(video_id, thumb_title=thumb)
 
@@ -57,7 +57,7 @@ from pathlib import Path
 from . import thumbs, youtube_client
 from .config import load_config
 from .metadata import derive_thumb_title
-from .visage import image_miniature, portrait_depuis_video
+from .visage import dossier_pistes, image_miniature, piste, portrait_depuis_video
 
 # Racine du dépôt : ce module vit dans vortex/, les données un cran au-dessus.
 RACINE = Path(__file__).resolve().parent.parent
@@ -309,12 +309,17 @@ def telecharger(youtube_id: str) -> Path | None:
     return dest
 
 
-def _est_vertical(video: Path) -> bool:
+def _est_vertical(video: Path, pistes: Path) -> bool:
     """Format réel du fichier — jamais la durée.
 
     Se fier à « moins de 3 minutes = Short » avait déjà collé une cover 9:16
     sur des vidéos 16:9 (Michel, 30/07 : « cette vidéo n'est pas un short »).
+    La piste des visages, que la fabrication lit de toute façon, connaît les
+    dimensions : on ne rouvre la vidéo que sans elle.
     """
+    donnees = piste(video, pistes=pistes)
+    if donnees:
+        return donnees["hauteur"] > donnees["largeur"]
     import cv2
 
     capture = cv2.VideoCapture(str(video))
@@ -327,17 +332,18 @@ def _est_vertical(video: Path) -> bool:
 def fabriquer(cfg, video_yt: dict, fichier_video: Path, formule: str) -> Path | None:
     PRETES.mkdir(parents=True, exist_ok=True)
     sortie = PRETES / f"{video_yt['youtube_id']}--{formule}.jpg"
-    vertical = _est_vertical(fichier_video)
+    pistes = dossier_pistes(cfg)
+    vertical = _est_vertical(fichier_video, pistes)
 
     if formule == "image":
-        donnees = image_miniature(fichier_video, vertical=vertical)
+        donnees = image_miniature(fichier_video, pistes=pistes, vertical=vertical)
         if not donnees:
             return None
         sortie.write_bytes(donnees)
         log.info("Image prête : %s (%d Ko)", sortie.name, len(donnees) // 1024)
         return sortie
 
-    photo = portrait_depuis_video(fichier_video, vertical=vertical)
+    photo = portrait_depuis_video(fichier_video, pistes=pistes, vertical=vertical)
     if not photo:
         return None
     accroche = derive_thumb_title(video_yt["titre"])
@@ -15,13 +15,11 @@ from __future__ import annotations
 
 import json
 import logging
-import re
-import unicodedata
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 from .config import Config
-from .db import Database
+from .db import Database, normaliser_titre
 from .schedule import immediate_slots, next_free_slots, rfc3339_utc
 from . import youtube_client
 
@@ -32,25 +30,14 @@ _prochain_immediat = [None]
 
 
 # ------------------------------------------------------------ anti-republication
-def _normalize(text: str) -> set[str]:
-    text = unicodedata.normalize("NFD", text.lower())
-    text = "".join(c for c in text if not unicodedata.combining(c))
-    return set(re.findall(r"[a-z0-9]{3,}", text))
-
-
 def already_on_channel(db: Database, title: str, caption: str | None) -> str | None:
-    """Retourne le titre déjà en ligne le plus proche si la vidéo semble déjà publiée."""
-    candidate = _normalize(f"{title} {caption or ''}")
-    if not candidate:
-        return None
-    for online_title in db.channel_titles():
-        online = _normalize(online_title)
-        if not online:
-            continue
-        overlap = len(candidate & online) / min(len(candidate), len(online))
-        if overlap >= 0.7 and len(candidate & online) >= 4:
-            return online_title
-    return None
+    """Retourne le titre déjà en ligne le plus proche si la vidéo semble déjà publiée.
+
+    Verdict : au moins 4 mots communs, couvrant au moins 70 % du plus court
+    des deux titres. La recherche passe par l'index inversé de la base au
+    lieu de renormaliser toute la chaîne pour chaque candidate.
+    """
+    return db.titre_en_ligne_proche(normaliser_titre(f"{title} {caption or ''}"))
 
 
 # ------------------------------------------------------------------------- plan
@@ -121,7 +108,8 @@ def _is_quota_error(err) -> bool:
                 return True
     except Exception:
         pass
-    return getattr(getattr(err, "resp", None), "status", None) == 403
+    status = getattr(err, "status", None) or getattr(getattr(err, "resp", None), "status", None)
+    return status == 403
 
 
 def execute_plan(cfg: Config, db: Database, plan: list[dict], live: bool,
@@ -205,8 +193,9 @@ def execute_plan(cfg: Config, db: Database, plan: list[dict], live: bool,
                 tags=json.loads(row["tags"] or "[]"),
                 publish_at_utc=publish_at,
                 language=row["language"] or cfg.default_language,
+                db=db, video_id=p["video_id"],
             )
-        except HttpError as err:
+        except (HttpError, youtube_client.UploadError) as err:
             if _is_quota_error(err):
                 db.set_state(p["video_id"], "READY", "quota API atteint — remis en file")
                 log.error("Quota YouTube atteint : arrêt du lot (reprise demain). %s", err)
@@ -259,43 +248,32 @@ def execute_plan(cfg: Config, db: Database, plan: list[dict], live: bool,
         # Sélection par ORIENTATION uniquement (correctif 17/07 : l'ancien filtre
         # basé sur le nom « tiktok »/« _short » excluait les vidéos hedjav_* — le gros
         # du contenu vertical — donc rien ne partait sur FB/IG).
+        # On ne fait qu'inscrire l'envoi : `social-worker` poste ensuite, sans
+        # retarder le créneau YouTube suivant.
         keys = row.keys()
         cat = row["category"] if "category" in keys else ""
         h = (row["height"] if "height" in keys else 0) or 0
         w = (row["width"] if "width" in keys else 0) or 0
         fb_vertical = cat in ("short", "long_vertical") or (h and w and h > w)
-        if cfg.facebook_publish and fb_vertical:
-            try:
-                from . import facebook_client
-                if facebook_client.available(cfg):
-                    fb_id = facebook_client.post_video_to_page(
-                        cfg, upload_path, build_social_caption(cfg, db, row["name"]))
-                    if fb_id:
-                        log.info("Facebook : clip publié (post %s) pour %s", fb_id, row["name"])
-            except Exception as exc:
-                log.warning("Facebook : publication ignorée (%s)", exc)
-
-        # Aimant Instagram : Reel du même clip vertical. L'API Reels exige une URL
-        # publique → on sert le clip habillé (data/exports) via la route /media du
-        # dashboard. On n'essaie donc QUE si le rendu existe (l'original sur le
-        # disque source n'est pas servi publiquement).
-        rendered = "render_path" in keys and row["render_path"] and Path(row["render_path"]).exists()
-        if cfg.instagram_publish and fb_vertical and rendered:
-            try:
-                from . import facebook_client
-                if facebook_client.available(cfg):
-                    ig_url = facebook_client.media_url(cfg, Path(row["render_path"]).name)
-                    ig_id = facebook_client.post_reel_to_instagram(
-                        cfg, ig_url, build_social_caption(cfg, db, row["name"]))
-                    if ig_id:
-                        log.info("Instagram : Reel publié (%s) pour %s", ig_id, row["name"])
-            except Exception as exc:
-                log.warning("Instagram : publication ignorée (%s)", exc)
+        if (cfg.facebook_publish or cfg.instagram_publish) and fb_vertical:
+            from . import social
+            caption = build_social_caption(cfg, db, row["name"])
+            if cfg.facebook_publish:
+                social.mettre_en_file(db, "facebook_video", upload_path, caption, "publish")
+            # Aimant Instagram : Reel du même clip vertical. L'API Reels exige une
+            # URL publique → seul le clip habillé (data/exports), servi par la
+            # route /media du dashboard, peut partir ; jamais l'original.
+            rendered = "render_path" in keys and row["render_path"] and Path(row["render_path"]).exists()
+            if cfg.instagram_publish and rendered:
+                social.mettre_en_file(db, "instagram_reel", row["render_path"], caption, "publish")
 
 
 def _rendered_clips(cfg: Config):
-    """Clips verticaux DÉJÀ habillés et servables (data/exports/*_v.mp4), triés."""
-    return sorted((cfg.data_dir / "exports").glob("*_v.mp4"))
+    """Clips verticaux DÉJÀ habillés et servables (data/exports/*_v.mp4), triés.
+
+    Les extraits de story (story_<nom>_v.mp4) ne sont pas des clips à part."""
+    return sorted(p for p in (cfg.data_dir / "exports").glob("*_v.mp4")
+                  if not p.name.startswith("story_"))
 
 
 # Chaîne source YouTube → (pasteur, église). Sert à créditer et à identifier
@@ -374,7 +352,8 @@ def _caption_for(db: Database, clip_name: str) -> str:
 
 def publish_daily_story(cfg: Config, db: Database) -> dict | None:
     """Story du jour sur Instagram + Facebook, à partir d'un clip vertical déjà
-    habillé (rotation via data/last_story.txt pour ne pas reposter le même)."""
+    habillé (rotation via data/last_story.txt pour ne pas reposter le même).
+    Inscrite dans la file sociale ; retourne, par réseau, si elle y est entrée."""
     from . import facebook_client
     if not facebook_client.available(cfg):
         log.warning("Story : Facebook/Instagram indisponible (pas de token).")
@@ -388,17 +367,36 @@ def publish_daily_story(cfg: Config, db: Database) -> dict | None:
     names = [c.name for c in clips]
     idx = (names.index(last) + 1) % len(clips) if last in names else 0
     pick = clips[idx]
-    res = facebook_client.post_story_both(cfg, str(pick))
+    # Découpe ≤ 58 s faite UNE fois, ici, sur le fil principal : les deux
+    # envois partent en parallèle dans `social-worker` et réécrivaient
+    # chacun le même story_<nom>.mp4, l'un pouvant poster le fichier que
+    # l'autre écrivait encore. La file garde le chemin prêt.
+    # Le rendu a pu la produire dans sa passe (table render_outputs).
+    nom = pick.stem[:-2] if pick.stem.endswith("_v") else pick.stem
+    video = db.conn.execute("SELECT id FROM videos WHERE name = ?", (nom,)).fetchone()
+    story = facebook_client._story_ready_clip(
+        cfg, str(pick), deja=db.sortie_rendu(video["id"], "story") if video else None,
+        video_id=video["id"] if video else None)
+    # Une story par passage : la clé porte l'heure, pour qu'une même vidéo
+    # puisse revenir un autre jour mais pas deux fois dans le même créneau.
+    from . import social
+    heure = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H")
+    res = {
+        canal.split("_")[0]: social.mettre_en_file(db, canal, story, origine="story",
+                                                   cle=f"{canal}:{heure}")
+        for canal in ("instagram_story", "facebook_story")
+    }
     marker.write_text(pick.name, encoding="utf-8")
-    log.info("Story : %s → Instagram=%s Facebook=%s", pick.name,
-             res.get("instagram"), res.get("facebook"))
+    log.info("Story : %s mise en file (Instagram=%s Facebook=%s)", pick.name,
+             res["instagram"], res["facebook"])
     return res
 
 
 def backfill_social(cfg: Config, db: Database, count: int = 12) -> int:
-    """Poste un lot de clips déjà habillés sur la Page Facebook + en Reel Instagram,
-    pour PEUPLER les réseaux (les pages étaient vides). Mémorise ce qui est fait
-    (data/backfill_done.txt) pour ne pas reposter les mêmes."""
+    """Met en file un lot de clips déjà habillés pour la Page Facebook + en Reel
+    Instagram, pour PEUPLER les réseaux (les pages étaient vides). Mémorise ce qui
+    est fait (data/backfill_done.txt) pour ne pas reposter les mêmes ; la clé de
+    la file écarte en plus les clips déjà partis avec leur publication YouTube."""
     from . import facebook_client
     if not facebook_client.available(cfg):
         log.warning("Backfill : Facebook/Instagram indisponible.")
@@ -406,19 +404,15 @@ def backfill_social(cfg: Config, db: Database, count: int = 12) -> int:
     marker = cfg.data_dir / "backfill_done.txt"
     done = set(marker.read_text(encoding="utf-8").splitlines()) if marker.exists() else set()
     todo = [c for c in _rendered_clips(cfg) if c.name not in done][:count]
+    from . import social
     posted = 0
     for c in todo:
         caption = build_social_caption(cfg, db, c.stem)
-        try:
-            fb_id = facebook_client.post_video_to_page(cfg, str(c), caption)
-            ig_url = facebook_client.media_url(cfg, c.name)
-            ig_id = facebook_client.post_reel_to_instagram(cfg, ig_url, caption)
-            log.info("Backfill : %s → Facebook=%s Instagram=%s", c.name, fb_id, ig_id)
-            if fb_id or ig_id:
-                posted += 1
-            done.add(c.name)
-        except Exception as exc:
-            log.warning("Backfill : %s ignoré (%s)", c.name, exc)
+        fb = social.mettre_en_file(db, "facebook_video", str(c), caption, "backfill")
+        ig = social.mettre_en_file(db, "instagram_reel", str(c), caption, "backfill")
+        if fb or ig:
+            posted += 1
+        done.add(c.name)
     marker.write_text("\n".join(sorted(done)), encoding="utf-8")
     return posted
 
@@ -426,14 +420,15 @@ def backfill_social(cfg: Config, db: Database, count: int = 12) -> int:
 def retry_failed(db: Database) -> int:
     """Remet les FAILED dans le circuit, à l'étape où ils avaient échoué."""
     rows = db.by_state("FAILED")
-    for r in rows:
-        if r["title"]:
-            target = "READY"
-        elif r["transcript_path"]:
-            target = "TRANSCRIBED"
-        else:
-            target = "DISCOVERED"
-        db.set_state(r["id"], target, "nouvelle tentative demandée")
+    with db.transaction():
+        for r in rows:
+            if r["title"]:
+                target = "READY"
+            elif r["transcript_path"]:
+                target = "TRANSCRIBED"
+            else:
+                target = "DISCOVERED"
+            db.set_state(r["id"], target, "nouvelle tentative demandée")
     return len(rows)
 
 
@@ -442,7 +437,10 @@ def sync_channel(cfg: Config, db: Database, service=None) -> int:
     if service is None:
         service = youtube_client.get_service(cfg)
     videos = youtube_client.fetch_channel_videos(service)
-    for v in videos:
-        db.record_channel_video(v["youtube_id"], v["title"], v["published_at"])
+    # Toute la liste est déjà en mémoire : un seul commit pour la chaîne
+    # entière au lieu d'un fsync par vidéo.
+    with db.transaction():
+        for v in videos:
+            db.record_channel_video(v["youtube_id"], v["title"], v["published_at"])
     log.info("%d vidéos déjà en ligne enregistrées comme référence.", len(videos))
     return len(videos)
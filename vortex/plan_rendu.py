@@ -0,0 +1,55 @@
+"""Plan de rendu : un seul décodage, plusieurs fichiers produits.
+
+Une vidéo habillée sert sous plusieurs formes : le master YouTube, la story
+Instagram/Facebook (58 s au plus) et, sur demande, un aperçu léger pour le
+tableau de bord. Produire chacune à part relit la source, ou le rendu, et
+la redécode. Ici une seule commande FFmpeg décode la source une fois, passe
+le graphe d'habillage (agrandissement, étalonnage, .ass) une fois, puis
+`split` en distribue les images à un encodeur par sortie.
+
+L'audio ne passe pas par le graphe commun : chaque sortie le prend avec
+`-map 0:a?` (une source muette reste valable) et son propre `-af`. Le son
+n'est décodé qu'une fois par FFmpeg ; seul le filtre, peu coûteux, est
+répété.
+
+Chaque sortie porte un RÔLE (`youtube`, `story`, `apercu`), inscrit en base
+(table `render_outputs`) une fois le rendu réussi.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from pathlib import Path
+
+# Story Instagram : 60 s au plus (erreur 2207082 au-delà), marge comprise.
+STORY_MAX_S = 58
+
+
+@dataclass
+class Sortie:
+    role: str
+    chemin: Path
+    video: list[str]                       # encodeur et réglages
+    audio: list[str]                       # filtre et encodeur audio
+    duree_max: float | None = None
+    filtre: str = ""                       # filtre propre à cette sortie, après le split
+    options: list[str] = field(default_factory=lambda: ["-movflags", "+faststart"])
+
+
+def commande(ffmpeg: str, src: Path, vf: str, sorties: list[Sortie],
+             threads: int) -> list[str]:
+    """Commande FFmpeg unique produisant toutes les `sorties` depuis `src`."""
+    n = len(sorties)
+    graphe = [f"[0:v]{vf},split={n}" + "".join(f"[s{i}]" for i in range(n))
+              if n > 1 else f"[0:v]{vf}[s0]"]
+    for i, sortie in enumerate(sorties):
+        if sortie.filtre:
+            graphe.append(f"[s{i}]{sortie.filtre}[f{i}]")
+    cmd = [ffmpeg, "-v", "error", "-threads", str(threads), "-i", str(src),
+           "-filter_complex", ";".join(graphe)]
+    for i, sortie in enumerate(sorties):
+        cmd += ["-map", f"[f{i}]" if sortie.filtre else f"[s{i}]", "-map", "0:a?"]
+        if sortie.duree_max:
+            cmd += ["-t", f"{sortie.duree_max:g}"]
+        cmd += [*sortie.video, *sortie.audio, *sortie.options, "-y", str(sortie.chemin)]
+    return cmd
@@ -16,8 +16,10 @@ L'original n'est JAMAIS modifié : copie habillée dans data/exports/.
 
 from __future__ import annotations
 
+import functools
 import json
 import logging
+import sqlite3
 import subprocess
 from pathlib import Path
 
@@ -40,6 +42,20 @@ CINEMA_GRADE = (
     "unsharp=7:7:1.5:7:7:0.5"
 )
 
+# Deux fils d'encodage par FFmpeg : au-delà, x264 alloue un jeu de tampons par
+# fil et dépasse la mémoire du conteneur sur le serveur à 2 cœurs. Pour occuper
+# une machine plus grosse, on lance plusieurs FFmpeg plutôt que plus de fils.
+FFMPEG_THREADS = 2
+
+# Rendu cinéma par segments (cfg.render_segments) : pas de morceau plus court,
+# sans quoi le démarrage de chaque FFmpeg et le lookahead perdu à chaque
+# coupure mangent le gain.
+SEGMENT_MIN_S = 60
+
+# Par preset x264 : images du lookahead, B-frames, références.
+_X264_IMAGES = {"ultrafast": (0, 0, 1), "superfast": (0, 3, 1), "veryfast": (10, 3, 1),
+                "faster": (20, 3, 2), "fast": (30, 3, 2), "medium": (40, 3, 3)}
+
 # ------------------------------------------------------------------ variété
 # Chaque vidéo tire son propre style (couleurs, police, textes) de façon
 # DÉTERMINISTE (seed = id) — demande de Michel : « toujours du nouveau,
@@ -235,24 +251,18 @@ def _karaoke_events(words_file: Path, duration: float, max_chars: int,
     return out
 
 
-def _face_top_fraction(src: str, at: float = 1.5) -> float | None:
+def _face_top_fraction(cfg: Config, src: str) -> float | None:
     """Fraction verticale (0 = tout en haut) du HAUT du visage détecté dans le clip.
     Sert à décider où placer l'accroche : si le visage est trop haut (pas de place
-    en haut), on descend l'accroche au centre. None si aucun visage détecté."""
+    en haut), on descend l'accroche au centre. None si aucun visage détecté.
+
+    Lu dans la piste des visages de la source (vortex/visage.py) si les
+    miniatures l'ont déjà faite, sinon sondé sur quelques images du début :
+    plus de FFmpeg ni de cascade de Haar à chaque rendu."""
+    from .visage import dossier_pistes, haut_du_visage
+
     try:
-        import cv2
-        import numpy as np
-        out = subprocess.run(
-            [find_ffmpeg(), "-v", "quiet", "-ss", f"{at:.1f}", "-i", src,
-             "-frames:v", "1", "-f", "image2pipe", "-vcodec", "png", "-"],
-            capture_output=True, timeout=60)
-        img = cv2.imdecode(np.frombuffer(out.stdout, np.uint8), cv2.IMREAD_COLOR)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        casc = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-        faces = casc.detectMultiScale(gray, 1.1, 5, minSize=(40, 40))
-        if len(faces):
-            _x, y, _w, _h = max(faces, key=lambda f: f[2] * f[3])
-            return y / img.shape[0]
+        return haut_du_visage(src, pistes=dossier_pistes(cfg))
     except Exception as exc:
         log.debug("Détection visage (position accroche) impossible : %s", exc)
     return None
@@ -261,7 +271,7 @@ def _face_top_fraction(src: str, at: float = 1.5) -> float | None:
 def build_ass(cfg: Config, *, width: int, height: int, duration: float,
               title: str, words_file: Path | None, skip_hook: bool = False,
               lifted: bool = False, video_id: int = 0, luminous: bool = False,
-              hook_center: bool = False) -> str:
+              hook_center: bool = False, filigrane_permanent: bool = True) -> str:
     v = _variant(video_id)
     fontname = v["font"] if not Path(r"C:\Windows\Fonts\arial.ttf").exists() else "Arial"
     accent = r"\c&H" + v["accent"] + "&"
@@ -390,9 +400,7 @@ Style: Handle,{fontname},{fs_handle},&H38FFFFFF,&H38FFFFFF,&H38000000,&H00000000
 Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
 """
     zoom_in = r"{\fad(250,300)\t(0,250,\fscx104\fscy104)\t(250,500,\fscx100\fscy100)}"
-    events = [
-        f"Dialogue: 0,{_ass_time(0)},{_ass_time(duration)},Handle,,0,0,0,,{handle}",
-    ]
+    events: list[str] = []
     # Accroche EN HAUT par défaut (façon OpusClip, au-dessus de la tête). On ne la
     # descend AU CENTRE que pour les rares cas où le visage est trop haut et ne
     # laisse pas la place en haut (retour Michel 15/07). \an5 = ancrage au centre ;
@@ -461,17 +469,111 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
                 start_after=caption_after,
             )
 
+    # Filigrane : toute la durée par défaut. En rendu partiel, il ne paraît
+    # qu'avec les autres incrustations — un filigrane permanent toucherait
+    # chaque image et obligerait à tout réencoder.
+    if filigrane_permanent:
+        plages = [(0.0, duration)]
+    else:
+        from .rendu_partiel import plages_ass
+        plages = plages_ass("\n".join(events))
+    events[:0] = [f"Dialogue: 0,{_ass_time(a)},{_ass_time(b)},Handle,,0,0,0,,{handle}"
+                  for a, b in plages]
+
     return header + "\n".join(events) + "\n"
 
 
-def render_video(cfg: Config, db: Database, video_id: int) -> bool:
+def _ffpath(p: str) -> str:
+    return p.replace("\\", "/").replace(":", r"\:")
+
+
+# Parole cohérente sur YouTube/Instagram/Facebook : l'ancien `-c:a copy`
+# conservait des niveaux allant d'environ -33 LUFS à l'écrêtage. loudnorm +
+# AAC 192 kbit/s donne un niveau social propre et reproductible. AUDIO est
+# la passe unique, faute de mesure ; `reglages_audio` l'emporte dès que la
+# sonie de la source est connue (vortex/sonie.py).
+AUDIO = ["-af", "loudnorm=I=-14:LRA=11:TP=-1.5", "-c:a", "aac", "-b:a", "192k", "-ar", "48000"]
+
+
+def reglages_audio(row) -> list[str]:
+    from .sonie import filtre
+
+    return ["-af", filtre(row), *AUDIO[2:]]
+
+
+def graphe_video(out_w: int, out_h: int, light: bool, ass_file: Path) -> tuple[str, str, str]:
+    """(filtre vidéo, preset, CRF) d'un rendu — repris tel quel par le banc
+    d'essai (vortex/banc.py), qui mesure donc le vrai graphe."""
+    # Vidéo PLEIN ÉCRAN + textes par-dessus (pas de bandes).
+    # - hedjav (léger) : pas d'étalonnage (déjà fait par OpusClip), encodage rapide.
+    # - YouTube brut (Clipper) : étalonnage CINÉMATIQUE complet + qualité maximale.
+    if light:
+        vf = f"scale={out_w}:{out_h}:flags=lanczos,ass='{_ffpath(str(ass_file))}'"
+        return vf, "veryfast", "20"
+    vf = (
+        f"scale={out_w}:{out_h}:flags=lanczos,"
+        f"{CINEMA_GRADE},"
+        f"ass='{_ffpath(str(ass_file))}'"
+    )
+    return vf, "fast", "18"
+
+
+def reglages_x264(preset: str, crf: str, threads: int | None = None) -> list[str]:
+    # Plafond de débit aligné sur ce que YouTube INGÈRE réellement : 12 Mbit/s
+    # en 1080p. Mesuré le 29/07, les rendus sortaient à 16-21 Mbit/s — près du
+    # double, pour rien : YouTube ré-encode tout, et le surplus ne survit pas à
+    # son passage. Il coûtait en revanche 350 à 450 Mo par extrait, sur un
+    # serveur qui n'a que quelques gigaoctets de libre. Le CRF reste le pilote
+    # de la qualité ; le plafond ne mord que sur les pics.
+    #
+    # `threads` : fils de x264 lui-même (option de sortie). Sans, x264 choisit
+    # seul, comme l'a toujours fait le rendu d'un bloc ; le banc d'essai le
+    # fixe pour mesurer son effet, les rendus partiel et par segments pour
+    # ne pas multiplier les fils par le nombre de FFmpeg en parallèle.
+    fils = ["-threads", str(threads)] if threads else []
+    return [*fils, "-preset", preset, "-crf", crf, "-maxrate", "12M", "-bufsize", "24M"]
+
+
+def commande_rendu(ffmpeg: str, src: Path, out: Path, *, vf: str, preset: str, crf: str,
+                   threads: int = FFMPEG_THREADS, fils_x264: int | None = None,
+                   audio: list[str] = AUDIO) -> list[str]:
+    # `-threads` avant `-i` ne borne que le décodeur ; `fils_x264` le répète
+    # côté x264 (voir reglages_x264).
+    return [ffmpeg, "-v", "error", "-threads", str(threads), "-i", str(src),
+            "-vf", vf, "-c:v", "libx264", *reglages_x264(preset, crf, fils_x264),
+            "-pix_fmt", "yuv420p", *audio, "-movflags", "+faststart", "-y", str(out)]
+
+
+def definition_sortie(src_w: int, src_h: int, light: bool,
+                      largeur: int = 0) -> tuple[int, int]:
+    """(largeur, hauteur) de sortie d'un rendu ; `largeur` force la cible."""
+    # Résolution de sortie. Les sources basse définition (TikTok en 576 px de
+    # large) gagnent à être portées en 1080p : YouTube sert alors de meilleurs
+    # codecs. Au-delà, agrandir n'invente aucun détail.
+    #
+    # Les extraits de sermon sortent déjà en 1080p du découpeur. Les pousser en
+    # QHD doublait la mémoire d'FFmpeg : sur ce serveur à 2 cœurs, TOUS les
+    # rendus d'extraits mouraient en SIGKILL (28/07, journal daily.log). On ne
+    # dépasse donc jamais la définition de la source quand elle atteint déjà
+    # 1080p — surchargeable par cfg.render_width pour un serveur plus musclé.
+    default_w = (1080 if src_h > src_w else 1920) if light else (1440 if src_h > src_w else 2560)
+    target_w = largeur or default_w
+    deja_hd = min(src_w, src_h) >= 1080
+    out_w = (src_w if deja_hd else max(src_w, target_w)) // 2 * 2
+    out_h = int(src_h * out_w / src_w) // 2 * 2
+    return out_w, out_h
+
+
+def _preparer_rendu(cfg: Config, db: Database, video_id: int) -> dict | None:
+    """Tout ce qui précède l'encodage : lectures en base, position de
+    l'accroche, fichier .ass et commande FFmpeg. None si rien à rendre."""
     row = db.get(video_id)
     if row is None:
-        return False
+        return None
     src = Path(row["path"])
     if not src.exists():
         log.warning("Fichier inaccessible : %s", src)
-        return False
+        return None
 
     exports = cfg.data_dir / "exports"
     exports.mkdir(parents=True, exist_ok=True)
@@ -491,20 +593,7 @@ def render_video(cfg: Config, db: Database, video_id: int) -> bool:
     # l'étalonnage cinéma complet + la sortie 2K ci-dessous.
     light = (row["name"] or "").startswith("hedjav")
 
-    # Résolution de sortie. Les sources basse définition (TikTok en 576 px de
-    # large) gagnent à être portées en 1080p : YouTube sert alors de meilleurs
-    # codecs. Au-delà, agrandir n'invente aucun détail.
-    #
-    # Les extraits de sermon sortent déjà en 1080p du découpeur. Les pousser en
-    # QHD doublait la mémoire d'FFmpeg : sur ce serveur à 2 cœurs, TOUS les
-    # rendus d'extraits mouraient en SIGKILL (28/07, journal daily.log). On ne
-    # dépasse donc jamais la définition de la source quand elle atteint déjà
-    # 1080p — surchargeable par cfg.render_width pour un serveur plus musclé.
-    default_w = (1080 if src_h > src_w else 1920) if light else (1440 if src_h > src_w else 2560)
-    target_w = int(getattr(cfg, "render_width", 0)) or default_w
-    deja_hd = min(src_w, src_h) >= 1080
-    out_w = (src_w if deja_hd else max(src_w, target_w)) // 2 * 2
-    out_h = int(src_h * out_w / src_w) // 2 * 2
+    out_w, out_h = definition_sortie(src_w, src_h, light, int(getattr(cfg, "render_width", 0)))
 
     # Accroche à l'écran = phrase CHOC courte (thumb_title, 4-6 mots) façon OpusClip,
     # PAS le titre YouTube long/descriptif (retour Michel 14/07 : « le texte est bad »).
@@ -517,87 +606,442 @@ def render_video(cfg: Config, db: Database, video_id: int) -> bool:
     # Position de l'accroche : EN HAUT par défaut ; AU CENTRE seulement si le visage
     # est trop haut et ne laisse pas la place en haut (retour Michel 15/07 : « au
     # centre pour les rares cas où il n'y a pas la place en haut »).
-    ftop = _face_top_fraction(str(src), min(2.0, (duration or 4) / 2))
+    ftop = _face_top_fraction(cfg, str(src))
     hook_center = ftop is not None and ftop < 0.22
 
+    # Rendu partiel (cfg.rendu_partiel) : seulement pour l'habillage léger et
+    # quand l'image garde sa définition — agrandir touche chaque image.
+    partiel = (light and getattr(cfg, "rendu_partiel", False)
+               and (out_w, out_h) == (src_w, src_h))
+
     ass_file = exports / f"{row['name']}.ass"
-    ass_file.write_text(
-        build_ass(cfg, width=out_w, height=out_h,
-                  duration=duration, title=hook_text,
-                  words_file=words_file if words_file.exists() else None,
-                  skip_hook=(has_text == "texte"),
-                  # lifted = ne PAS ajouter de karaoké. Vrai si texte détecté OU si
-                  # c'est un TikTok hedjav (contenu créateur DÉJÀ monté avec OpusClip :
-                  # sous-titres incrustés) → garantit 0 double même si l'OCR rate.
-                  lifted=(has_text in ("texte", "douteux")
-                          or (row["name"] or "").startswith("hedjav")),
-                  video_id=video_id, luminous=True, hook_center=hook_center),
-        encoding="utf-8")
-
-    def _ffpath(p: str) -> str:
-        return p.replace("\\", "/").replace(":", r"\:")
 
-    # Vidéo PLEIN ÉCRAN + textes par-dessus (pas de bandes).
-    # - hedjav (léger) : pas d'étalonnage (déjà fait par OpusClip), encodage rapide.
-    # - YouTube brut (Clipper) : étalonnage CINÉMATIQUE complet + qualité maximale.
-    if light:
-        vf = f"scale={out_w}:{out_h}:flags=lanczos,ass='{_ffpath(str(ass_file))}'"
-        preset, crf = "veryfast", "20"
+    def _ass(filigrane_permanent: bool) -> str:
+        return build_ass(cfg, width=out_w, height=out_h,
+                         duration=duration, title=hook_text,
+                         words_file=words_file if words_file.exists() else None,
+                         skip_hook=(has_text == "texte"),
+                         # lifted = ne PAS ajouter de karaoké. Vrai si texte détecté OU si
+                         # c'est un TikTok hedjav (contenu créateur DÉJÀ monté avec OpusClip :
+                         # sous-titres incrustés) → garantit 0 double même si l'OCR rate.
+                         lifted=(has_text in ("texte", "douteux")
+                                 or (row["name"] or "").startswith("hedjav")),
+                         video_id=video_id, luminous=True, hook_center=hook_center,
+                         filigrane_permanent=filigrane_permanent)
+
+    ass_text = _ass(not partiel)
+    ass_file.write_text(ass_text, encoding="utf-8")
+
+    vf, preset, crf = graphe_video(out_w, out_h, light, ass_file)
+    audio = reglages_audio(row)
+    ffmpeg = find_ffmpeg()
+    profil = f"{out_w}x{out_h}:{preset}:{'leger' if light else 'cinema'}"
+    rss_mo = estimer_rss_mo(out_w, out_h, preset, light, db.pic_rss_rendu(profil))
+    # Habillage cinéma d'un long extrait : N FFmpeg sur N segments
+    # (cfg.render_segments), N fois la mémoire d'un rendu.
+    morceaux = 0 if light else min(int(getattr(cfg, "render_segments", 0) or 0),
+                                   int(duration // SEGMENT_MIN_S))
+
+    # Story et aperçu (cfg.render_sorties) sortent de la même passe que le
+    # master : un décodage, un graphe, un encodeur de plus par sortie. Les
+    # modes partiel et par segments ne produisent que le master ; la story
+    # est alors découpée à la demande, comme avant (facebook_client).
+    sorties = []
+    if not partiel and morceaux < 2:
+        sorties = _sorties_en_plus(cfg, out, duration, preset, crf, audio)
+    if sorties:
+        from .plan_rendu import Sortie, commande
+        master = Sortie("youtube", out, ["-c:v", "libx264", *reglages_x264(preset, crf),
+                                         "-pix_fmt", "yuv420p"], audio)
+        cmd = commande(ffmpeg, src, vf, [*sorties, master], FFMPEG_THREADS)
+        # Un encodeur x264 de plus par sortie : ses images de travail
+        # s'ajoutent au pic (la part fixe de FFmpeg, elle, est commune).
+        # L'aperçu en 360 px ne pèse presque rien.
+        rss_mo += sum(estimer_rss_mo(out_w, out_h, preset, light) - 150
+                      for s in sorties if not s.filtre)
     else:
-        vf = (
-            f"scale={out_w}:{out_h}:flags=lanczos,"
-            f"{CINEMA_GRADE},"
-            f"ass='{_ffpath(str(ass_file))}'"
-        )
-        preset, crf = "fast", "18"
-    # Parole cohérente sur YouTube/Instagram/Facebook : l'ancien `-c:a copy`
-    # conservait des niveaux allant d'environ -33 LUFS à l'écrêtage. Une passe
-    # loudnorm + AAC 192 kbit/s donne un niveau social propre et reproductible.
-    af = "loudnorm=I=-14:LRA=11:TP=-1.5"
-    # Deux fils d'encodage : au-delà, x264 alloue un jeu de tampons par fil et
-    # dépasse la mémoire du conteneur sur ce serveur à 2 cœurs.
-    # Plafond de débit aligné sur ce que YouTube INGÈRE réellement : 12 Mbit/s
-    # en 1080p. Mesuré le 29/07, les rendus sortaient à 16-21 Mbit/s — près du
-    # double, pour rien : YouTube ré-encode tout, et le surplus ne survit pas à
-    # son passage. Il coûtait en revanche 350 à 450 Mo par extrait, sur un
-    # serveur qui n'a que quelques gigaoctets de libre. Le CRF reste le pilote
-    # de la qualité ; le plafond ne mord que sur les pics.
-    cmd = [find_ffmpeg(), "-v", "error", "-threads", "2", "-i", str(src),
-           "-vf", vf, "-af", af,
-           "-c:v", "libx264", "-preset", preset, "-crf", crf,
-           "-maxrate", "12M", "-bufsize", "24M",
-           "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "192k", "-ar", "48000",
-           "-movflags", "+faststart", "-y", str(out)]
+        cmd = commande_rendu(ffmpeg, src, out, vf=vf, preset=preset, crf=crf, audio=audio)
+    job = {"video_id": video_id, "name": row["name"], "cmd": cmd, "out": out, "duree": duration,
+           "ass_file": ass_file, "profil": profil, "rss_mo": rss_mo, "sorties": sorties}
+    if morceaux >= 2:
+        job["segments"] = dict(
+            ffmpeg=ffmpeg, src=src, cible=out, vf=vf, duree=duration,
+            x264=reglages_x264(preset, crf, FFMPEG_THREADS), audio=audio, morceaux=morceaux,
+            duree_min=SEGMENT_MIN_S, video_id=video_id)
+        job["rss_mo"] *= morceaux
+    # Cache adressé par contenu : un rendu de même clé existe déjà (autre nom,
+    # ou effacé des exports mais gardé sur le volume froid) → simple copie.
+    # Les sorties en plus entrent dans la clé par leur rôle, pas par leur
+    # chemin : deux vidéos au même contenu ne diffèrent que par leurs noms.
+    def _neutre(arg: str) -> str:
+        for sortie in sorties:
+            arg = arg.replace(str(sortie.chemin), f"<{sortie.role}>")
+        return (arg.replace(str(src), "<source>").replace(str(out), "<sortie>")
+                .replace(_ffpath(str(ass_file)), "<ass>").replace(str(exports), "<exports>"))
+
+    empreinte = _empreinte_source(db, row, src)
+
+    def _cle(texte: str, en_partiel: bool) -> str | None:
+        return _cle_rendu(
+            empreinte, texte, [_neutre(a) for a in cmd[1:]],
+            mode=f"partiel={en_partiel}:segments={job.get('segments', {}).get('morceaux', 1)}",
+            ffmpeg=cmd[0])
+
+    job["cle"] = _cle(ass_text, bool(partiel))
+    job["dossier_froid"] = cfg.render_cache_froid
+    copie = _copie_en_cache(db, job["cle"], out)
+    if copie:
+        job["depuis_cache"] = copie
+    if partiel:
+        from .rendu_partiel import plages_ass
+        job["partiel"] = dict(
+            ffmpeg=cmd[0], src=src, cible=out, vf=f"ass='{_ffpath(str(ass_file))}'",
+            plages=plages_ass(ass_file.read_text(encoding="utf-8")), duree=duration,
+            x264=reglages_x264(preset, crf, FFMPEG_THREADS), audio=audio, largeur=out_w, hauteur=out_h,
+            video_id=video_id)
+        # Source écartée par rendu_partiel.rendre (codec, réglages, trop à
+        # réencoder) : l'encodage complet qui prend le relais doit retrouver
+        # le filigrane permanent, sous la clé d'un rendu complet.
+        plein = _ass(True)
+        job["repli"] = {"ass_text": plein, "cle": _cle(plein, False)}
+        copie = _copie_en_cache(db, job["repli"]["cle"], out)
+        if copie:
+            job["repli"]["depuis_cache"] = copie
+    return job
+
+
+def _copie_en_cache(db: Database, cle: str | None, out: Path) -> Path | None:
+    """Rendu de clé `cle` encore lisible (exports ou volume froid), ou None."""
+    connu = db.rendu_en_cache(cle) if cle else None
+    if connu:
+        for copie in (connu["path"], connu["froid"]):
+            if copie and Path(copie) != out and Path(copie).is_file():
+                return Path(copie)
+    return None
+
+
+def _sorties_en_plus(cfg: Config, out: Path, duree: float, preset: str, crf: str,
+                     audio: list[str]) -> list:
+    """Sorties demandées par cfg.render_sorties, en plus du master YouTube.
+
+    Une vidéo qui tient déjà dans une story n'a pas besoin de découpe : le
+    master lui-même servira (voir _conclure_rendu).
+    """
+    from .plan_rendu import STORY_MAX_S, Sortie
+
+    roles = set(getattr(cfg, "render_sorties", None) or [])
+    sorties = []
+    if "story" in roles and duree > STORY_MAX_S + 1:
+        story = Sortie("story", out.with_name(f"story_{out.stem}.mp4"),
+                       ["-c:v", "libx264", *reglages_x264(preset, crf), "-pix_fmt", "yuv420p"],
+                       audio, duree_max=STORY_MAX_S)
+        sorties.append(story)
+    if "apercu" in roles:
+        # Aperçu pour le tableau de bord : 360 px de large, débit de téléphone.
+        apercu = Sortie("apercu", out.with_name(f"{out.stem[:-2]}_apercu.mp4"),
+                        ["-c:v", "libx264", "-threads", "1", "-preset", "veryfast",
+                         "-crf", "30", "-maxrate", "600k", "-bufsize", "1200k",
+                         "-pix_fmt", "yuv420p"],
+                        ["-c:a", "aac", "-b:a", "64k", "-ac", "1"],
+                        filtre="scale=360:-2")
+        sorties.append(apercu)
+    return sorties
+
+
+def _lancer_ffmpeg(cmd: list[str], timeout: float = 7200, *, video_id: int | None = None,
+                   duree: float | None = None) -> tuple[int, bytes, int | None]:
+    """Lance FFmpeg ; retourne (code de sortie, stderr, pic RSS en Mo ou None).
+
+    Le pic vient de `wait4` (voir vortex/lanceur.py) : la mémoire réellement
+    atteinte par CE processus, pas par l'ensemble des enfants.
+    """
+    from .lanceur import lancer
+
+    passage = lancer(cmd, etape="rendu", video_id=video_id, sortie=Path(cmd[-1]),
+                     duree=duree, timeout=timeout)
+    return passage.code, passage.stderr, passage.pic_mo
+
+
+def _executer_rendu(job: dict) -> tuple[int, bytes, int | None]:
+    """Encodage seul : tourne dans un fil du pool, sans toucher la base.
+
+    Copie depuis le cache si un rendu de même clé existe ; sinon rendu
+    partiel ou par segments s'il est prévu et applicable, et à défaut
+    encodage d'un bloc (le seul dont le pic mémoire est mesuré). Le temps
+    d'encodage et la copie froide sont notés dans `job`.
+    """
+    import time
+
     try:
-        subprocess.run(cmd, capture_output=True, timeout=7200, check=True)
-    except subprocess.CalledProcessError as exc:
-        log.error("Rendu échoué pour %s : %s", row["name"], exc.stderr[-400:] if exc.stderr else exc)
-        return False
+        if _copier_du_cache(job):
+            return 0, b"", None
+        # Story et aperçu d'un rendu précédent : ils ne doivent pas survivre
+        # à un rendu qui ne les refait pas (partiel, segments, échec).
+        for sortie in job.get("sorties", ()):
+            sortie.chemin.unlink(missing_ok=True)
+        depart = time.monotonic()
+        fait = None
+        if job.get("partiel"):
+            from .rendu_partiel import rendre
+            fait = rendre(**job["partiel"])
+            if fait is None:
+                # Rendu complet à la place : filigrane permanent et clé du
+                # rendu complet (voir _preparer_rendu), peut-être déjà en cache.
+                log.info("Rendu complet de %s, filigrane permanent rétabli", job["name"])
+                repli = job.pop("repli")
+                job["ass_file"].write_text(repli.pop("ass_text"), encoding="utf-8")
+                job.update(repli)
+                if _copier_du_cache(job):
+                    return 0, b"", None
+        if fait is None and job.get("segments"):
+            from .rendu_partiel import rendre_en_parallele
+            fait = rendre_en_parallele(**job["segments"])
+        code, stderr, pic = (fait[0], fait[1], None) if fait else _lancer_ffmpeg(
+            job["cmd"], video_id=job["video_id"], duree=job["duree"])
+        job["cout_s"] = time.monotonic() - depart
+        if code == 0 and job.get("cle") and job.get("dossier_froid"):
+            job["froid"] = _copier_froid(job["out"], Path(job["dossier_froid"]), job["cle"])
+        return code, stderr, pic
     finally:
-        ass_file.unlink(missing_ok=True)
-
-    cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-    if "render_path" not in cols:
-        db.conn.execute("ALTER TABLE videos ADD COLUMN render_path TEXT")
-        db.conn.commit()
-    db.update_fields(video_id, render_path=str(out))
-    log.info("Rendu OK : %s", out.name)
+        job["ass_file"].unlink(missing_ok=True)
+
+
+def _copier_du_cache(job: dict) -> bool:
+    """Copie vers la sortie du rendu de même clé, s'il y en a un de lisible."""
+    import shutil
+
+    if not job.get("depuis_cache"):
+        return False
+    try:
+        shutil.copyfile(job["depuis_cache"], job["out"])
+        return True
+    except OSError as exc:
+        log.warning("Cache de rendu illisible (%s) : réencodage", exc)
+        job.pop("depuis_cache")
+        return False
+
+
+def _copier_froid(out: Path, dossier: Path, cle: str) -> str | None:
+    """Copie du rendu sur le volume froid, sous son empreinte. Un échec n'est
+    pas grave : le rendu reste en place, il manquera seulement au cache."""
+    import shutil
+
+    cible = dossier / cle[:2] / f"{cle}.mp4"
+    if cible.is_file():
+        return str(cible)
+    try:
+        cible.parent.mkdir(parents=True, exist_ok=True)
+        provisoire = cible.with_suffix(".part")
+        shutil.copyfile(out, provisoire)
+        provisoire.replace(cible)
+    except OSError as exc:
+        log.warning("Copie froide impossible pour %s : %s", out.name, exc)
+        return None
+    return str(cible)
+
+
+@functools.lru_cache(maxsize=None)
+def _version_ffmpeg(ffmpeg: str) -> str:
+    try:
+        sortie = subprocess.run([ffmpeg, "-version"], capture_output=True, text=True,
+                                timeout=30)
+    except (OSError, subprocess.TimeoutExpired):
+        return ""
+    return (sortie.stdout.splitlines() or [""])[0]
+
+
+def _empreinte_source(db: Database, row, src: Path) -> str | None:
+    """sha256 complet de la source, calculé ici s'il manque encore.
+
+    L'empreinte rapide (fast_fp) n'échantillonne que quelques blocs : deux
+    sources qui ne diffèrent qu'ailleurs partageraient une clé, et l'une
+    recevrait le rendu de l'autre. Un extrait se hache en une seconde ou
+    deux ; sans empreinte sûre, pas de cache (None).
+    """
+    if row["sha256"]:
+        return row["sha256"]
+    from .scanner import sha256_file
+
+    try:
+        empreinte = sha256_file(src)
+    except OSError as exc:
+        log.warning("Empreinte de %s impossible (%s) : rendu hors cache", src.name, exc)
+        return None
+    try:
+        db.update_fields(row["id"], sha256=empreinte)
+    except sqlite3.IntegrityError:
+        # Même contenu qu'une autre vidéo déjà en base : doublon que le
+        # scanner tranchera ; pas de clé tant qu'il ne l'a pas fait.
+        log.warning("%s : même sha256 qu'une autre vidéo, rendu hors cache", src.name)
+        return None
+    return empreinte
+
+
+def _cle_rendu(source: str | None, ass_text: str, args: list[str], *, mode: str,
+               ffmpeg: str) -> str | None:
+    """Empreinte d'un rendu : même clé, même fichier de sortie. None sans
+    empreinte complète de la source (voir _empreinte_source)."""
+    import hashlib
+
+    version = _version_ffmpeg(ffmpeg)
+    if not source or not version:
+        return None
+    contenu = json.dumps({"source": source, "ass": ass_text, "args": args,
+                          "mode": mode, "ffmpeg": version}, ensure_ascii=False)
+    return hashlib.sha256(contenu.encode("utf-8")).hexdigest()
+
+
+def _conclure_rendu(db: Database, job: dict, code: int, stderr: bytes,
+                    pic_mo: int | None) -> bool:
+    from .lanceur import DELAI_DEPASSE, enregistrer
+    from .plan_rendu import STORY_MAX_S
+
+    enregistrer(db)
+    if pic_mo:
+        db.noter_pic_rss_rendu(job["profil"], pic_mo)
+    if code != 0:
+        # -9 : tué par le noyau, presque toujours faute de mémoire ; le délai
+        # dépassé a son propre code (vortex/lanceur.py).
+        if code == DELAI_DEPASSE:
+            raison = "délai dépassé"
+        elif code == -9:
+            raison = "SIGKILL (mémoire ?)"
+        else:
+            raison = stderr[-400:] if stderr else code
+        log.error("Rendu échoué pour %s : %s", job["name"], raison)
+        return False
+    # Le master est la story d'une vidéo assez courte (voir _sorties_en_plus).
+    produits = [("youtube", job["out"])]
+    if job["duree"] <= STORY_MAX_S + 1:
+        produits.append(("story", job["out"]))
+    produits += [(s.role, s.chemin) for s in job.get("sorties", ()) if s.chemin.is_file()]
+    with db.transaction():
+        db.update_fields(job["video_id"], render_path=str(job["out"]))
+        if job.get("cle"):
+            db.noter_rendu_cache(job["cle"], video_id=job["video_id"], path=str(job["out"]),
+                                 taille=job["out"].stat().st_size, cout_s=job.get("cout_s"),
+                                 froid=job.get("froid"))
+        db.noter_sorties_rendu(job["video_id"], [(role, str(chemin), chemin.stat().st_size)
+                                                 for role, chemin in produits])
+    if job.get("depuis_cache"):
+        log.info("Rendu repris du cache : %s (copie de %s)", job["out"].name,
+                 job["depuis_cache"].name)
+    else:
+        log.info("Rendu OK : %s%s", job["out"].name, f" (pic {pic_mo} Mo)" if pic_mo else "")
     return True
 
 
+def render_video(cfg: Config, db: Database, video_id: int) -> bool:
+    job = _preparer_rendu(cfg, db, video_id)
+    if job is None:
+        return False
+    return _conclure_rendu(db, job, *_executer_rendu(job))
+
+
+# ---------------------------------------------------------------- ordonnanceur
+def estimer_rss_mo(out_w: int, out_h: int, preset: str, light: bool,
+                   observe_mo: int | None = None) -> int:
+    """Pic de mémoire prévu pour un rendu, en Mo.
+
+    x264 garde en mémoire chaque image du lookahead, des B-frames et des
+    références, plus une par fil ; chacune pèse environ 5,5 octets par pixel
+    (plans demi-pixel et version quart de résolution compris). Le graphe de
+    filtres en ajoute quelques-unes au format 4:2:0, bien plus pour
+    l'étalonnage cinéma (débruitage + accentuation). Recoupé avec le 28/07 :
+    un extrait cinéma en QHD dépasse 1 Go et était tué sur le serveur à
+    800 Mo libres, le même en 1080p passe (~640 Mo).
+
+    Un pic déjà mesuré pour ce profil plus haut que le modèle l'emporte,
+    majoré de 10 %.
+    """
+    pixels = out_w * out_h
+    lookahead, bframes, refs = _X264_IMAGES.get(preset, _X264_IMAGES["medium"])
+    x264 = (lookahead + bframes + refs + FFMPEG_THREADS + 3) * pixels * 5.5
+    filtres = (4 if light else 10) * pixels * 1.5
+    estime = int(150 + (x264 + filtres) / 2**20)
+    if observe_mo:
+        estime = max(estime, int(observe_mo * 1.1))
+    return estime
+
+
+def _lire(chemin: str) -> str | None:
+    try:
+        return Path(chemin).read_text(encoding="utf-8").strip()
+    except OSError:
+        return None
+
+
+def memoire_disponible_mo() -> int | None:
+    """Plafond mémoire du conteneur (cgroup v2 puis v1), sinon RAM de la
+    machine. None si rien n'est lisible (Windows)."""
+    import os
+
+    for limite, usage in (("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory.current"),
+                          ("/sys/fs/cgroup/memory/memory.limit_in_bytes",
+                           "/sys/fs/cgroup/memory/memory.usage_in_bytes")):
+        valeur = _lire(limite)
+        # « max » (v2) ou un nombre astronomique (v1) : pas de plafond posé.
+        if valeur and valeur.isdigit() and int(valeur) < 1 << 60:
+            return int(valeur) >> 20
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") >> 20
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def coeurs_disponibles() -> int:
+    """Cœurs réellement accordés : quota CPU du cgroup, sinon affinité."""
+    import os
+
+    quota = _lire("/sys/fs/cgroup/cpu.max")
+    if quota and not quota.startswith("max"):
+        q, periode = quota.split()[:2]
+        return max(1, int(q) // int(periode))
+    q, periode = _lire("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _lire("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+    if q and periode and int(q) > 0:
+        return max(1, int(q) // int(periode))
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _budget_rendu_mo(cfg: Config) -> int | None:
+    """Mémoire que les FFmpeg simultanés peuvent se partager.
+
+    Marge de 15 % pour le reste du conteneur (Python, cache disque, le
+    dashboard), moins ce que ce processus occupe déjà.
+    """
+    forcee = int(getattr(cfg, "render_memoire_mo", 0) or 0)
+    if forcee:
+        return forcee
+    total = memoire_disponible_mo()
+    if total is None:
+        return None
+    import resource
+    moi = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss // 1024
+    return int(total * 0.85) - moi
+
+
 def render_pending(cfg: Config, db: Database, limit: int = 0) -> int:
-    """Habille les vidéos READY sans rendu, dans l'ordre de publication."""
-    cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-    if "render_path" not in cols:
-        db.conn.execute("ALTER TABLE videos ADD COLUMN render_path TEXT")
-        db.conn.commit()
+    """Habille les vidéos READY sans rendu, dans l'ordre de publication.
+
+    Plusieurs FFmpeg tournent en même temps tant que la somme de leurs pics
+    de mémoire prévus (`estimer_rss_mo`) tient dans le budget du conteneur,
+    et sans dépasser un FFmpeg par paire de cœurs. Sur le serveur à 2 cœurs,
+    cela redonne le rendu un par un d'avant ; sur le PC, tous les cœurs
+    travaillent. Un rendu seul qui dépasse le budget part quand même, mais
+    seul.
+    """
     # Réserve d'avance : un rendu pèse 20 à 200 Mo et n'est effacé qu'une fois
     # la vidéo en ligne. Le pipeline tournant plus souvent que la publication
     # n'écoule (quatre passages par jour contre huit publications), les rendus
     # excédentaires s'accumulaient de plusieurs gigaoctets par jour. On s'arrête
     # donc dès qu'il y a de quoi tenir deux jours de publication.
     avance_max = max(int(getattr(cfg, "daily_limit", 5)) * 2, 4)
-    from .thumbs import valid_thumbnail
+    # Mode juste-à-temps (cfg.render_jit) : la réserve fixe cède la place au
+    # calendrier des créneaux, voir _calendrier_jit.
+    jit = _calendrier_jit(cfg, db) if getattr(cfg, "render_jit", False) else None
 
     # La réserve se compte EN PARCOURANT du plus récent au plus ancien, dans
     # l'ordre même de la publication. Un décompte global bloquait les nouveaux
@@ -607,29 +1051,168 @@ def render_pending(cfg: Config, db: Database, limit: int = 0) -> int:
     # comme on publie le récent d'abord, s'arrêter sur lui est justement le
     # bon comportement.
     rows = db.conn.execute(
-        "SELECT id, name, render_path, thumb_path FROM videos WHERE state = 'READY' "
+        "SELECT id, name, duration_s, render_path, thumb_path FROM videos WHERE state = 'READY' "
         "ORDER BY rowid DESC, "
         "CASE WHEN duration_s BETWEEN 30 AND 180 THEN 0 ELSE 1 END, "
         "duration_s DESC").fetchall()
 
+    jobs_max = int(getattr(cfg, "render_jobs", 0) or 0) \
+        or max(1, coeurs_disponibles() // FFMPEG_THREADS)
+    budget = _budget_rendu_mo(cfg)
+    if jobs_max > 1:
+        log.info("Rendu : jusqu'à %d FFmpeg simultanés, budget mémoire %s Mo",
+                 jobs_max, budget if budget is not None else "inconnu")
+
+    if jit is not None:
+        jit["fils"] = jobs_max
+
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    # Réserve et limite sont comptées au lancement, comme si le rendu allait
+    # réussir ; un échec rend sa place.
     prets = done = 0
-    for r in rows:
-        if prets >= avance_max:
-            log.info("Réserve atteinte (%d vidéos publiables d'avance) — habillage en pause",
-                     avance_max)
-            break
-        if limit and done >= limit:
-            break
-        deja = r["render_path"] and Path(r["render_path"]).is_file()
-        if deja:
-            # Déjà habillée : elle occupe la réserve si elle est publiable.
-            if valid_thumbnail(r["thumb_path"]):
-                prets += 1
-            continue
+    file = iter(rows)
+    attente = None               # (job, publiable) préparé mais pas encore admis
+    en_cours: dict = {}          # futur -> (job, publiable)
+    engage_mo = 0
+    with ThreadPoolExecutor(max_workers=jobs_max, thread_name_prefix="vortex-render") as pool:
+        while True:
+            while len(en_cours) < jobs_max:
+                if attente is None:
+                    if limit and done >= limit:
+                        break
+                    attente = _prochain_rendu(cfg, db, file, prets, avance_max, jit)
+                    if attente is None:
+                        break
+                    if attente[0] is None:        # déjà habillée
+                        prets += attente[1]
+                        attente = None
+                        continue
+                job, publiable = attente
+                if en_cours and budget is not None and engage_mo + job["rss_mo"] > budget:
+                    break                         # attendre qu'un rendu libère sa mémoire
+                if not en_cours and budget is not None and job["rss_mo"] > budget:
+                    log.warning("%s : pic prévu %d Mo pour %d Mo disponibles — rendu seul",
+                                job["name"], job["rss_mo"], budget)
+                en_cours[pool.submit(_executer_rendu, job)] = attente
+                engage_mo += job["rss_mo"]
+                done += 1
+                prets += publiable
+                attente = None
+            if not en_cours:
+                break
+            finis, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+            for futur in finis:
+                job, publiable = en_cours.pop(futur)
+                engage_mo -= job["rss_mo"]
+                try:
+                    resultat = futur.result()
+                except Exception as exc:
+                    resultat = (-1, str(exc).encode(), None)
+                if not _conclure_rendu(db, job, *resultat):
+                    done -= 1
+                    prets -= publiable
+    if attente is not None:
+        attente[0]["ass_file"].unlink(missing_ok=True)
+    return done
+
+
+def _prochain_rendu(cfg: Config, db: Database, file, prets: int, avance_max: int,
+                    jit: dict | None = None) -> tuple[dict | None, bool] | None:
+    """Prochaine vidéo de la file : (job, publiable), (None, publiable) pour une
+    vidéo déjà habillée, None quand il faut s'arrêter."""
+    from .thumbs import valid_thumbnail
+
+    if jit is None and prets >= avance_max:
+        log.info("Réserve atteinte (%d vidéos publiables d'avance) — habillage en pause",
+                 avance_max)
+        return None
+    for r in file:
+        publiable = bool(valid_thumbnail(r["thumb_path"]))
+        if r["render_path"] and Path(r["render_path"]).is_file():
+            # Déjà habillée : elle occupe la réserve si elle est publiable,
+            # et en juste-à-temps un créneau dans tous les cas.
+            if jit is not None:
+                jit["rang"] += 1
+            return None, publiable
         if r["render_path"]:
             db.update_fields(r["id"], render_path=None)
-        if render_video(cfg, db, r["id"]):
-            done += 1
-            if valid_thumbnail(r["thumb_path"]):
-                prets += 1
-    return done
+        if jit is not None and not _rendre_maintenant(jit, r):
+            return None
+        job = _preparer_rendu(cfg, db, r["id"])
+        if job is not None:
+            return job, publiable
+    return None
+
+
+# ------------------------------------------------------------ juste-à-temps
+# Durée de rendu par seconde de vidéo, faute d'historique : ~10 min pour un
+# extrait cinéma de 2 à 3 min agrandi en 2K sur le serveur, un peu moins que
+# le temps réel pour l'habillage léger.
+RENDU_S_PAR_S = {True: 1.0, False: 4.0}
+
+
+def _calendrier_jit(cfg: Config, db: Database) -> dict:
+    """Créneaux à venir et vitesses de rendu mesurées, pour `_rendre_maintenant`.
+
+    Plutôt que de tenir deux jours d'avance (la réserve fixe), chaque vidéo
+    de la file est rapprochée du créneau qu'elle occupera — la k-ième vidéo
+    dans l'ordre de publication prend le k-ième créneau libre — et n'est
+    habillée que si, en attendant le passage suivant du pipeline
+    (cfg.render_jit_cycle_min), son rendu risquerait de finir moins de
+    cfg.render_jit_marge_min avant ce créneau. Le stock de rendus sur disque
+    suit donc les créneaux réellement proches ; l'envoi vers YouTube, lui,
+    se fait alors environ un passage avant le créneau, et non plus des jours
+    avant.
+    """
+    from datetime import datetime, timedelta, timezone
+
+    from .schedule import next_free_slots
+
+    # Durée d'encodage réelle (cache de rendu) rapportée à la durée de la
+    # vidéo, séparément pour l'habillage léger et le cinéma. Le 9e décile
+    # plutôt que la médiane : un rendu en retard coûte un créneau vide.
+    mesures: dict[bool, list[float]] = {True: [], False: []}
+    for r in db.durees_rendu():
+        mesures[(r["name"] or "").startswith("hedjav")].append(r["cout_s"] / r["duration_s"])
+    vitesses = {}
+    for leger, valeurs in mesures.items():
+        valeurs.sort()
+        vitesses[leger] = (valeurs[int(len(valeurs) * 0.9)] if len(valeurs) >= 5
+                           else RENDU_S_PAR_S[leger])
+    horizon = max(int(getattr(cfg, "daily_limit", 5)) * 7, 8)
+    return {
+        "creneaux": next_free_slots(cfg, db, horizon),
+        "maintenant": datetime.now(timezone.utc),
+        "marge": timedelta(minutes=int(getattr(cfg, "render_jit_marge_min", 90))),
+        "cycle": timedelta(minutes=int(getattr(cfg, "render_jit_cycle_min", 360))),
+        "vitesses": vitesses, "rang": 0, "file_s": 0.0, "fils": 1,
+    }
+
+
+def _rendre_maintenant(jit: dict, r) -> bool:
+    """Vrai s'il faut habiller `r` dès ce passage pour tenir son créneau.
+
+    Les rendus déjà lancés dans ce passage passent avant : leur durée prévue,
+    partagée entre les FFmpeg simultanés, s'ajoute à celle de `r`. Les
+    vidéos suivantes de la file visent des créneaux plus tardifs : un refus
+    arrête le parcours.
+    """
+    from datetime import timedelta
+
+    creneaux, rang = jit["creneaux"], jit["rang"]
+    if rang >= len(creneaux):
+        log.info("Juste-à-temps : plus de créneau libre en vue — habillage en pause")
+        return False
+    leger = (r["name"] or "").startswith("hedjav")
+    prevu_s = jit["vitesses"][leger] * (r["duration_s"] or 30)
+    attente_s = jit["file_s"] / max(jit["fils"], 1)
+    au_plus_tard = creneaux[rang] - jit["marge"] - timedelta(seconds=attente_s + prevu_s)
+    if au_plus_tard > jit["maintenant"] + jit["cycle"]:
+        log.info("Juste-à-temps : %s attendra (créneau %s, rendu prévu %.0f min, "
+                 "à lancer avant %s UTC)", r["name"], creneaux[rang].strftime("%d/%m %H:%M"),
+                 prevu_s / 60, au_plus_tard.strftime("%d/%m %H:%M"))
+        return False
+    jit["rang"] += 1
+    jit["file_s"] += prevu_s
+    return True
@@ -0,0 +1,357 @@
+"""Rendu PARTIEL : ne réencoder que les GOP que les incrustations touchent.
+
+Un TikTok hedjav de trois minutes ne reçoit qu'une accroche (5 s), quelques
+badges et le CTA final ; le reste de l'image sort tel qu'OpusClip l'a
+livré. Le réencoder en entier coûte plusieurs minutes de libx264 pour ne
+rien changer à 90 % des images. Même chose pour `habillage.habiller`, dont
+les deux bandeaux couvrent une quinzaine de secondes.
+
+Principe :
+1. les plages où une incrustation est visible (événements `Dialogue` du
+   .ass, ou bandeaux de l'habillage) sont élargies aux images clés qui les
+   encadrent ;
+2. ces segments sont réencodés avec le filtre, les autres copiés tels quels
+   (`-c copy`), chacun en MPEG-TS ;
+3. le démultiplexeur `concat` recolle la vidéo, l'audio de la source est
+   traité à part (loudnorm ou copie, au choix de l'appelant).
+
+Les segments réencodés reprennent le profil, le niveau, la cadence et la
+signalisation des couleurs de la source (lus par ffprobe) ; chacun est
+vérifié après encodage, et le MP4 recollé garde la base de temps de la
+source. `scripts/verif_rendu_partiel.py` contrôle le tout de bout en bout.
+
+On renonce (retour None, l'appelant encode tout) quand le gain n'existe pas
+ou que le recollage serait risqué : source autre que H.264 4:2:0, profil
+que x264 ne reproduit pas, segment réencodé différent de la source, sortie
+redimensionnée, pas d'images clés lisibles, ou plages alignées couvrant
+plus de COUVERTURE_MAX de la durée.
+
+Limite connue : une source en GOP OUVERT (B-frames qui référencent le GOP
+précédent) peut montrer quelques images abîmées à la jonction d'un segment
+copié. Les exports OpusClip et YouTube sont en GOP fermé.
+
+Le même découpage sert au rendu cinéma EN PARALLÈLE (`rendre_en_parallele`,
+plus bas) : là, chaque segment est réencodé, mais par son propre FFmpeg.
+"""
+
+from __future__ import annotations
+
+import logging
+import re
+import subprocess
+import tempfile
+from pathlib import Path
+
+log = logging.getLogger("vortex.rendu_partiel")
+
+# Au-delà, copier ce qui reste ne vaut plus les passes supplémentaires.
+COUVERTURE_MAX = 0.6
+
+_DIALOGUE = re.compile(r"^Dialogue:\s*[^,]*,([^,]+),([^,]+),")
+
+
+def _secondes(horodatage: str) -> float:
+    h, m, s = horodatage.strip().split(":")
+    return int(h) * 3600 + int(m) * 60 + float(s)
+
+
+def fusionner(plages: list[tuple[float, float]]) -> list[tuple[float, float]]:
+    """Trie et réunit les plages qui se chevauchent ou se touchent."""
+    fusion: list[tuple[float, float]] = []
+    for debut, fin in sorted(p for p in plages if p[1] > p[0]):
+        if fusion and debut <= fusion[-1][1]:
+            fusion[-1] = (fusion[-1][0], max(fusion[-1][1], fin))
+        else:
+            fusion.append((debut, fin))
+    return fusion
+
+
+def plages_ass(texte: str) -> list[tuple[float, float]]:
+    """Intervalles (s) où au moins un événement du .ass est affiché."""
+    plages = []
+    for ligne in texte.splitlines():
+        m = _DIALOGUE.match(ligne)
+        if m:
+            plages.append((_secondes(m.group(1)), _secondes(m.group(2))))
+    return fusionner(plages)
+
+
+def _ffprobe(ffmpeg: str) -> str:
+    """ffprobe est livré à côté de ffmpeg (même dossier, même suffixe .exe)."""
+    chemin = Path(ffmpeg)
+    return str(chemin.with_name(chemin.name.replace("ffmpeg", "ffprobe")))
+
+
+# Ce que le flux recollé doit garder d'un segment à l'autre : un segment
+# réencodé qui en diffère (profil, niveau, cadence, couleurs) rendrait le
+# H.264 final non conforme, et certains lecteurs s'arrêtent à la jonction.
+SIGNATURE = ("codec_name", "profile", "level", "pix_fmt", "width", "height",
+             "r_frame_rate", "field_order", "color_range", "color_space",
+             "color_primaries", "color_transfer")
+
+_PROFILS_X264 = {"High": "high", "Main": "main", "Constrained Baseline": "baseline",
+                 "Baseline": "baseline"}
+
+
+def flux_video(ffprobe: str, src: Path) -> dict | None:
+    try:
+        sortie = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0", "-show_entries",
+             "stream=" + ",".join(SIGNATURE + ("time_base",)), "-of", "default=nw=1",
+             str(src)],
+            capture_output=True, text=True, timeout=60)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    champs = dict(l.split("=", 1) for l in sortie.stdout.splitlines() if "=" in l)
+    return champs or None
+
+
+def reglages_conformes(flux: dict) -> list[str] | None:
+    """Options x264 qui reproduisent le flux de la source : profil, niveau,
+    cadence et signalisation des couleurs. None si x264 ne sait pas
+    reproduire ce profil (High 10, 4:2:2…)."""
+    profil = _PROFILS_X264.get(flux.get("profile", ""))
+    try:
+        niveau = int(flux.get("level") or 0)
+    except ValueError:
+        niveau = 0
+    cadence = flux.get("r_frame_rate", "")
+    if not profil or niveau <= 0 or cadence in ("", "0/0"):
+        return None
+    options = ["-profile:v", profil, "-level:v", f"{niveau / 10:g}",
+               "-r", cadence, "-fps_mode", "cfr"]
+    for champ, option in (("color_range", "-color_range"), ("color_space", "-colorspace"),
+                          ("color_primaries", "-color_primaries"),
+                          ("color_transfer", "-color_trc")):
+        if flux.get(champ) not in (None, "", "unknown"):
+            options += [option, flux[champ]]
+    return options
+
+
+def _ecarts(ffprobe: str, source: dict, morceau: Path) -> list[str]:
+    """Champs de SIGNATURE où `morceau` diffère de la source."""
+    flux = flux_video(ffprobe, morceau) or {}
+    return [f"{c}={flux.get(c)}≠{source.get(c)}" for c in SIGNATURE
+            if flux.get(c) != source.get(c)]
+
+
+def images_cles(ffprobe: str, src: Path) -> list[float]:
+    """Instants (s) des images clés de la piste vidéo, lus dans les paquets.
+
+    Lire les paquets ne décode rien : une seconde pour un clip de 3 min.
+    """
+    try:
+        sortie = subprocess.run(
+            [ffprobe, "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=pts_time,flags", "-of", "csv=p=0", str(src)],
+            capture_output=True, text=True, timeout=300)
+    except (OSError, subprocess.TimeoutExpired):
+        return []
+    cles = []
+    for ligne in sortie.stdout.splitlines():
+        pts, _, flags = ligne.partition(",")
+        if "K" in flags:
+            try:
+                cles.append(float(pts))
+            except ValueError:
+                continue
+    return sorted(set(cles))
+
+
+def segments(plages: list[tuple[float, float]], cles: list[float],
+             duree: float) -> list[tuple[float, float, bool]]:
+    """Découpe [0, durée] en (début, fin, à_encoder), bornes sur des images clés.
+
+    Chaque plage est étendue à l'image clé qui la précède et à celle qui la
+    suit : un segment copié commence toujours sur une image clé.
+    """
+    import bisect
+
+    if not cles or cles[0] > 0.05:
+        cles = [0.0] + cles
+    alignees = []
+    for debut, fin in plages:
+        i = bisect.bisect_right(cles, debut) - 1
+        j = bisect.bisect_right(cles, fin)
+        alignees.append((cles[max(i, 0)], cles[j] if j < len(cles) else duree))
+    decoupe: list[tuple[float, float, bool]] = []
+    curseur = 0.0
+    for debut, fin in fusionner(alignees):
+        if debut > curseur:
+            decoupe.append((curseur, debut, False))
+        decoupe.append((debut, min(fin, duree), True))
+        curseur = fin
+    if curseur < duree:
+        decoupe.append((curseur, duree, False))
+    return decoupe
+
+
+def _lancer(cmd: list[str], timeout: float, etape: str,
+            video_id: int | None) -> tuple[int, bytes]:
+    from .lanceur import lancer
+
+    passage = lancer(cmd, etape=etape, video_id=video_id, sortie=Path(cmd[-1]),
+                     timeout=timeout)
+    return passage.code, passage.stderr
+
+
+def rendre(ffmpeg: str, src: Path, cible: Path, *, vf: str,
+           plages: list[tuple[float, float]], duree: float, x264: list[str],
+           audio: list[str], largeur: int = 0, hauteur: int = 0,
+           timeout: float = 7200, etape: str = "rendu_partiel",
+           video_id: int | None = None) -> tuple[int, bytes] | None:
+    """Rend `cible` en ne réencodant que les segments touchés par `vf`.
+
+    `vf` est évalué sur le temps de la SOURCE (le segment est recalé avant le
+    filtre), donc un `ass=` ou un `drawtext` écrit pour la vidéo entière
+    s'applique tel quel. `x264` : réglages d'encodage des segments ; `audio` :
+    options de sortie de la piste son. `largeur`/`hauteur` : définition de
+    sortie attendue, vérifiée contre la source (0 : le filtre ne
+    redimensionne pas). Retourne (code, stderr) comme `subprocess.run`, ou
+    None si le rendu partiel ne s'applique pas.
+    """
+    ffprobe = _ffprobe(ffmpeg)
+    flux = flux_video(ffprobe, src)
+    if not flux or flux.get("codec_name") != "h264" or flux.get("pix_fmt") != "yuv420p":
+        log.info("Rendu partiel écarté pour %s : flux %s", src.name, flux)
+        return None
+    conformes = reglages_conformes(flux)
+    if conformes is None:
+        log.info("Rendu partiel écarté pour %s : profil %s niveau %s cadence %s",
+                 src.name, flux.get("profile"), flux.get("level"), flux.get("r_frame_rate"))
+        return None
+    if largeur and (int(flux.get("width") or 0), int(flux.get("height") or 0)) != (largeur, hauteur):
+        return None
+    cles = images_cles(ffprobe, src)
+    if len(cles) < 2 or not plages:
+        return None
+    decoupe = segments(plages, cles, duree)
+    couvert = sum(fin - debut for debut, fin, encoder in decoupe if encoder)
+    if couvert >= COUVERTURE_MAX * duree:
+        log.info("Rendu partiel écarté pour %s : %.0f s à réencoder sur %.0f s",
+                 src.name, couvert, duree)
+        return None
+
+    commun = [ffmpeg, "-nostdin", "-v", "error", "-y"]
+    with tempfile.TemporaryDirectory(prefix="vortex-partiel-") as tmp:
+        dossier = Path(tmp)
+        morceaux = []
+        for n, (debut, fin, encoder) in enumerate(decoupe):
+            morceau = dossier / f"seg{n:04d}.ts"
+            cmd = (_encoder(commun, src, debut, fin, vf, [*x264, *conformes], morceau)
+                   if encoder else _copier(commun, src, debut, fin, morceau))
+            code, stderr = _lancer(cmd, timeout, etape, video_id)
+            if code != 0:
+                return code, stderr
+            if encoder:
+                ecarts = _ecarts(ffprobe, flux, morceau)
+                if ecarts:
+                    # Recoller quand même donnerait un H.264 non conforme :
+                    # l'appelant encode tout, d'un bloc.
+                    log.warning("Rendu partiel abandonné pour %s, segment réencodé "
+                                "différent de la source : %s", src.name, ", ".join(ecarts))
+                    return None
+            morceaux.append(morceau)
+        code, stderr = _recoller(commun, morceaux, src, audio, cible, timeout,
+                                 etape, video_id, echelle=_echelle(flux))
+    if code == 0:
+        log.info("Rendu partiel de %s : %.0f s réencodées sur %.0f s (%d segments)",
+                 src.name, couvert, duree, len(decoupe))
+    return code, stderr
+
+
+def _encoder(commun: list[str], src: Path, debut: float, fin: float, vf: str,
+             x264: list[str], morceau: Path) -> list[str]:
+    # Recalage : le filtre voit l'horloge de la source (accroche, badges et
+    # karaoké tombent au bon moment sans réécrire le .ass), la sortie repart
+    # de zéro pour le recollage.
+    filtre = f"setpts=PTS+{debut:.6f}/TB,{vf},setpts=PTS-STARTPTS"
+    return commun + ["-ss", f"{debut:.6f}", "-i", str(src), "-t", f"{fin - debut:.6f}",
+                     "-map", "0:v:0", "-an", "-vf", filtre, "-c:v", "libx264", *x264,
+                     "-pix_fmt", "yuv420p", "-f", "mpegts", str(morceau)]
+
+
+def _copier(commun: list[str], src: Path, debut: float, fin: float,
+            morceau: Path) -> list[str]:
+    return commun + ["-ss", f"{debut:.6f}", "-i", str(src), "-t", f"{fin - debut:.6f}",
+                     "-map", "0:v:0", "-an", "-c", "copy", "-bsf:v", "h264_mp4toannexb",
+                     "-avoid_negative_ts", "make_zero", "-f", "mpegts", str(morceau)]
+
+
+def _echelle(flux: dict) -> list[str]:
+    """Base de temps de la piste vidéo de la source, gardée dans le MP4
+    recollé (les segments MPEG-TS passent tous par 1/90000)."""
+    _, _, den = (flux.get("time_base") or "").partition("/")
+    return ["-video_track_timescale", den] if den.isdigit() else []
+
+
+def _recoller(commun: list[str], morceaux: list[Path], src: Path, audio: list[str],
+              cible: Path, timeout: float, etape: str,
+              video_id: int | None, echelle: list[str] = ()) -> tuple[int, bytes]:
+    """Concatène la vidéo sans réencoder ; l'audio vient de la source entière."""
+    liste = morceaux[0].parent / "liste.txt"
+    liste.write_text("".join(f"file '{m.as_posix()}'\n" for m in morceaux), encoding="utf-8")
+    return _lancer(commun + ["-f", "concat", "-safe", "0", "-i", str(liste),
+                             "-i", str(src), "-map", "0:v:0", "-map", "1:a:0?",
+                             "-c:v", "copy", *audio, *echelle, "-movflags", "+faststart",
+                             str(cible)],
+                   timeout, f"{etape}_recollage", video_id)
+
+
+# ------------------------------------------------------------ rendu en parallèle
+# Habillage cinéma d'un long extrait (5 à 15 min) : le graphe complet
+# (agrandissement lanczos, étalonnage, .ass) tient un FFmpeg à deux fils
+# pendant plus de dix minutes. Ici TOUT est réencodé, mais en N morceaux
+# confiés à N FFmpeg simultanés, puis recollés sans perte. Mêmes réglages
+# x264 que le rendu d'un bloc ; la loudnorm passe sur l'audio entier au
+# recollage, donc le niveau sonore est identique.
+
+def decouper(cles: list[float], duree: float, morceaux: int,
+             duree_min: float) -> list[tuple[float, float]]:
+    """Bornes de `morceaux` segments d'au moins `duree_min` s, calées sur les
+    images clés les plus proches du découpage régulier (la recherche `-ss`
+    n'a alors rien à décoder pour rien). Sans images clés, découpage exact.
+    """
+    morceaux = max(1, min(morceaux, int(duree // max(duree_min, 1))))
+    bornes = [0.0]
+    for k in range(1, morceaux):
+        cible = duree * k / morceaux
+        borne = min(cles, key=lambda c: abs(c - cible)) if cles else cible
+        if borne - bornes[-1] >= duree_min and duree - borne >= duree_min:
+            bornes.append(borne)
+    bornes.append(duree)
+    return list(zip(bornes, bornes[1:]))
+
+
+def rendre_en_parallele(ffmpeg: str, src: Path, cible: Path, *, vf: str, duree: float,
+                        x264: list[str], audio: list[str], morceaux: int,
+                        duree_min: float = 60, timeout: float = 7200,
+                        video_id: int | None = None) -> tuple[int, bytes] | None:
+    """Réencode `src` entier en `morceaux` segments simultanés, puis recolle.
+
+    Retourne (code, stderr), ou None si la vidéo est trop courte pour être
+    découpée (l'appelant lance alors son rendu d'un bloc).
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    decoupe = decouper(images_cles(_ffprobe(ffmpeg), src), duree, morceaux, duree_min)
+    if len(decoupe) < 2:
+        return None
+    commun = [ffmpeg, "-nostdin", "-v", "error", "-y"]
+    with tempfile.TemporaryDirectory(prefix="vortex-segments-") as tmp:
+        dossier = Path(tmp)
+        fichiers = [dossier / f"seg{n:04d}.ts" for n in range(len(decoupe))]
+        with ThreadPoolExecutor(max_workers=len(decoupe),
+                                thread_name_prefix="vortex-segment") as pool:
+            resultats = list(pool.map(
+                lambda n: _lancer(_encoder(commun, src, *decoupe[n], vf, x264, fichiers[n]),
+                                  timeout, "rendu_segment", video_id),
+                range(len(decoupe))))
+        for code, stderr in resultats:
+            if code != 0:
+                return code, stderr
+        code, stderr = _recoller(commun, fichiers, src, audio, cible, timeout,
+                                 "rendu_segment", video_id)
+    if code == 0:
+        log.info("Rendu de %s en %d segments parallèles", src.name, len(decoupe))
+    return code, stderr
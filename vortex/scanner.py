@@ -1,9 +1,17 @@
 """Étape 1 — Détection : scan du dossier source, intégrité, empreinte, couverture.
 
 - ffprobe vérifie que chaque fichier est lisible (les corrompus -> BLOCKED).
-- SHA-256 empêche les doublons même après renommage.
+- Anti-doublons en deux temps, même après renommage : une empreinte rapide
+  (taille + début/milieu/fin) pour tous, le SHA-256 complet seulement quand
+  elle collisionne avec une vidéo déjà en base. `vortex rehash` complète
+  ensuite les SHA-256 manquants en tâche de fond. L'empreinte et le
+  résultat de ffprobe sont gardés en cache (chemin, taille, mtime, inode) :
+  un fichier inchangé depuis le scan précédent n'est ni relu ni sondé.
 - La couverture `<nom>_cover.jpeg` du dossier cover/ est associée si présente.
-- La légende TikTok d'origine est récupérée dans la base data.sqlite de 4K Tokkit.
+- La légende TikTok d'origine est importée, au fil des scans, depuis la base
+  data.sqlite de 4K Tokkit (seules les lignes nouvelles sont lues).
+- `scan --watch` reste à l'écoute du dossier (inotify, sinon relevé périodique)
+  et inscrit chaque fichier dès qu'il est terminé.
 """
 
 from __future__ import annotations
@@ -22,6 +30,8 @@ from .db import Database
 log = logging.getLogger("vortex.scanner")
 
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".webm", ".avi"}
+# Fichiers inscrits au plus par commit pendant un scan.
+SCAN_LOT = 500
 
 
 def find_ffprobe() -> str:
@@ -44,6 +54,30 @@ def sha256_file(path: Path, bufsize: int = 1 << 20) -> str:
     return h.hexdigest()
 
 
+# Trois prélèvements de 4 Mio (début, milieu, fin) : quelques millisecondes de
+# lecture là où le SHA-256 complet lit des centaines de Mo par fichier.
+FAST_FP_CHUNK = 4 << 20
+
+
+def fast_fingerprint(path: Path, chunk: int = FAST_FP_CHUNK) -> str:
+    """Empreinte rapide : taille + SHA-256 du début, du milieu et de la fin.
+
+    Deux copies d'un même fichier ont toujours la même empreinte rapide ; la
+    réciproque n'est pas garantie, d'où le SHA-256 complet en cas de collision.
+    """
+    size = path.stat().st_size
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if size <= 3 * chunk:
+            while data := f.read(chunk):
+                h.update(data)
+        else:
+            for offset in (0, (size - chunk) // 2, size - chunk):
+                f.seek(offset)
+                h.update(f.read(chunk))
+    return f"{size}:{h.hexdigest()}"
+
+
 def probe(ffprobe: str, path: Path) -> dict | None:
     """Retourne durée/dimensions, ou None si le fichier est illisible."""
     try:
@@ -67,37 +101,56 @@ def probe(ffprobe: str, path: Path) -> dict | None:
         return None
 
 
-def load_tokkit_captions(tokkit_db: Path) -> dict[str, str]:
-    """Légendes TikTok d'origine, indexées par id TikTok.
+def import_tokkit_captions(db: Database, tokkit_db: Path) -> int:
+    """Importe dans notre base les légendes TikTok ajoutées depuis le dernier scan.
+
+    On ne relit que les lignes de MediaItems au-delà du plus grand rowid déjà
+    importé : l'ancienne version recopiait toute la base à chaque scan pour en
+    recharger chaque description.
 
-    La base est souvent VERROUILLÉE par l'application 4K Tokkit : on travaille
-    donc sur une copie temporaire, et on signale clairement un résultat vide.
+    La base est souvent VERROUILLÉE par l'application 4K Tokkit. On tente
+    d'abord une lecture seule normale (cohérente, voit le journal WAL) ; si le
+    verrou la refuse, on ouvre le fichier en `immutable=1`, qui ne pose ni ne
+    respecte aucun verrou. Retourne le nombre de légendes nouvelles.
     """
-    captions: dict[str, str] = {}
     if not tokkit_db.exists():
-        return captions
-    tmp_copy = None
-    try:
-        import tempfile
-        tmp_copy = Path(tempfile.gettempdir()) / "vortex_tokkit_copy.sqlite"
-        shutil.copy2(tokkit_db, tmp_copy)
-        con = sqlite3.connect(f"file:{tmp_copy}?mode=ro", uri=True)
-        for tid, desc in con.execute(
-            "SELECT id, description FROM MediaItems WHERE description IS NOT NULL AND description != ''"
-        ):
-            captions[str(tid)] = desc
-        con.close()
-    except Exception as exc:
-        log.warning("Lecture de la base 4K Tokkit impossible : %s", exc)
-    finally:
-        if tmp_copy is not None:
-            tmp_copy.unlink(missing_ok=True)
-    if not captions:
+        return 0
+    depuis = db.tokkit_rowid_max()
+    nouvelles: list[tuple[int, str, str]] = []
+    for options in ("mode=ro", "mode=ro&immutable=1"):
+        try:
+            con = sqlite3.connect(f"{tokkit_db.as_uri()}?{options}", uri=True, timeout=2)
+            try:
+                # 4K Tokkit a pu repartir d'une base neuve : ses rowid
+                # recommencent alors en dessous de notre repère.
+                (plus_haut,) = con.execute("SELECT COALESCE(MAX(rowid), 0) FROM MediaItems").fetchone()
+                if plus_haut < depuis:
+                    log.warning("Base 4K Tokkit recréée — réimport complet des légendes.")
+                    db.rebaser_legendes_tokkit()
+                    depuis = 0
+                nouvelles = [
+                    (rowid, str(tid), desc) for rowid, tid, desc in con.execute(
+                        "SELECT rowid, id, description FROM MediaItems "
+                        "WHERE rowid > ? AND description IS NOT NULL AND description != '' "
+                        "ORDER BY rowid", (depuis,))
+                ]
+            finally:
+                con.close()
+            break
+        except sqlite3.OperationalError as exc:
+            log.info("Base 4K Tokkit illisible en %s (%s)", options, exc)
+        except Exception as exc:
+            log.warning("Lecture de la base 4K Tokkit impossible : %s", exc)
+            return 0
+    else:
+        log.warning("Lecture de la base 4K Tokkit impossible : verrouillée ou corrompue")
+    if nouvelles:
+        db.ajouter_legendes_tokkit(nouvelles)
+        log.info("%d nouvelle(s) légende(s) TikTok importée(s).", len(nouvelles))
+    elif not db.tokkit_rowid_max():
         log.warning("AUCUNE légende TikTok chargée — le SEO reposera sur la transcription seule "
                     "(les légendes seront récupérées à un prochain scan).")
-    else:
-        log.info("%d légendes TikTok chargées.", len(captions))
-    return captions
+    return len(nouvelles)
 
 
 def classify(duration_s: float, width: int, height: int, shorts_max: int) -> str:
@@ -107,87 +160,458 @@ def classify(duration_s: float, width: int, height: int, shorts_max: int) -> str
     return "long_vertical" if vertical else "long_horizontal"
 
 
-def scan(cfg: Config, db: Database) -> dict:
-    """Scanne le dossier source ; retourne un résumé chiffré."""
+def _decrire(db: Database, path: Path, stat, cover_dir: Path) -> dict:
+    """Champs de `videos` connus sans lire le contenu : nom, couverture, légende."""
+    name = path.stem
+    tiktok_id = name.split("_")[-1]
+    cover = cover_dir / f"{name}_cover.jpeg"
+    if not cover.exists():
+        # Miniature yt-dlp pas encore déplacée dans cover/
+        alt = path.parent / f"{name}.jpg"
+        if alt.exists():
+            cover = alt
+
+    # Légende : base 4K Tokkit (PC) OU fichier .info.json de yt-dlp (VPS)
+    caption = db.tokkit_caption(tiktok_id)
+    if not caption:
+        info_json = path.parent / f"{name}.info.json"
+        if info_json.exists():
+            try:
+                caption = json.loads(info_json.read_text(encoding="utf-8")).get("description")
+            except Exception:
+                pass
+    return {
+        "name": name,
+        "path": str(path),
+        "tiktok_id": tiktok_id,
+        "size_bytes": stat.st_size,
+        "caption": caption,
+        "cover_path": str(cover) if cover.exists() else None,
+    }
+
+
+def _compteurs() -> dict:
+    return {"seen": 0, "new": 0, "known": 0, "blocked": 0, "too_short": 0, "in_progress": 0,
+            "cached": 0, "errors": 0}
+
+
+def _empreinte(ffprobe: str, path: Path) -> tuple[dict | None, str]:
+    """Sonde + empreinte rapide d'un fichier. Tourne dans un fil du pool :
+    ffprobe est un sous-processus et hashlib relâche le GIL, les deux avancent
+    en parallèle."""
+    return probe(ffprobe, path), fast_fingerprint(path)
+
+
+def _hacher_collisions(db: Database, infos: list[dict], pool=None) -> dict:
+    """SHA-256 complets nécessaires pour lever les collisions d'empreinte
+    rapide de `infos` : {chemin: sha256, ou l'OSError de sa lecture}.
+
+    Une collision, c'est une empreinte rapide déjà en base pour un AUTRE
+    fichier, ou partagée par deux fichiers du même lot (le premier sera
+    inscrit avant le second). On hache alors les nouveaux fichiers et les
+    jumeaux encore sans SHA-256. Lectures seules en base : appelé AVANT la
+    transaction, les hachages tournent dans `pool` (ou ici, sans pool).
+
+    Une vidéo inscrite avant l'empreinte rapide et dont le fichier avait
+    déjà disparu n'a que son SHA-256 : tout nouveau fichier de même taille
+    est haché, sans quoi sa copie ou son retéléchargement serait republié.
+    """
+    par_empreinte: dict[str, list[dict]] = {}
+    for info in infos:
+        par_empreinte.setdefault(info["fast_fp"], []).append(info)
+    anciennes = db.tailles_sans_empreinte_rapide()
+    a_hacher = {info["path"] for info in infos
+                if not info.get("sha256") and info.get("size_bytes") in anciennes}
+    for fast_fp, groupe in par_empreinte.items():
+        chemins = {info["path"] for info in groupe}
+        jumeaux = [r for r in db.videos_par_empreinte_rapide(fast_fp) if r["path"] not in chemins]
+        if not jumeaux and len(chemins) < 2:
+            continue
+        a_hacher |= {info["path"] for info in groupe if not info.get("sha256")}
+        a_hacher |= {r["path"] for r in jumeaux
+                     if not r["sha256"] and Path(r["path"]).is_file()}
+
+    def hacher(chemin: str):
+        try:
+            return sha256_file(Path(chemin))
+        except OSError as exc:
+            return exc
+
+    if pool is None:
+        return {chemin: hacher(chemin) for chemin in a_hacher}
+    futurs = {chemin: pool.submit(hacher, chemin) for chemin in a_hacher}
+    return {chemin: futur.result() for chemin, futur in futurs.items()}
+
+
+def _lever_collision(db: Database, info: dict, hachages: dict) -> bool:
+    """Applique les SHA-256 de `_hacher_collisions` à `info` et à ses
+    jumeaux en base. Retourne True si `info` a reçu son hachage complet.
+
+    Si le fichier du jumeau a disparu, `upsert_video` le reconnaît sur
+    l'empreinte rapide seule : on préfère écarter un faux doublon
+    (improbable) que republier un vrai.
+    """
+    hachage = hachages.get(info["path"])
+    if info.get("sha256") or hachage is None:
+        return False
+    if isinstance(hachage, OSError):
+        raise hachage
+    info["sha256"] = hachage
+    for row in db.videos_par_empreinte_rapide(info["fast_fp"]):
+        jumeau = hachages.get(row["path"]) if row["path"] != info["path"] else None
+        if row["sha256"] or jumeau is None:
+            continue
+        if isinstance(jumeau, OSError):
+            log.warning("Jumeau illisible pour %s : %s", Path(row["path"]).name, jumeau)
+            continue
+        try:
+            db.update_fields(row["id"], sha256=jumeau)
+        except sqlite3.IntegrityError:
+            log.warning("%s : contenu identique à une autre vidéo déjà en base",
+                        Path(row["path"]).name)
+    return True
+
+
+def _enregistrer(cfg: Config, db: Database, info: dict, meta: dict | None, stats: dict) -> None:
+    """Inscrit un fichier sondé dans la base et met le résumé à jour."""
+    if meta is None:
+        video_id, is_new = db.upsert_video(info)
+        if is_new:
+            db.set_state(video_id, "BLOCKED", "fichier illisible (ffprobe)")
+            stats["blocked"] += 1
+        return
+
+    info.update(meta)
+    info["category"] = classify(meta["duration_s"], meta["width"], meta["height"], cfg.shorts_max_seconds)
+    video_id, is_new = db.upsert_video(info)
+    if not is_new:
+        stats["known"] += 1
+        return
+    stats["new"] += 1
+    if meta["duration_s"] < cfg.min_duration_seconds:
+        db.set_state(video_id, "SKIPPED", f"durée {meta['duration_s']}s < minimum")
+        stats["too_short"] += 1
+    elif not meta["has_audio"]:
+        db.set_state(video_id, "BLOCKED", "aucune piste audio")
+        stats["blocked"] += 1
+
+
+def _inscrire(cfg: Config, db: Database, path: Path, info: dict, key: tuple, meta: dict | None,
+              a_retenir: bool, hachages: dict, stats: dict) -> None:
+    """Inscrit un fichier de `scan` dont le sondage et les hachages sont faits."""
+    try:
+        a_retenir |= _lever_collision(db, info, hachages)
+    except OSError as exc:
+        log.warning("Fichier inaccessible pendant le scan : %s (%s)", path.name, exc)
+        stats["errors"] += 1
+        return
+    if a_retenir:
+        db.remember_fingerprint(*key, info["fast_fp"], info["sha256"], meta)
+    _enregistrer(cfg, db, info, meta, stats)
+
+
+def scan(cfg: Config, db: Database, jobs: int = 0) -> dict:
+    """Scanne le dossier source ; retourne un résumé chiffré.
+
+    `jobs` : nombre de fichiers sondés et hachés en parallèle (0 = un par
+    cœur). Les écritures SQLite restent sur le fil principal, dans l'ordre
+    des fichiers : la base voit exactement la même séquence qu'en série.
+    """
     if not cfg.source_dir.exists():
         log.error("Dossier source inaccessible : %s — disque externe débranché ? Scan annulé.",
                   cfg.source_dir)
-        return {"seen": 0, "new": 0, "known": 0, "blocked": 0, "too_short": 0,
-                "in_progress": 0, "errors": 1}
+        return {**_compteurs(), "errors": 1}
     ffprobe = find_ffprobe()
-    captions = load_tokkit_captions(cfg.tokkit_db)
+    import_tokkit_captions(db, cfg.tokkit_db)
     cover_dir = cfg.source_dir / "cover"
 
-    stats = {"seen": 0, "new": 0, "known": 0, "blocked": 0, "too_short": 0, "in_progress": 0, "errors": 0}
+    stats = _compteurs()
     files = sorted(
         p for p in cfg.source_dir.iterdir()
         if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS
     )
+    import os
     import time
-    for path in files:
-        try:
-            stats["seen"] += 1
-            stat = path.stat()
-            # yt-dlp/ffmpeg écrivent dans un fichier temporaire puis renomment le
-            # MP4 terminé. Cinq secondes suffisent ici ; l'ancien délai de 120 s
-            # faisait rater tous les extraits créés juste avant ce scan quotidien.
-            if time.time() - stat.st_mtime < 5:
-                stats["in_progress"] += 1
+    from concurrent.futures import ThreadPoolExecutor, wait
+
+    # Un lot de nouveaux exports TikTok/OpusClip passait un fichier à la fois :
+    # un ffprobe, puis une lecture complète pour le SHA-256, pendant que le
+    # second cœur et l'essentiel du débit disque restaient inutilisés.
+    pool = ThreadPoolExecutor(max_workers=max(1, jobs or os.cpu_count() or 2),
+                              thread_name_prefix="vortex-scan")
+    # (chemin, info, clé du cache, résultat) — résultat = (probe, fast_fp,
+    # sha256) si le cache répond, sinon un Future du pool.
+    pending = []
+    try:
+        for path in files:
+            try:
+                stats["seen"] += 1
+                stat = path.stat()
+                # yt-dlp/ffmpeg écrivent dans un fichier temporaire puis renomment le
+                # MP4 terminé. Cinq secondes suffisent ici ; l'ancien délai de 120 s
+                # faisait rater tous les extraits créés juste avant ce scan quotidien.
+                if time.time() - stat.st_mtime < 5:
+                    stats["in_progress"] += 1
+                    continue
+
+                # Des milliers de clips, des dizaines de Go : relire chaque fichier
+                # à chaque passage coûtait des gigaoctets de lecture pour apprendre
+                # qu'il était déjà connu. Seuls les nouveaux et les modifiés le sont.
+                key = (str(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+                cached = db.cached_fingerprint(*key)
+                if cached is not None:
+                    stats["cached"] += 1
+                    fast_fp, sha256, meta = cached
+                    resultat = (meta, fast_fp, sha256)
+                else:
+                    resultat = pool.submit(_empreinte, ffprobe, path)
+                info = _decrire(db, path, stat, cover_dir)
+            except OSError as exc:
+                log.warning("Fichier inaccessible pendant le scan : %s (%s)", path.name, exc)
+                stats["errors"] += 1
                 continue
+            pending.append((path, info, key, resultat))
 
-            name = path.stem
-            tiktok_id = name.split("_")[-1]
-            cover = cover_dir / f"{name}_cover.jpeg"
-            if not cover.exists():
-                # Miniature yt-dlp pas encore déplacée dans cover/
-                alt = path.parent / f"{name}.jpg"
-                if alt.exists():
-                    cover = alt
-
-            # Légende : base 4K Tokkit (PC) OU fichier .info.json de yt-dlp (VPS)
-            caption = captions.get(tiktok_id)
-            if not caption:
-                info_json = path.parent / f"{name}.info.json"
-                if info_json.exists():
-                    try:
-                        caption = json.loads(info_json.read_text(encoding="utf-8")).get("description")
-                    except Exception:
-                        pass
-
-            meta = probe(ffprobe, path)
-            info = {
-                "name": name,
-                "path": str(path),
-                "tiktok_id": tiktok_id,
-                "sha256": sha256_file(path),
-                "size_bytes": stat.st_size,
-                "caption": caption,
-                "cover_path": str(cover) if cover.exists() else None,
-            }
+        # Deux commits par fichier (upsert puis état), autant de fsync : sur le
+        # disque du VPS, un lot de nouveautés passait plus de temps à attendre
+        # la synchronisation qu'à sonder. On inscrit donc par lots, un commit
+        # chacun. Le premier résultat d'un lot est attendu HORS transaction,
+        # puis on n'y ajoute que ceux déjà prêts ; les SHA-256 qui lèvent les
+        # collisions du lot sont calculés dans le pool, eux aussi avant la
+        # transaction. Le verrou d'écriture n'est donc jamais tenu pendant
+        # qu'un ffprobe ou un hachage tourne.
+        debut = 0
+        while debut < len(pending):
+            if not isinstance(pending[debut][3], tuple):
+                wait([pending[debut][3]])
+            fin = debut + 1
+            while (fin < len(pending) and fin - debut < SCAN_LOT
+                   and (isinstance(pending[fin][3], tuple) or pending[fin][3].done())):
+                fin += 1
+            lot = []
+            for path, info, key, resultat in pending[debut:fin]:
+                try:
+                    if isinstance(resultat, tuple):
+                        (meta, fast_fp, sha256), a_retenir = resultat, False
+                    else:
+                        (meta, fast_fp), sha256, a_retenir = resultat.result(), None, True
+                except OSError as exc:
+                    log.warning("Fichier inaccessible pendant le scan : %s (%s)", path.name, exc)
+                    stats["errors"] += 1
+                    continue
+                info.update(fast_fp=fast_fp, sha256=sha256)
+                lot.append((path, info, key, meta, a_retenir))
+            hachages = _hacher_collisions(db, [info for _, info, _, _, _ in lot], pool)
+            with db.transaction():
+                for path, info, key, meta, a_retenir in lot:
+                    _inscrire(cfg, db, path, info, key, meta, a_retenir, hachages, stats)
+            debut = fin
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    log.info("Scan terminé : %s", stats)
+    return stats
+
+
+def scan_file(cfg: Config, db: Database, path: Path, *, ffprobe: str, stats: dict) -> None:
+    """Inscrit UN fichier, déjà complet sur le disque (mode veille).
+
+    Pas de garde des cinq secondes ici : l'événement qui nous amène ici
+    (fermeture après écriture, renommage final) dit justement que le fichier
+    est terminé.
+    """
+    stats["seen"] += 1
+    try:
+        stat = path.stat()
+        info = _decrire(db, path, stat, cfg.source_dir / "cover")
+        key = (str(path), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        cached = db.cached_fingerprint(*key)
+        if cached is not None:
+            stats["cached"] += 1
+            fast_fp, sha256, meta = cached
+            a_retenir = False
+        else:
+            (meta, fast_fp), sha256 = _empreinte(ffprobe, path), None
+            a_retenir = True
+        info.update(fast_fp=fast_fp, sha256=sha256)
+        a_retenir |= _lever_collision(db, info, _hacher_collisions(db, [info]))
+    except OSError as exc:
+        log.warning("Fichier inaccessible pendant le scan : %s (%s)", path.name, exc)
+        stats["errors"] += 1
+        return
+    if a_retenir:
+        db.remember_fingerprint(*key, fast_fp, info["sha256"], meta)
+    _enregistrer(cfg, db, info, meta, stats)
+
+
+def rehash_pending(db: Database, limit: int = 0) -> int:
+    """Complète le SHA-256 des vidéos inscrites sur leur seule empreinte rapide.
+
+    Rien ne presse : l'anti-doublon tient sans lui. Il sert à comparer plus
+    tard avec un fichier dont l'original aura été effacé du disque.
+    """
+    done = 0
+    for row in db.sans_hash_complet():
+        if limit and done >= limit:
+            break
+        path = Path(row["path"])
+        if not path.is_file():
+            continue
+        try:
+            sha256 = sha256_file(path)
         except OSError as exc:
-            log.warning("Fichier inaccessible pendant le scan : %s (%s)", path.name, exc)
-            stats["errors"] += 1
+            log.warning("Fichier illisible pour le hachage : %s (%s)", path.name, exc)
             continue
-        if meta is None:
-            video_id, is_new = db.upsert_video(info)
-            if is_new:
-                db.set_state(video_id, "BLOCKED", "fichier illisible (ffprobe)")
-                stats["blocked"] += 1
+        try:
+            db.update_fields(row["id"], sha256=sha256)
+        except sqlite3.IntegrityError:
+            log.warning("%s : contenu identique à une autre vidéo déjà en base", row["name"])
             continue
+        done += 1
+    return done
 
-        info.update(meta)
-        info["category"] = classify(meta["duration_s"], meta["width"], meta["height"], cfg.shorts_max_seconds)
-        video_id, is_new = db.upsert_video(info)
-        if not is_new:
-            stats["known"] += 1
-            continue
-        stats["new"] += 1
-        if meta["duration_s"] < cfg.min_duration_seconds:
-            db.set_state(video_id, "SKIPPED", f"durée {meta['duration_s']}s < minimum")
-            stats["too_short"] += 1
-        elif not meta["has_audio"]:
-            db.set_state(video_id, "BLOCKED", "aucune piste audio")
-            stats["blocked"] += 1
 
-    log.info("Scan terminé : %s", stats)
-    return stats
+# ----------------------------------------------------------------- veille
+# Masques de <linux/inotify.h> : fichier fermé après écriture, ou renommé
+# dans le dossier (yt-dlp écrit un .part puis le renomme en .mp4).
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+
+
+def _inotify(dossiers: list[Path]):
+    """Chemins des fichiers terminés, au fil de l'eau (Linux uniquement).
+
+    Lève OSError tout de suite si inotify est indisponible : l'appelant
+    retombe alors sur le relevé périodique.
+    """
+    import ctypes
+    import ctypes.util
+    import os
+    import struct
+
+    libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    if not hasattr(libc, "inotify_init1"):
+        raise OSError("inotify indisponible sur ce système")
+    fd = libc.inotify_init1(os.O_CLOEXEC)
+    if fd < 0:
+        raise OSError(ctypes.get_errno(), "inotify_init1")
+    reperes: dict[int, Path] = {}
+    try:
+        for dossier in dossiers:
+            wd = libc.inotify_add_watch(fd, os.fsencode(dossier), IN_CLOSE_WRITE | IN_MOVED_TO)
+            if wd < 0:
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch {dossier}")
+            reperes[wd] = dossier
+    except OSError:
+        os.close(fd)
+        raise
+
+    def _evenements():
+        try:
+            while True:
+                buf = os.read(fd, 64 * 1024)
+                pos = 0
+                while pos + 16 <= len(buf):
+                    wd, _mask, _cookie, taille = struct.unpack_from("iIII", buf, pos)
+                    pos += 16
+                    nom = buf[pos:pos + taille].rstrip(b"\0")
+                    pos += taille
+                    if nom and wd in reperes:
+                        yield reperes[wd] / os.fsdecode(nom)
+        finally:
+            os.close(fd)
+
+    return _evenements()
+
+
+def _releves(dossiers: list[Path], intervalle: float):
+    """Repli sans inotify (Windows, montages réseau) : relevé périodique.
+
+    Un fichier est rendu quand sa taille et sa date n'ont pas bougé entre deux
+    relevés. Ce qui existait au démarrage est supposé déjà inscrit (le scan de
+    rattrapage vient de passer).
+    """
+    import time
+
+    def _releve() -> dict[Path, tuple[int, int]]:
+        vus = {}
+        for dossier in dossiers:
+            if not dossier.is_dir():
+                continue
+            for p in dossier.iterdir():
+                try:
+                    st = p.stat()
+                except OSError:
+                    continue
+                if p.is_file():
+                    vus[p] = (st.st_size, st.st_mtime_ns)
+        return vus
+
+    rendus = _releve()
+    precedent = dict(rendus)
+    while True:
+        time.sleep(intervalle)
+        courant = _releve()
+        for p, signature in courant.items():
+            if precedent.get(p) == signature and rendus.get(p) != signature:
+                rendus[p] = signature
+                yield p
+        precedent = courant
+
+
+def _video_concernee(cfg: Config, path: Path) -> Path | None:
+    """Vidéo du dossier source touchée par un fichier qui vient d'arriver :
+    la vidéo elle-même, ou celle dont on vient de recevoir la couverture ou
+    le .info.json."""
+    nom = path.name
+    if path.parent == cfg.source_dir and path.suffix.lower() in VIDEO_EXTENSIONS:
+        return path
+    if path.parent == cfg.source_dir / "cover" and nom.endswith("_cover.jpeg"):
+        stem = nom[:-len("_cover.jpeg")]
+    elif path.parent == cfg.source_dir and nom.endswith(".info.json"):
+        stem = nom[:-len(".info.json")]
+    elif path.parent == cfg.source_dir and path.suffix.lower() == ".jpg":
+        stem = path.stem
+    else:
+        return None
+    for ext in VIDEO_EXTENSIONS:
+        video = cfg.source_dir / f"{stem}{ext}"
+        if video.is_file():
+            return video
+    return None
+
+
+def watch(cfg: Config, db: Database, jobs: int = 0, intervalle: float = 5.0) -> None:
+    """Veille continue du dossier source et de cover/ (`scan --watch`).
+
+    Un scan complet rattrape d'abord ce qui est arrivé pendant l'absence ;
+    ensuite chaque fichier terminé est inscrit aussitôt, sans relister le
+    dossier : un nouveau clip passe DISCOVERED en quelques secondes au lieu
+    d'attendre le prochain passage du cron.
+
+    Les légendes 4K Tokkit ajoutées entre-temps sont importées à chaque
+    arrivée : seules les nouvelles lignes sont lues.
+    """
+    scan(cfg, db, jobs=jobs)
+    if not cfg.source_dir.exists():
+        return
+    ffprobe = find_ffprobe()
+    dossiers = [cfg.source_dir]
+    if (cfg.source_dir / "cover").is_dir():
+        dossiers.append(cfg.source_dir / "cover")
+    try:
+        arrivees = _inotify(dossiers)
+        log.info("Veille inotify sur %s", ", ".join(str(d) for d in dossiers))
+    except (OSError, AttributeError) as exc:
+        log.info("inotify indisponible (%s) — relevé toutes les %.0f s", exc, intervalle)
+        arrivees = _releves(dossiers, intervalle)
+
+    for path in arrivees:
+        video = _video_concernee(cfg, path)
+        if video is None:
+            continue
+        stats = _compteurs()
+        import_tokkit_captions(db, cfg.tokkit_db)
+        scan_file(cfg, db, video, ffprobe=ffprobe, stats=stats)
+        log.info("Arrivée %s : %s", video.name,
+                 {k: v for k, v in stats.items() if v})
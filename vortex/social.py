@@ -0,0 +1,133 @@
+"""File d'envoi Facebook/Instagram, découplée de la publication YouTube.
+
+`execute_plan` postait le clip sur la Page Facebook (upload `curl` bloquant)
+puis en Reel Instagram (création, attente du traitement Meta, publication)
+juste après chaque upload YouTube : plusieurs minutes par vidéo, pendant
+lesquelles le créneau YouTube suivant attendait. Désormais la publication,
+le rattrapage (`backfill-social`) et la story du jour ne font qu'inscrire
+leurs envois dans la table `social_outbox` ; `vortex social-worker` la vide,
+avec ses propres essais et sa propre concurrence.
+
+Chaque envoi raté est retenté plus tard (10 min, puis 20, 40, 80), puis
+marqué ECHEC au bout de ESSAIS_MAX tentatives. Les fonctions de
+`facebook_client` renvoient None quand Meta refuse : c'est traité comme un
+échec, le détail est dans le journal.
+
+Un envoi réservé (EN_COURS) l'est sous bail de BAIL_MIN minutes, prolongé
+toutes les BATTEMENT_MIN minutes tant que son upload tourne : seul un
+worker mort laisse échoir le sien, et l'envoi est alors remis en file. Une
+échéance fixe d'une heure faisait reprendre, et poster deux fois, un
+upload `curl` ou un Reel en attente de traitement encore en cours.
+"""
+
+from __future__ import annotations
+
+import logging
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from .config import Config
+from .db import Database
+
+log = logging.getLogger("vortex.social")
+
+CANAUX = ("facebook_video", "instagram_reel", "facebook_story", "instagram_story")
+ESSAIS_MAX = 5
+DELAI_INITIAL_MIN = 10
+BAIL_MIN = 15
+BATTEMENT_MIN = 5
+
+
+def mettre_en_file(db: Database, canal: str, path: str, legende: str = "",
+                   origine: str = "", cle: str | None = None) -> bool:
+    """Inscrit un envoi. Par défaut, un même fichier ne part qu'une fois par canal."""
+    if canal not in CANAUX:
+        raise ValueError(f"Canal inconnu : {canal}")
+    cle = cle or f"{canal}:{Path(path).name}"
+    ajoute = db.mettre_en_outbox(cle, canal, str(path), legende, origine)
+    if ajoute:
+        log.info("En file (%s) : %s → %s", origine or "?", Path(path).name, canal)
+    return ajoute
+
+
+def _envoyer(cfg: Config, canal: str, path: str, legende: str) -> str | None:
+    """Un envoi vers Meta. Tourne dans un fil du pool : aucun accès à la base."""
+    from . import facebook_client
+
+    if canal == "facebook_video":
+        return facebook_client.post_video_to_page(cfg, path, legende)
+    if canal == "instagram_reel":
+        # L'API Reels télécharge elle-même la vidéo : il lui faut l'URL
+        # publique du rendu, servi par le dashboard.
+        return facebook_client.post_reel_to_instagram(
+            cfg, facebook_client.media_url(cfg, Path(path).name), legende)
+    # Story : déjà ramenée à 58 s au plus à sa mise en file
+    # (pipeline.publish_daily_story) ; les deux réseaux reçoivent ce fichier.
+    if canal == "facebook_story":
+        return facebook_client.post_story_to_facebook(cfg, path)
+    return facebook_client.post_story_to_instagram(
+        cfg, facebook_client.media_url(cfg, Path(path).name))
+
+
+def drainer(cfg: Config, db: Database, limite: int = 0, jobs: int = 2) -> dict:
+    """Envoie ce qui est dû dans la file ; retourne un bilan chiffré.
+
+    `jobs` envois partent en parallèle (deux par défaut : la liaison montante
+    du VPS est partagée avec les uploads YouTube). Les écritures en base
+    restent sur le fil principal.
+    """
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    from . import facebook_client
+
+    bilan = {"envoyes": 0, "reportes": 0, "echecs": 0}
+    if not facebook_client.available(cfg):
+        log.warning("File sociale : Facebook/Instagram indisponible (pas de token).")
+        return bilan
+    repris = db.requalifier_outbox()
+    if repris:
+        log.warning("%d envoi(s) orphelin(s) remis en file.", repris)
+
+    envois = [e for e in db.outbox_a_envoyer(limit=limite)
+              if db.reserver_outbox(e["id"], bail_min=BAIL_MIN)]
+    if not envois:
+        return bilan
+    with ThreadPoolExecutor(max_workers=max(1, jobs),
+                            thread_name_prefix="vortex-social") as pool:
+        futurs = {pool.submit(_envoyer, cfg, e["canal"], e["path"], e["legende"] or ""): e
+                  for e in envois}
+        en_cours = set(futurs)
+        while en_cours:
+            faits, en_cours = wait(en_cours, timeout=BATTEMENT_MIN * 60,
+                                   return_when=FIRST_COMPLETED)
+            # Battement : les envois qui tournent encore gardent leur bail.
+            db.prolonger_outbox([futurs[f]["id"] for f in en_cours], bail_min=BAIL_MIN)
+            for futur in faits:
+                envoi = futurs[futur]
+                try:
+                    resultat, erreur = futur.result(), "aucun identifiant renvoyé par Meta"
+                except Exception as exc:
+                    resultat, erreur = None, str(exc)
+                nom = Path(envoi["path"]).name
+                if resultat:
+                    db.maj_outbox(envoi["id"], etat="ENVOYE", resultat=str(resultat),
+                                  essais=envoi["essais"] + 1, erreur=None)
+                    log.info("%s : %s publié (%s)", envoi["canal"], nom, resultat)
+                    bilan["envoyes"] += 1
+                    continue
+                essais = envoi["essais"] + 1
+                if essais >= ESSAIS_MAX:
+                    db.maj_outbox(envoi["id"], etat="ECHEC", essais=essais, erreur=erreur)
+                    log.error("%s : %s abandonné après %d essais (%s)",
+                              envoi["canal"], nom, essais, erreur)
+                    bilan["echecs"] += 1
+                    continue
+                attente = DELAI_INITIAL_MIN * 2 ** (essais - 1)
+                prochain = (datetime.now(timezone.utc) + timedelta(minutes=attente)
+                            ).strftime("%Y-%m-%dT%H:%M:%SZ")
+                db.maj_outbox(envoi["id"], etat="A_ENVOYER", essais=essais, erreur=erreur,
+                              prochain_essai=prochain)
+                log.warning("%s : %s raté (%s), nouvel essai dans %d min",
+                            envoi["canal"], nom, erreur, attente)
+                bilan["reportes"] += 1
+    return bilan
@@ -0,0 +1,113 @@
+"""Sonie (EBU R128) mesurée une fois par vidéo, normalisation en deux passes.
+
+Le rendu normalisait avec `loudnorm` en UNE passe : le filtre ne connaît
+pas la vidéo entière et corrige au fil de l'eau (mode dynamique), donc le
+niveau obtenu s'écarte de la cible de ±1 à 2 LU selon le début du clip, le
+gain respire, et le filtre travaille à 192 kHz à chaque rendu.
+
+En deux passes, la première mesure la sonie intégrée (I), la plage (LRA),
+le pic vrai (TP) et le seuil de la source ; la seconde reçoit ces mesures
+et applique un GAIN LINÉAIRE (`linear=true`) : un seul facteur pour tout le
+clip, la dynamique de la prédication est gardée intacte. La mesure ne
+dépend que de la source : elle est faite une fois, pendant la
+transcription (l'audio est alors lu de toute façon, et Whisper laisse du
+temps processeur), puis gardée dans `videos.sonie_*`. Un re-rendu, un
+rendu partiel ou une story la réutilisent sans nouvelle analyse.
+
+Sans mesure (vidéo transcrite avant cette étape, analyse échouée), le rendu
+garde l'ancienne passe unique. `python -m vortex loudness` complète les
+mesures manquantes des vidéos pas encore rendues.
+
+Si le gain linéaire ferait dépasser le pic vrai visé, FFmpeg repasse de
+lui-même en mode dynamique : jamais d'écrêtage.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from pathlib import Path
+
+from .config import Config
+from .db import Database
+
+log = logging.getLogger("vortex.sonie")
+
+# Cible sociale : -14 LUFS intégrés (YouTube, Instagram), plage 11 LU, pic
+# vrai -1,5 dBTP (marge pour le réencodage AAC des plateformes).
+CIBLE = "I=-14:LRA=11:TP=-1.5"
+
+# Champs de la mesure JSON de loudnorm → colonnes de `videos`.
+_CHAMPS = {"input_i": "sonie_i", "input_lra": "sonie_lra", "input_tp": "sonie_tp",
+           "input_thresh": "sonie_seuil", "target_offset": "sonie_decalage"}
+
+
+def mesurer(ffmpeg: str, source: Path, *, video_id: int | None = None) -> dict | None:
+    """Première passe : mesures de `source`, prêtes pour `db.update_fields`.
+
+    Lit l'audio seul (`-vn`) : quelques secondes pour un clip de trois
+    minutes. None si la source est muette ou l'analyse illisible.
+    """
+    from .lanceur import lancer
+
+    passage = lancer([ffmpeg, "-hide_banner", "-nostdin", "-i", str(source), "-vn",
+                      "-af", f"loudnorm={CIBLE}:print_format=json", "-f", "null", "-"],
+                     etape="sonie", video_id=video_id, timeout=1800)
+    return bilan(passage, source)
+
+
+def bilan(passage, source: Path) -> dict | None:
+    """Mesures lues dans le journal d'un passage FFmpeg passé par loudnorm
+    (`mesurer`, ou le décodage unique de vortex/audio.py)."""
+    texte = passage.stderr.decode("utf-8", "replace")
+    # Le bilan JSON est le dernier bloc {…} du journal de FFmpeg.
+    debut, fin = texte.rfind("{"), texte.rfind("}")
+    if passage.code != 0 or debut < 0 or fin < debut:
+        log.warning("Sonie non mesurée pour %s (code %s)", source.name, passage.code)
+        return None
+    try:
+        brut = json.loads(texte[debut:fin + 1])
+        mesure = {colonne: float(brut[champ]) for champ, colonne in _CHAMPS.items()}
+    except (ValueError, KeyError, TypeError):
+        log.warning("Bilan loudnorm illisible pour %s", source.name)
+        return None
+    # Silence complet : loudnorm rend -inf, inutilisable en seconde passe.
+    if not all(-99 < v < 99 for k, v in mesure.items() if k != "sonie_lra"):
+        return None
+    return mesure
+
+
+def filtre(row) -> str:
+    """Filtre audio du rendu : deux passes si la mesure est connue."""
+    try:
+        valeurs = [row[c] for c in _CHAMPS.values()]
+    except (IndexError, KeyError):
+        valeurs = [None]
+    if any(v is None for v in valeurs):
+        return f"loudnorm={CIBLE}"
+    i, lra, tp, seuil, decalage = valeurs
+    return (f"loudnorm={CIBLE}:measured_I={i:.2f}:measured_LRA={lra:.2f}"
+            f":measured_TP={tp:.2f}:measured_thresh={seuil:.2f}:offset={decalage:.2f}"
+            ":linear=true:print_format=none")
+
+
+def mesurer_en_attente(cfg: Config, db: Database, limit: int = 0) -> int:
+    """Mesure les vidéos transcrites, pas encore rendues, sans sonie connue."""
+    from .textdetect import find_ffmpeg
+
+    rows = db.conn.execute(
+        "SELECT id, name, path FROM videos WHERE sonie_i IS NULL AND render_path IS NULL "
+        "AND state IN ('TRANSCRIBED', 'READY') ORDER BY rowid DESC"
+        + (f" LIMIT {int(limit)}" if limit else "")).fetchall()
+    if not rows:
+        return 0
+    ffmpeg, faites = find_ffmpeg(), 0
+    for row in rows:
+        source = Path(row["path"])
+        if not source.exists():
+            continue
+        mesure = mesurer(ffmpeg, source, video_id=row["id"])
+        if mesure:
+            db.update_fields(row["id"], **mesure)
+            faites += 1
+    return faites
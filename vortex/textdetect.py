@@ -20,6 +20,7 @@ from pathlib import Path
 
 from .config import Config
 from .db import Database
+from .lanceur import lancer
 
 log = logging.getLogger("vortex.textdetect")
 
@@ -99,7 +100,8 @@ def count_real_words(text: str) -> int:
     return len(re.findall(r"[A-Za-zÀ-ÖØ-öø-ÿ]{3,}", text))
 
 
-def detect_video_text(ffmpeg: str, tesseract: str, path: Path, duration: float) -> tuple[str, int]:
+def detect_video_text(ffmpeg: str, tesseract: str, path: Path, duration: float,
+                      video_id: int | None = None) -> tuple[str, int]:
     """Retourne (verdict, nb_images_avec_texte)."""
     hits = 0
     with tempfile.TemporaryDirectory() as tmp:
@@ -107,11 +109,9 @@ def detect_video_text(ffmpeg: str, tesseract: str, path: Path, duration: float)
             # Échantillonne entre 10 % et 90 % de la durée (évite intro/fin noires)
             t = duration * (0.1 + 0.8 * i / max(SAMPLES - 1, 1))
             frame = Path(tmp) / f"f{i}.png"
-            subprocess.run(
-                [ffmpeg, "-v", "quiet", "-ss", f"{t:.1f}", "-i", str(path),
-                 "-frames:v", "1", "-vf", "scale=720:-1", "-y", str(frame)],
-                capture_output=True, timeout=60,
-            )
+            lancer([ffmpeg, "-v", "quiet", "-ss", f"{t:.1f}", "-i", str(path),
+                    "-frames:v", "1", "-vf", "scale=720:-1", "-y", str(frame)],
+                   etape="image_ocr", video_id=video_id, sortie=frame, timeout=60)
             if not frame.exists():
                 continue
             if count_real_words(ocr_image(tesseract, frame)) >= MIN_WORDS_HIT:
@@ -134,12 +134,6 @@ def detect_pending(cfg: Config, db: Database, limit: int = 0) -> dict:
             "Tesseract introuvable — installez-le : winget install UB-Mannheim.TesseractOCR")
     ffmpeg = find_ffmpeg()
 
-    # Colonne ajoutée à la volée si absente (migration douce)
-    cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-    if "has_text" not in cols:
-        db.conn.execute("ALTER TABLE videos ADD COLUMN has_text TEXT")
-        db.conn.commit()
-
     sql = "SELECT id, path, duration_s FROM videos WHERE has_text IS NULL AND duration_s IS NOT NULL"
     if limit:
         sql += f" LIMIT {int(limit)}"
@@ -147,7 +141,8 @@ def detect_pending(cfg: Config, db: Database, limit: int = 0) -> dict:
     stats = {"texte": 0, "sans_texte": 0, "douteux": 0, "erreur": 0}
     for r in rows:
         try:
-            verdict, hits = detect_video_text(ffmpeg, tesseract, Path(r["path"]), r["duration_s"])
+            verdict, hits = detect_video_text(ffmpeg, tesseract, Path(r["path"]), r["duration_s"],
+                                              video_id=r["id"])
         except Exception as exc:
             log.warning("Détection impossible pour #%d : %s", r["id"], exc)
             stats["erreur"] += 1
@@ -158,7 +153,8 @@ def detect_pending(cfg: Config, db: Database, limit: int = 0) -> dict:
     return stats
 
 
-def detect_speaker(ffmpeg: str, tesseract: str, path: Path, duration: float) -> str | None:
+def detect_speaker(ffmpeg: str, tesseract: str, path: Path, duration: float,
+                   video_id: int | None = None) -> str | None:
     """Lit plusieurs images de la vidéo (OCR) et renvoie le nom d'un pasteur CONNU
     s'il est écrit à l'écran (nom ou église). Renvoie None sinon — on ne devine
     jamais l'orateur."""
@@ -167,11 +163,9 @@ def detect_speaker(ffmpeg: str, tesseract: str, path: Path, duration: float) ->
         for i in range(SAMPLES):
             t = duration * (0.05 + 0.9 * i / max(SAMPLES - 1, 1))
             frame = Path(tmp) / f"s{i}.png"
-            subprocess.run(
-                [ffmpeg, "-v", "quiet", "-ss", f"{t:.1f}", "-i", str(path),
-                 "-frames:v", "1", "-vf", "scale=720:-1", "-y", str(frame)],
-                capture_output=True, timeout=60,
-            )
+            lancer([ffmpeg, "-v", "quiet", "-ss", f"{t:.1f}", "-i", str(path),
+                    "-frames:v", "1", "-vf", "scale=720:-1", "-y", str(frame)],
+                   etape="image_ocr", video_id=video_id, sortie=frame, timeout=60)
             if frame.exists():
                 texts.append(ocr_image(tesseract, frame))
     joined = " ".join(texts)
@@ -191,11 +185,6 @@ def detect_speaker_pending(cfg: Config, db: Database, limit: int = 0) -> dict:
             "Tesseract introuvable — installez-le : winget install UB-Mannheim.TesseractOCR")
     ffmpeg = find_ffmpeg()
 
-    cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-    if "speaker" not in cols:
-        db.conn.execute("ALTER TABLE videos ADD COLUMN speaker TEXT")
-        db.conn.commit()
-
     sql = ("SELECT id, path, duration_s FROM videos WHERE speaker IS NULL "
            "AND name LIKE 'hedjav%' AND duration_s IS NOT NULL")
     if limit:
@@ -204,7 +193,8 @@ def detect_speaker_pending(cfg: Config, db: Database, limit: int = 0) -> dict:
     found = 0
     for r in rows:
         try:
-            name = detect_speaker(ffmpeg, tesseract, Path(r["path"]), r["duration_s"])
+            name = detect_speaker(ffmpeg, tesseract, Path(r["path"]), r["duration_s"],
+                                  video_id=r["id"])
         except Exception as exc:
             log.warning("Détection pasteur impossible pour #%d : %s", r["id"], exc)
             continue
@@ -458,16 +458,19 @@ def _portrait_raw(row, video_id: int) -> bytes | None:
     return photos[video_id % len(photos)].read_bytes()
 
 
-def _portrait_video(row, vertical: bool) -> bytes | None:
+def _portrait_video(cfg: Config, row, vertical: bool) -> bytes | None:
     """Repli : le visage pris dans l'extrait lui-même.
 
     Sans ce repli, une vidéo dont l'orateur n'est pas identifié recevait une
     cover TOUT-TEXTE. Michel les a fait retirer le 10/08/2026 : elles ne
     rapportent rien. Le résultat est mis en cache — la recherche parcourt la
     vidéo entière, on ne la refait pas à chaque régénération.
+
+    La source d'abord : le rendu porte l'accroche et le karaoké en travers
+    du visage, et le rendu relit la piste de la source (vortex/visage.py).
     """
     chemin = None
-    for colonne in ("render_path", "path"):
+    for colonne in ("path", "render_path"):
         if colonne in row.keys() and row[colonne]:
             candidat = Path(row[colonne])
             if candidat.is_file():
@@ -482,8 +485,8 @@ def _portrait_video(row, vertical: bool) -> bytes | None:
     if fichier.is_file():
         return fichier.read_bytes()
 
-    from .visage import portrait_depuis_video
-    donnees = portrait_depuis_video(chemin, vertical=vertical)
+    from .visage import dossier_pistes, portrait_depuis_video
+    donnees = portrait_depuis_video(chemin, pistes=dossier_pistes(cfg), vertical=vertical)
     if donnees:
         fichier.write_bytes(donnees)
     return donnees
@@ -594,7 +597,7 @@ def generate_thumb(cfg: Config, db: Database, video_id: int) -> bool:
         # Orateur non identifié : on va chercher son visage DANS l'extrait.
         # Le décor abstrait ne sert plus que de dernier recours — une cover
         # tout-texte est ce que Michel a fait retirer de la chaîne le 10/08.
-        photo = _portrait_video(row, vertical)
+        photo = _portrait_video(cfg, row, vertical)
     if not photo:
         log.warning("Aucun visage disponible pour %s — cover de repli sur décor",
                     row["name"])
@@ -605,10 +608,6 @@ def generate_thumb(cfg: Config, db: Database, video_id: int) -> bool:
     if not _render_html(html, out, vp_w=vp_w, vp_h=vp_h):
         return False
 
-    cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-    if "thumb_path" not in cols:
-        db.conn.execute("ALTER TABLE videos ADD COLUMN thumb_path TEXT")
-        db.conn.commit()
     db.update_fields(video_id, thumb_path=str(out))
     log.info("Cover générée : %s [%s %dx%d]", out.name,
              "VERTICAL" if vertical else "horizontal", vp_w * 3, vp_h * 3)
@@ -616,10 +615,6 @@ def generate_thumb(cfg: Config, db: Database, video_id: int) -> bool:
 
 
 def thumbs_pending(cfg: Config, db: Database, limit: int = 0) -> int:
-    cols = [r[1] for r in db.conn.execute("PRAGMA table_info(videos)")]
-    if "thumb_path" not in cols:
-        db.conn.execute("ALTER TABLE videos ADD COLUMN thumb_path TEXT")
-        db.conn.commit()
     # Covers pour TOUTES les vidéos, Shorts compris (décision de Michel :
     # c'est la cover qui fait cliquer dans la recherche et sur la page chaîne).
     rows = db.conn.execute(
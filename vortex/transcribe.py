@@ -1,7 +1,8 @@
 """Étape 3 — Transcription locale gratuite avec faster-whisper.
 
 Produit un .txt (texte brut) et un .srt (sous-titres) par vidéo.
-Le modèle est chargé UNE seule fois par session (pas à chaque vidéo).
+Le modèle est chargé UNE seule fois par session (pas à chaque vidéo), et
+plus du tout quand le démon Whisper tourne (vortex/transcripteur.py).
 La langue est détectée automatiquement (pas de 'fr' forcé).
 """
 
@@ -15,22 +16,6 @@ from .db import Database
 
 log = logging.getLogger("vortex.transcribe")
 
-_model = None
-
-
-def get_model(cfg: Config):
-    global _model
-    if _model is None:
-        from faster_whisper import WhisperModel
-
-        log.info("Chargement du modèle Whisper '%s' (%s/%s)…",
-                 cfg.whisper_model, cfg.whisper_device, cfg.whisper_compute)
-        import os
-        _model = WhisperModel(cfg.whisper_model, device=cfg.whisper_device,
-                              compute_type=cfg.whisper_compute,
-                              cpu_threads=os.cpu_count() or 2)
-    return _model
-
 
 def _fmt_ts(seconds: float) -> str:
     ms = int(round(seconds * 1000))
@@ -51,13 +36,24 @@ def transcribe_video(cfg: Config, db: Database, video_id: int) -> bool:
         log.warning("Fichier inaccessible (disque débranché ?) : %s — vidéo laissée en attente", path)
         return False
 
-    model = get_model(cfg)
+    # Audio décodé UNE fois (vortex/audio.py) : le même passage FFmpeg
+    # écrit le PCM 16 kHz que lit Whisper et mesure la sonie EBU R128 dont
+    # le rendu se sert pour normaliser en deux passes (vortex/sonie.py).
+    from .audio import cache_de, pcm_et_sonie
+    from .transcripteur import transcrire
     try:
-        segments_iter, info = model.transcribe(str(path), vad_filter=True,
-                                               word_timestamps=True)
-        segments = list(segments_iter)
+        try:
+            fichier, mesure = pcm_et_sonie(path, cache=cache_de(cfg), video_id=video_id)
+        except FileNotFoundError:
+            # Pas de FFmpeg : PyAV décode la source, sans mesure de sonie.
+            fichier, mesure = path, None
+        segments, info = transcrire(fichier, modele_nom=cfg.whisper_model,
+                                    device=cfg.whisper_device, compute=cfg.whisper_compute,
+                                    socket_chemin=cfg.whisper_socket,
+                                    duree_audio_s=row["duration_s"],
+                                    vad_filter=True, word_timestamps=True)
     except IndexError:
-        # PyAV : pas de piste audio dans le fichier (téléchargement vidéo-seul)
+        # Pas de piste audio dans le fichier (téléchargement vidéo-seul)
         log.error("Aucune piste audio dans %s — fichier à retélécharger", row["name"])
         db.set_state(video_id, "BLOCKED", "aucune piste audio (téléchargement vidéo-seul)")
         return False
@@ -66,6 +62,13 @@ def transcribe_video(cfg: Config, db: Database, video_id: int) -> bool:
         db.set_state(video_id, "FAILED", f"transcription : {exc}")
         return False
 
+    mesure = mesure or {}
+    _ecrire(cfg, db, row, segments, info, mesure)
+    return True
+
+
+def _ecrire(cfg: Config, db: Database, row, segments: list, info, mesure: dict) -> None:
+    """Texte, mots minutés, sous-titres, puis passage à TRANSCRIBED."""
     text = " ".join(seg.text.strip() for seg in segments).strip()
     txt_path = cfg.transcripts_dir / f"{row['name']}.txt"
     txt_path.write_text(text, encoding="utf-8")
@@ -86,20 +89,237 @@ def transcribe_video(cfg: Config, db: Database, video_id: int) -> bool:
     srt_path.write_text("\n".join(srt_lines), encoding="utf-8")
 
     db.set_state(
-        video_id, "TRANSCRIBED", f"langue={info.language} (p={info.language_probability:.2f})",
+        row["id"], "TRANSCRIBED", f"langue={info.language} (p={info.language_probability:.2f})",
         transcript_path=str(txt_path), srt_path=str(srt_path), language=info.language,
+        **mesure,
     )
     log.info("Transcrit %s (%.0fs, langue %s)", row["name"], row["duration_s"] or 0, info.language)
-    return True
 
 
 def transcribe_pending(cfg: Config, db: Database, limit: int = 0) -> int:
     """Transcrit jusqu'à `limit` vidéos AVEC SUCCÈS (les fichiers absents —
-    disque débranché, pas encore synchronisés — ne consomment pas la limite)."""
+    disque débranché, pas encore synchronisés — ne consomment pas la limite).
+
+    Avec `[whisper] workers` > 1 ou `batch_size` > 0, passe par
+    `_transcrire_en_lots`. Dans tous les cas le débit (clips/heure) est
+    journalisé, pour comparer les deux chemins sur la même machine.
+    """
+    import time
+
+    workers, lot = max(1, cfg.whisper_workers), max(0, cfg.whisper_batch)
+    depart = time.monotonic()
     done = 0
-    for row in db.by_state("DISCOVERED"):
-        if limit and done >= limit:
-            break
-        if transcribe_video(cfg, db, row["id"]):
+    if workers > 1 or lot > 0:
+        mode = f"{workers} fil(s), lots de {lot}" if lot else f"{workers} fil(s)"
+        done = _transcrire_en_lots(cfg, db, db.by_state("DISCOVERED"), limit, workers, lot)
+    else:
+        mode = "séquentiel"
+        for row in db.by_state("DISCOVERED"):
+            if limit and done >= limit:
+                break
+            if transcribe_video(cfg, db, row["id"]):
+                done += 1
+    duree = time.monotonic() - depart
+    if done:
+        log.info("Transcription : %d clip(s) en %.0f s, soit %.0f clips/h (%s)",
+                 done, duree, done * 3600 / max(duree, 1e-6), mode)
+    return done
+
+
+# ------------------------------------------------------------ lots et fils
+# Les TikTok font 30 à 90 s : une ou deux fenêtres de 30 s chacun. Seul, un
+# clip laisse le modèle à moitié vide entre deux fichiers (ouverture,
+# décodage, VAD). Ici :
+#
+# - deux fils DÉCODENT l'audio à l'avance (cache PCM de vortex/audio.py,
+#   sonie mesurée au passage) pendant que le modèle travaille sur le lot
+#   précédent ;
+# - les clips décodés sont mis BOUT À BOUT jusqu'à LOT_AUDIO_S d'audio.
+#   Les fenêtres de parole sont cherchées clip par clip (VAD de
+#   faster-whisper), puis passées au pipeline par lots (`batch_size`
+#   fenêtres par passe) : une fenêtre ne chevauche jamais deux clips, et
+#   chaque segment revient à son clip par son horodatage ;
+# - `workers` lots tournent en même temps (`num_workers` de CTranslate2, les
+#   cœurs partagés entre eux).
+#
+# La langue est détectée clip par clip (`detect_language` sur l'audio du
+# clip), puis le lot est transcrit en une passe PAR LANGUE, langue imposée :
+# un clip en anglais au milieu d'un lot français n'hérite pas du français de
+# ses voisins. Le démon Whisper (vortex/transcripteur.py) ne sert pas ce
+# chemin : il transcrit un fichier par demande.
+LOT_AUDIO_S = 600
+_ECHANTILLONNAGE = 16000
+_AVANCE = 4                          # décodages d'avance, au plus
+
+
+def _decoder(cache, row) -> dict:
+    """Audio 16 kHz et sonie d'un clip (vortex/audio.py). Fil de décodage :
+    pas de base."""
+    from .audio import lire, pcm_et_sonie
+
+    decode = {"row": row, "audio": None, "erreur": None, "sonie": {}}
+    try:
+        try:
+            fichier, mesure = pcm_et_sonie(row["path"], cache=cache, video_id=row["id"])
+            decode["audio"], decode["sonie"] = lire(fichier), mesure or {}
+        except FileNotFoundError:
+            # Pas de FFmpeg : PyAV décode la source, sans mesure de sonie
+            # (comme transcribe_video).
+            from faster_whisper import decode_audio
+            decode["audio"] = decode_audio(row["path"], sampling_rate=_ECHANTILLONNAGE)
+    except Exception as exc:
+        decode["erreur"] = exc
+    return decode
+
+
+def _inferer_lot(moteur, pipeline, lot: list[dict], taille_lot: int) -> list[tuple]:
+    """(segments, informations) de chaque clip du lot, dans l'ordre."""
+    from types import SimpleNamespace
+
+    if pipeline is None:
+        resultats = []
+        for d in lot:
+            segments, info = moteur.transcribe(d["audio"], vad_filter=True, word_timestamps=True)
+            resultats.append((list(segments), info))
+        return resultats
+
+    from faster_whisper.vad import VadOptions, get_speech_timestamps, merge_segments
+
+    vad = VadOptions()
+    resultats: list[tuple] = [([], SimpleNamespace(language=None, language_probability=0.0))
+                              for _ in lot]
+    par_langue: dict[str, list[tuple[int, list[dict]]]] = {}
+    for i, d in enumerate(lot):
+        fenetres = merge_segments(get_speech_timestamps(d["audio"], vad), vad)
+        if not fenetres:             # aucun mot : ni langue, ni segment
+            continue
+        langue, probabilite, _ = moteur.detect_language(d["audio"], vad_filter=True)
+        resultats[i] = ([], SimpleNamespace(language=langue,
+                                            language_probability=probabilite))
+        par_langue.setdefault(langue, []).append((i, fenetres))
+    for langue, clips in par_langue.items():
+        par_clip = _passe_langue(pipeline, [lot[i]["audio"] for i, _ in clips],
+                                 [f for _, f in clips], langue, taille_lot)
+        for (i, _), segments in zip(clips, par_clip):
+            resultats[i] = (segments, resultats[i][1])
+    return resultats
+
+
+def _passe_langue(pipeline, audios: list, fenetres_clips: list[list[dict]], langue: str,
+                  taille_lot: int) -> list[list]:
+    """Une passe du pipeline sur des clips bout à bout, `langue` imposée :
+    les segments de chaque clip, ramenés à son début."""
+    import bisect
+    from types import SimpleNamespace
+
+    import numpy as np
+
+    fenetres, debuts, decalage = [], [], 0
+    for audio, fenetres_clip in zip(audios, fenetres_clips):
+        for f in fenetres_clip:
+            fenetres.append({"start": (f["start"] + decalage) / _ECHANTILLONNAGE,
+                             "end": (f["end"] + decalage) / _ECHANTILLONNAGE})
+        debuts.append(decalage / _ECHANTILLONNAGE)
+        decalage += len(audio)
+    segments, _ = pipeline.transcribe(np.concatenate(audios), clip_timestamps=fenetres,
+                                      batch_size=taille_lot, language=langue,
+                                      word_timestamps=True)
+    par_clip: list[list] = [[] for _ in audios]
+    for seg in segments:
+        i = bisect.bisect_right(debuts, seg.start) - 1
+        o = debuts[i]
+        mots = [SimpleNamespace(word=w.word, start=w.start - o, end=w.end - o)
+                for w in (seg.words or [])]
+        par_clip[i].append(SimpleNamespace(start=seg.start - o, end=seg.end - o,
+                                           text=seg.text, words=mots))
+    return par_clip
+
+
+def _transcrire_en_lots(cfg: Config, db: Database, rows: list, limit: int,
+                        workers: int, taille_lot: int) -> int:
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    from .audio import cache_de
+    from .transcripteur import modele
+
+    a_faire = [r for r in rows if Path(r["path"]).exists()]
+    if not a_faire:
+        return 0
+    moteur = modele(cfg.whisper_model, cfg.whisper_device, cfg.whisper_compute, workers=workers)
+    pipeline = None
+    if taille_lot:
+        try:
+            from faster_whisper import BatchedInferencePipeline
+            pipeline = BatchedInferencePipeline(model=moteur)
+        except ImportError:
+            log.warning("faster-whisper sans BatchedInferencePipeline (< 1.1) : "
+                        "un clip par passe, %d fil(s)", workers)
+
+    # `limit` compte les réussites, comme le chemin séquentiel : un clip
+    # n'est tiré que si ceux déjà tirés, moins les échecs, restent sous la
+    # limite ; chaque échec libère sa place pour le suivant.
+    done = tires = echecs = 0
+    en_cours: dict = {}
+    decodes: list = []
+
+    def tirer() -> None:
+        nonlocal tires
+        while len(decodes) < _AVANCE and (not limit or tires - echecs < limit):
+            suivante = next(file, None)
+            if suivante is None:
+                return
+            tires += 1
+            decodes.append(decodage.submit(_decoder, cache, suivante))
+
+    def conclure(futur) -> None:
+        nonlocal done, echecs
+        lot = en_cours.pop(futur)
+        try:
+            resultats = futur.result()
+        except Exception as exc:
+            # Lot illisible : chaque clip retente seul, par le chemin habituel.
+            log.warning("Lot de %d clip(s) échoué (%s) — reprise clip par clip", len(lot), exc)
+            reussis = sum(transcribe_video(cfg, db, d["row"]["id"]) for d in lot)
+            done += reussis
+            echecs += len(lot) - reussis
+            return
+        for d, (segments, info) in zip(lot, resultats):
+            _ecrire(cfg, db, d["row"], segments, info, d["sonie"])
             done += 1
+
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="vortex-decodage") as decodage, \
+            ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vortex-whisper") as inference:
+        file = iter(a_faire)
+        cache = cache_de(cfg)
+        tirer()
+        lot: list[dict] = []
+        while decodes or lot:
+            if decodes:
+                d = decodes.pop(0).result()
+                row = d["row"]
+                if isinstance(d["erreur"], IndexError):
+                    # PyAV : pas de piste audio (téléchargement vidéo-seul)
+                    log.error("Aucune piste audio dans %s — fichier à retélécharger", row["name"])
+                    db.set_state(row["id"], "BLOCKED", "aucune piste audio (téléchargement vidéo-seul)")
+                    echecs += 1
+                elif d["erreur"] is not None:
+                    log.error("Transcription échouée pour %s : %s", row["name"], d["erreur"])
+                    db.set_state(row["id"], "FAILED", f"transcription : {d['erreur']}")
+                    echecs += 1
+                else:
+                    lot.append(d)
+                tirer()
+                plein = (sum(len(x["audio"]) for x in lot) >= LOT_AUDIO_S * _ECHANTILLONNAGE
+                         if pipeline is not None else bool(lot))
+                if not plein and decodes:
+                    continue
+            if lot:
+                en_cours[inference.submit(_inferer_lot, moteur, pipeline, lot, taille_lot)] = lot
+                lot = []
+            # Pas plus de lots en vol que de fils : l'audio décodé attend en mémoire.
+            while len(en_cours) >= workers or (en_cours and not decodes and not lot):
+                finis, _ = wait(en_cours, return_when=FIRST_COMPLETED)
+                for futur in finis:
+                    conclure(futur)
+            tirer()                  # places libérées par des échecs du lot
     return done
@@ -0,0 +1,242 @@
+"""Démon Whisper : modèles gardés en mémoire, servis par un socket Unix.
+
+Chaque étape du cron est un processus neuf (`python -m vortex transcribe`
+dans daily.sh, `reperer_pour_vps.py` pour l'écoute des directs) : chacune
+rechargeait faster-whisper, soit 10 à 40 s de chargement du modèle avant la
+première seconde d'audio, et autant de mémoire tant qu'elle tourne.
+
+    python -m vortex whisper-daemon [--inactif-min M]
+
+garde les modèles chargés (un par triplet modèle / device / compute_type)
+et traite les demandes UNE PAR UNE, dans l'ordre d'arrivée : deux inférences
+simultanées se disputeraient les mêmes cœurs sans finir plus tôt. Après
+`--inactif-min` minutes sans demande, les modèles sont libérés (le serveur
+n'a que quelques centaines de mégaoctets de libre) ; la demande suivante les
+recharge.
+
+Protocole : une ligne JSON par demande, une ligne JSON par réponse, puis
+fermeture. Le démon lit le fichier lui-même : client et démon doivent voir
+les mêmes chemins (même conteneur ou mêmes volumes).
+
+Côté appelants, `transcrire()` remplace `WhisperModel(...).transcribe()` et
+rend les mêmes objets (segments à `.start`, `.end`, `.text`, `.words` ;
+informations à `.language`, `.language_probability`). Sans démon — socket
+absent, refus de connexion, Windows sans AF_UNIX — le modèle est chargé dans
+le processus, comme avant, et gardé pour les appels suivants.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+from .config import REPO_ROOT
+
+log = logging.getLogger("vortex.transcripteur")
+
+# Chemin par défaut : data_dir du config.toml livré. Config.whisper_socket
+# le déduit du data_dir réellement configuré.
+SOCKET_DEFAUT = REPO_ROOT / "data" / "whisper.sock"
+INACTIF_MIN = 30
+# Attente d'une réponse du démon : une part fixe (file d'attente, chargement
+# du modèle) plus un multiple de la durée d'audio. Au-delà, le démon est
+# tenu pour bloqué et l'appelant transcrit lui-même.
+ATTENTE_FIXE_S = 300
+ATTENTE_PAR_S_AUDIO = 3
+
+# Modèles chargés, dans le démon comme en repli local.
+_modeles: dict[tuple, object] = {}
+_verrou_modeles = threading.Lock()
+
+
+def modele(nom: str, device: str = "cpu", compute: str = "int8", workers: int = 1):
+    """Le WhisperModel de ce triplet, chargé une fois par processus.
+
+    `workers` > 1 : autant d'inférences simultanées possibles
+    (transcribe._transcrire_en_lots), les cœurs répartis entre elles.
+    """
+    cle = (nom, device, compute) if workers <= 1 else (nom, device, compute, workers)
+    with _verrou_modeles:
+        if cle not in _modeles:
+            from faster_whisper import WhisperModel
+
+            log.info("Chargement du modèle Whisper '%s' (%s/%s)…", nom, device, compute)
+            _modeles[cle] = WhisperModel(nom, device=device, compute_type=compute,
+                                         cpu_threads=max(1, (os.cpu_count() or 2) // workers),
+                                         num_workers=workers)
+        return _modeles[cle]
+
+
+def _inferer(demande: dict, workers: int = 1) -> dict:
+    """Transcrit selon `demande` ; réponse sérialisable en JSON."""
+    moteur = modele(demande["modele"], demande.get("device", "cpu"),
+                    demande.get("compute", "int8"), workers)
+    fichier = demande["fichier"]
+    if fichier.endswith(".pcm"):
+        # PCM du cache audio (vortex/audio.py) : lu tel quel, sans décodage,
+        # et seulement la tranche demandée.
+        from .audio import lire
+        fichier = lire(Path(fichier), demande.get("debut_s", 0.0), demande.get("duree_s"))
+    segments, info = moteur.transcribe(fichier, **demande.get("options", {}))
+    return {
+        "ok": True,
+        "langue": info.language,
+        "probabilite": info.language_probability,
+        "segments": [
+            {"start": s.start, "end": s.end, "text": s.text,
+             "words": [{"word": w.word, "start": w.start, "end": w.end}
+                       for w in (s.words or [])]}
+            for s in segments
+        ],
+    }
+
+
+def _en_objets(reponse: dict) -> tuple[list, SimpleNamespace]:
+    segments = [SimpleNamespace(start=s["start"], end=s["end"], text=s["text"],
+                                words=[SimpleNamespace(**w) for w in s["words"]])
+                for s in reponse["segments"]]
+    return segments, SimpleNamespace(language=reponse["langue"],
+                                     language_probability=reponse["probabilite"])
+
+
+# Exceptions que les appelants savent traiter (transcribe : IndexError =
+# fichier sans piste audio) : relancées telles quelles côté client.
+_EXCEPTIONS = {"IndexError": IndexError, "FileNotFoundError": FileNotFoundError,
+               "ValueError": ValueError}
+
+
+def _attente_s(demande: dict, duree_audio_s: float | None) -> float:
+    """Délai de réponse accordé au démon pour `demande`."""
+    if demande.get("duree_s") is not None:
+        duree_audio_s = demande["duree_s"]
+    elif duree_audio_s is None and demande["fichier"].endswith(".pcm"):
+        from .audio import duree
+        try:
+            duree_audio_s = duree(Path(demande["fichier"])) - demande.get("debut_s", 0.0)
+        except OSError:
+            pass
+    return ATTENTE_FIXE_S + ATTENTE_PAR_S_AUDIO * max(0.0, duree_audio_s or 0.0)
+
+
+def _demander(chemin: Path, demande: dict, attente_s: float) -> dict | None:
+    """Réponse du démon, ou None s'il ne répond pas dans `attente_s`
+    secondes (repli local)."""
+    if not hasattr(socket, "AF_UNIX") or not chemin.exists():
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.settimeout(5)
+            client.connect(str(chemin))
+            client.sendall(json.dumps(demande).encode("utf-8") + b"\n")
+            # Une transcription peut attendre son tour derrière d'autres,
+            # mais un démon bloqué ne doit pas bloquer l'étape du cron.
+            client.settimeout(attente_s)
+            with client.makefile("rb") as flux:
+                ligne = flux.readline()
+    except TimeoutError:
+        log.warning("Démon Whisper sans réponse après %.0f s — modèle chargé localement",
+                    attente_s)
+        return None
+    except OSError as exc:
+        log.info("Démon Whisper injoignable (%s) — modèle chargé localement", exc)
+        return None
+    if not ligne:
+        log.warning("Démon Whisper muet — modèle chargé localement")
+        return None
+    return json.loads(ligne)
+
+
+def transcrire(fichier: str | Path, *, modele_nom: str, device: str = "cpu",
+               compute: str = "int8", socket_chemin: Path | None = None,
+               debut_s: float = 0.0, duree_s: float | None = None, workers: int = 1,
+               duree_audio_s: float | None = None, **options) -> tuple[list, object]:
+    """(segments, informations) de `fichier`, par le démon si possible.
+
+    `options` : arguments de `WhisperModel.transcribe` (vad_filter,
+    word_timestamps, language…), valeurs JSON seulement. Les segments sont
+    rendus en liste, déjà entièrement décodés, horodatés depuis `debut_s`.
+
+    `debut_s` / `duree_s` : tranche à transcrire, pour un PCM du cache audio
+    seulement. `workers` : appels simultanés prévus par l'appelant, en repli
+    local (le démon, lui, les sert un par un). `duree_audio_s` : durée de
+    `fichier` si l'appelant la connaît, pour borner l'attente du démon (un
+    PCM du cache la donne par sa taille).
+    """
+    demande = {"modele": modele_nom, "device": device, "compute": compute,
+               "fichier": str(Path(fichier).resolve()), "options": options}
+    if debut_s or duree_s is not None:
+        demande.update(debut_s=debut_s, duree_s=duree_s)
+    reponse = _demander(socket_chemin or SOCKET_DEFAUT, demande,
+                        _attente_s(demande, duree_audio_s))
+    if reponse is None or (reponse.get("type") == "FileNotFoundError"
+                           and Path(demande["fichier"]).exists()):
+        # Démon absent, ou fichier qu'il ne voit pas (dossier temporaire
+        # d'un autre conteneur) : inférence ici.
+        reponse = _inferer(demande, workers)
+    if not reponse.get("ok"):
+        erreur = _EXCEPTIONS.get(reponse.get("type"), RuntimeError)
+        raise erreur(reponse.get("erreur", "transcription refusée par le démon"))
+    return _en_objets(reponse)
+
+
+# ------------------------------------------------------------------ démon
+def servir(chemin: Path = SOCKET_DEFAUT, inactif_min: int = INACTIF_MIN) -> None:
+    """Boucle du démon (bloquante). Un fil par connexion pour recevoir, un
+    seul fil d'inférence pour la file des demandes."""
+    file: queue.Queue = queue.Queue()
+
+    def inference() -> None:
+        while True:
+            try:
+                demande, connexion = file.get(timeout=inactif_min * 60)
+            except queue.Empty:
+                with _verrou_modeles:
+                    if _modeles:
+                        log.info("Inactif depuis %d min : %d modèle(s) libéré(s)",
+                                 inactif_min, len(_modeles))
+                        _modeles.clear()
+                continue
+            try:
+                reponse = _inferer(demande)
+            except Exception as exc:
+                log.warning("Échec sur %s : %s", demande.get("fichier"), exc)
+                reponse = {"ok": False, "type": type(exc).__name__, "erreur": str(exc)}
+            try:
+                connexion.sendall(json.dumps(reponse).encode("utf-8") + b"\n")
+            except OSError:
+                pass                     # client parti entre-temps
+            finally:
+                connexion.close()
+
+    def recevoir(connexion: socket.socket) -> None:
+        try:
+            with connexion.makefile("rb") as flux:
+                demande = json.loads(flux.readline())
+            log.info("Demande : %s (%s) — %d en attente", Path(demande["fichier"]).name,
+                     demande["modele"], file.qsize())
+            file.put((demande, connexion))
+        except (OSError, ValueError, KeyError) as exc:
+            log.warning("Demande illisible : %s", exc)
+            connexion.close()
+
+    chemin.parent.mkdir(parents=True, exist_ok=True)
+    chemin.unlink(missing_ok=True)       # socket d'un démon précédent
+    serveur = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    serveur.bind(str(chemin))
+    serveur.listen(16)
+    threading.Thread(target=inference, name="whisper-inference", daemon=True).start()
+    log.info("Démon Whisper à l'écoute sur %s (libération après %d min d'inactivité)",
+             chemin, inactif_min)
+    try:
+        while True:
+            connexion, _ = serveur.accept()
+            threading.Thread(target=recevoir, args=(connexion,), daemon=True).start()
+    finally:
+        serveur.close()
+        chemin.unlink(missing_ok=True)
@@ -22,17 +22,39 @@ piste avait été abandonnée :
 
 Le recadrage écarte aussi la bande de sous-titres incrustés en bas des
 extraits Submagic/OpusClip : sans cela, la cover affichait deux textes.
+
+Le parcours d'une vidéo (90 sondages YuNet) est fait UNE fois et gardé en
+PISTE : un petit JSON dans `<data_dir>/pistes_visage/` (`dossier_pistes`)
+avec, pour chaque instant sondé, les visages (boîte, netteté, luminosité) et
+la trace de texte des bandes haute et basse. La miniature et le portrait de
+la cover la relisent ; seule l'image finalement retenue est redécodée. La
+place de l'accroche au rendu (`haut_du_visage`) la relit si elle existe
+déjà, sans jamais la faire calculer : le rendu se contente de quelques
+sondages du début. Rendu et miniatures travaillent sur la SOURCE (la vidéo
+habillée porte l'accroche et le karaoké) : une seule piste par extrait.
+vps/free_space.py efface les pistes dont la vidéo a disparu.
 """
 
 from __future__ import annotations
 
+import hashlib
+import json
 import logging
+import statistics
 from pathlib import Path
 
 log = logging.getLogger("vortex.visage")
 
 MODELE = (Path(__file__).resolve().parent.parent
           / "assets" / "modeles" / "face_detection_yunet_2023mar.onnx")
+# À changer si le contenu d'une piste change : les anciennes sont refaites.
+# 2 : chemin de la vidéo noté, pour le ménage des pistes orphelines.
+VERSION_PISTE = 2
+ECHANTILLONS = 90
+# Plus petit visage noté dans la piste. Les miniatures exigent
+# LARGEUR_VISAGE_MINIMALE ; la place de l'accroche se contente de moins
+# (l'ancienne sonde de Haar du rendu descendait à 40 px).
+LARGEUR_VISAGE_PISTE = 40
 
 # Netteté (variance de Laplace sur le visage) en dessous de laquelle l'image
 # ne vaut pas mieux qu'un décor. Mesuré le 10/08 sur les extraits réels : les
@@ -60,18 +82,82 @@ def _detecteur(largeur: int, hauteur: int, seuil: float = 0.85):
     return det
 
 
-def _candidats(video: Path, echantillons: int, marge_bas: float):
-    """Sonde la vidéo en `echantillons` points et rend les plans à visage net.
+def dossier_pistes(cfg) -> Path:
+    """Dossier des pistes de visages : `<data_dir>/pistes_visage`."""
+    return Path(cfg.data_dir) / "pistes_visage"
+
+
+def _fichier_piste(video: Path, pistes: Path) -> Path:
+    # Deux extraits de même nom dans deux dossiers ne partagent pas leur piste.
+    cle = hashlib.sha1(str(video.resolve()).encode("utf-8")).hexdigest()[:12]
+    return pistes / f"{video.stem}-{cle}.json"
+
+
+def _piste_connue(chemin: Path, infos, echantillons: int, pistes: Path) -> dict | None:
+    """Piste gardée pour ce fichier dans cet état, ou None."""
+    try:
+        connue = json.loads(_fichier_piste(chemin, pistes).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if (connue.get("version"), connue.get("taille"), connue.get("mtime_ns"),
+            connue.get("echantillons")) == (VERSION_PISTE, infos.st_size,
+                                            infos.st_mtime_ns, echantillons):
+        return connue
+    return None
+
+
+def piste(video: str | Path, echantillons: int = ECHANTILLONS, *,
+          pistes: Path) -> dict | None:
+    """Piste des visages de `video`, lue dans `pistes` ou calculée puis gardée.
+
+    Une piste vaut pour un fichier précis : taille ou date de modification
+    différentes (rendu refait, source retéléchargée) et elle est refaite.
+    None si la vidéo est illisible ou la détection impossible (OpenCV ou
+    modèle absents).
+    """
+    chemin = Path(video)
+    try:
+        infos = chemin.stat()
+    except OSError:
+        return None
+    connue = _piste_connue(chemin, infos, echantillons, pistes)
+    if connue is not None:
+        return connue
+    fichier = _fichier_piste(chemin, pistes)
+    try:
+        calculee = _indexer(chemin, echantillons)
+    except Exception as exc:
+        log.warning("Recherche de visage impossible dans %s : %s", chemin.name, exc)
+        return None
+    if calculee is None:
+        return None
+    calculee.update(version=VERSION_PISTE, chemin=str(chemin.resolve()), taille=infos.st_size,
+                    mtime_ns=infos.st_mtime_ns, echantillons=echantillons)
+    try:
+        pistes.mkdir(parents=True, exist_ok=True)
+        provisoire = fichier.with_suffix(".part")
+        provisoire.write_text(json.dumps(calculee, separators=(",", ":")), encoding="utf-8")
+        provisoire.replace(fichier)
+    except OSError as exc:
+        log.warning("Piste de visages non gardée pour %s : %s", chemin.name, exc)
+    return calculee
+
+
+def _indexer(video: Path, echantillons: int, jusqua: float = 0.96) -> dict | None:
+    """Sonde la vidéo en `echantillons` points et note tout ce qui s'y voit.
 
     On saute d'un instant à l'autre au lieu de décoder toute la vidéo : un
     extrait de cinq minutes serait sinon plus long à analyser qu'à regarder,
-    et le rattrapage porte sur plus de cent vidéos.
+    et le rattrapage porte sur plus de cent vidéos. Aucun filtre propre à un
+    usage ici (netteté, bande de sous-titres) : chacun les applique à la
+    lecture, la même piste sert à tous. `jusqua` : fin du parcours, en
+    fraction de la durée.
     """
     import cv2
 
     capture = cv2.VideoCapture(str(video))
     if not capture.isOpened():
-        return []
+        return None
     fps = capture.get(cv2.CAP_PROP_FPS) or 25
     images = capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0
     largeur = int(capture.get(cv2.CAP_PROP_FRAME_WIDTH))
@@ -79,52 +165,117 @@ def _candidats(video: Path, echantillons: int, marge_bas: float):
     duree = images / fps if fps else 0
     if not largeur or not hauteur or duree <= 0:
         capture.release()
-        return []
+        return None
     detecteur = _detecteur(largeur, hauteur)
 
     # Les premières et dernières secondes sont souvent un fondu ou un carton.
-    debut, fin = duree * 0.04, duree * 0.96
+    debut, fin = duree * 0.04, duree * jusqua
     points = [debut + (fin - debut) * i / max(echantillons - 1, 1)
               for i in range(echantillons)]
 
-    trouves = []
+    sondages = []
     for seconde in points:
         capture.set(cv2.CAP_PROP_POS_MSEC, seconde * 1000.0)
         lu, image = capture.read()
         if not lu or image is None:
             continue
-        _, visages = detecteur.detect(image)
-        if visages is None:
-            continue
-        for v in visages:
+        _, detectes = detecteur.detect(image)
+        visages = []
+        for v in detectes if detectes is not None else ():
             x, y, vw, vh = (int(n) for n in v[:4])
             x, y = max(0, x), max(0, y)
-            if vw < LARGEUR_VISAGE_MINIMALE or x + vw > largeur or y + vh > hauteur:
-                continue
-            # Un visage assis dans la bande de sous-titres n'est pas cadrable.
-            if y > hauteur * (1 - marge_bas):
+            if vw < LARGEUR_VISAGE_PISTE or x + vw > largeur or y + vh > hauteur:
                 continue
             gris = cv2.cvtColor(image[y:y + vh, x:x + vw], cv2.COLOR_BGR2GRAY)
             if gris.size == 0:
                 continue
-            nettete = float(cv2.Laplacian(gris, cv2.CV_64F).var())
+            visages.append([x, y, vw, vh,
+                            round(float(cv2.Laplacian(gris, cv2.CV_64F).var()), 1),
+                            round(float(gris.mean()), 1)])
+        sondages.append({
+            "s": round(seconde, 3), "visages": visages,
+            "bas": round(_trace_texte(image, *BANDE_SOUSTITRES), 5),
+            "haut": round(_trace_texte(image, *BANDE_BANDEAU), 5),
+        })
+    capture.release()
+    return {"largeur": largeur, "hauteur": hauteur, "duree": round(duree, 3),
+            "sondages": sondages}
+
+
+def _candidats(video: Path, echantillons: int, marge_bas: float,
+               pistes: Path) -> list[dict]:
+    """Les plans à visage net de la piste, sans image (voir `_image_a`)."""
+    donnees = piste(video, echantillons, pistes=pistes)
+    if donnees is None:
+        return []
+    largeur, hauteur = donnees["largeur"], donnees["hauteur"]
+    trouves = []
+    for sondage in donnees["sondages"]:
+        for x, y, vw, vh, nettete, luminosite in sondage["visages"]:
+            if vw < LARGEUR_VISAGE_MINIMALE:
+                continue
+            # Un visage assis dans la bande de sous-titres n'est pas cadrable.
+            if y > hauteur * (1 - marge_bas):
+                continue
             if nettete < NETTETE_MINIMALE:
                 continue
-            luminosite = float(gris.mean())
             # Un visage dans le noir ou cramé ne donne rien de lisible.
             if not 35 <= luminosite <= 225:
                 continue
             trouves.append({
-                "image": image, "boite": (x, y, vw, vh), "nettete": nettete,
+                "boite": (x, y, vw, vh), "nettete": nettete,
                 "part": vw * vh / float(largeur * hauteur),
-                "seconde": seconde,
-                "texte_bas": _trace_texte(image, *BANDE_SOUSTITRES),
-                "texte_haut": _trace_texte(image, *BANDE_BANDEAU),
+                "seconde": sondage["s"],
+                "texte_bas": sondage["bas"], "texte_haut": sondage["haut"],
             })
-    capture.release()
     return trouves
 
 
+def _image_a(video: Path, seconde: float):
+    """L'image à `seconde`, décodée comme l'avait été le sondage de la piste."""
+    import cv2
+
+    capture = cv2.VideoCapture(str(video))
+    try:
+        capture.set(cv2.CAP_PROP_POS_MSEC, seconde * 1000.0)
+        lu, image = capture.read()
+    finally:
+        capture.release()
+    return image if lu else None
+
+
+def haut_du_visage(video: str | Path, premiers: int = 5, *, pistes: Path) -> float | None:
+    """Fraction verticale (0 = tout en haut) du haut du visage principal au
+    début de la vidéo, pour placer l'accroche. None sans visage.
+
+    Médiane, sur les `premiers` sondages qui montrent un visage, du haut du
+    plus grand : un seul instant (l'ancienne sonde) se trompait dès que
+    l'orateur baissait la tête.
+
+    Appelé à chaque rendu : la piste complète n'est lue que si elle existe
+    déjà (miniature faite avant). Sinon `premiers` sondages sur le premier
+    cinquième de la vidéo, sans rien garder — quelques détections au lieu
+    des 90 de la piste.
+    """
+    chemin = Path(video)
+    try:
+        infos = chemin.stat()
+    except OSError:
+        return None
+    donnees = _piste_connue(chemin, infos, ECHANTILLONS, pistes)
+    if donnees is None:
+        try:
+            donnees = _indexer(chemin, premiers, jusqua=0.2)
+        except Exception as exc:
+            log.debug("Sondage du visage impossible dans %s : %s", chemin.name, exc)
+            return None
+    if donnees is None:
+        return None
+    hauts = [max(s["visages"], key=lambda v: v[2] * v[3])[1] / donnees["hauteur"]
+             for s in donnees["sondages"] if s["visages"]][:premiers]
+    return statistics.median(hauts) if hauts else None
+
+
 def _trace_texte(image, haut: float, bas: float) -> float:
     """Trace d'un texte incrusté dans la bande [haut, bas] (0 = bande propre).
 
@@ -226,7 +377,7 @@ def _en_jpeg(image, largeur_cible: int, hauteur_cible: int) -> bytes | None:
     return None
 
 
-def image_miniature(video: str | Path, *, vertical: bool | None = None,
+def image_miniature(video: str | Path, *, pistes: Path, vertical: bool | None = None,
                     echantillons: int = 90, marge_bas: float = 0.20) -> bytes | None:
     """Un PLAN DE LA VIDÉO, sans rien ajouter, prêt à servir de miniature.
 
@@ -236,24 +387,17 @@ def image_miniature(video: str | Path, *, vertical: bool | None = None,
     près qu'elle est CHOISIE : le plan le plus net où l'on voit le visage, et
     de préférence sans sous-titre affiché.
     """
-    import cv2
-
     chemin = Path(video)
     if not chemin.is_file():
         return None
-    try:
-        trouves = _candidats(chemin, echantillons, marge_bas)
-    except Exception as exc:
-        log.warning("Recherche de visage impossible dans %s : %s", chemin.name, exc)
-        return None
+    trouves = _candidats(chemin, echantillons, marge_bas, pistes)
     if not trouves:
         log.info("Aucun visage exploitable dans %s", chemin.name)
         return None
 
     if vertical is None:
-        capture = cv2.VideoCapture(str(chemin))
-        vertical = capture.get(cv2.CAP_PROP_FRAME_HEIGHT) > capture.get(cv2.CAP_PROP_FRAME_WIDTH)
-        capture.release()
+        donnees = piste(chemin, echantillons, pistes=pistes)
+        vertical = donnees["hauteur"] > donnees["largeur"]
 
     # L'image part telle quelle : tout texte incrusté se retrouve sur la
     # miniature. Mesuré le 10/08 sur les extraits réels : un tiers des plans a
@@ -269,8 +413,11 @@ def image_miniature(video: str | Path, *, vertical: bool | None = None,
         log.debug("%d plans sans sous-titre sur %d", len(propres), len(trouves))
         trouves = propres
     meilleur = _meilleur(trouves, penalite_bas=8.0, penalite_haut=8.0)
+    image = _image_a(chemin, meilleur["seconde"])
+    if image is None:
+        return None
     largeur, hauteur = (2160, 3840) if vertical else (3840, 2160)
-    donnees = _en_jpeg(meilleur["image"], largeur, hauteur)
+    donnees = _en_jpeg(image, largeur, hauteur)
     if donnees:
         log.info("Plan retenu dans %s à %.1f s (netteté %.0f, texte bas %.3f haut %.3f)",
                  chemin.name, meilleur["seconde"], meilleur["nettete"],
@@ -278,7 +425,7 @@ def image_miniature(video: str | Path, *, vertical: bool | None = None,
     return donnees
 
 
-def portrait_depuis_video(video: str | Path, *, vertical: bool = False,
+def portrait_depuis_video(video: str | Path, *, pistes: Path, vertical: bool = False,
                           echantillons: int = 90, marge_bas: float = 0.18) -> bytes | None:
     """Meilleur cadrage-portrait trouvé dans la vidéo, en JPEG. None si aucun.
 
@@ -290,11 +437,7 @@ def portrait_depuis_video(video: str | Path, *, vertical: bool = False,
     chemin = Path(video)
     if not chemin.is_file():
         return None
-    try:
-        trouves = _candidats(chemin, echantillons, marge_bas)
-    except Exception as exc:
-        log.warning("Recherche de visage impossible dans %s : %s", chemin.name, exc)
-        return None
+    trouves = _candidats(chemin, echantillons, marge_bas, pistes)
     if not trouves:
         log.info("Aucun visage exploitable dans %s", chemin.name)
         return None
@@ -304,8 +447,11 @@ def portrait_depuis_video(video: str | Path, *, vertical: bool = False,
     # écarte déjà les sous-titres du bas ; le bandeau du haut, lui, tombe en
     # plein dans le cadre — c'est celui-là qu'on évite.
     meilleur = _meilleur(trouves, penalite_haut=8.0)
+    image = _image_a(chemin, meilleur["seconde"])
+    if image is None:
+        return None
     ratio = 0.72 if vertical else 1.03
-    cadre = _recadre(meilleur["image"], meilleur["boite"], ratio, marge_bas)
+    cadre = _recadre(image, meilleur["boite"], ratio, marge_bas)
     if cadre is None or cadre.size == 0:
         return None
     ok, encode = cv2.imencode(".jpg", cadre, [cv2.IMWRITE_JPEG_QUALITY, 95])
@@ -3,14 +3,19 @@
 - OAuth Desktop (client_secret.json local, token stocké dans secrets/, jamais commité).
 - Scopes minimaux : upload + force-ssl (miniatures et sous-titres).
 - Upload en PRIVÉ avec date de publication programmée (publishAt, UTC).
+- Session d'upload mémorisée en base : un envoi interrompu reprend au dernier
+  octet reçu par YouTube au lieu de repartir de zéro.
 """
 
 from __future__ import annotations
 
+import hashlib
 import json
 import logging
 import time
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
+from typing import Callable
 
 from .config import Config
 
@@ -22,12 +27,15 @@ SCOPES = [
 ]
 
 
-def get_service(cfg: Config):
-    """Service YouTube authentifié. Ouvre le navigateur au premier lancement."""
+UPLOAD_URL = "https://www.googleapis.com/upload/youtube/v3/videos"
+CHUNK_BYTES = 8 * 1024 * 1024
+
+
+def get_credentials(cfg: Config):
+    """Identifiants OAuth valides. Ouvre le navigateur au premier lancement."""
     from google.auth.transport.requests import Request
     from google.oauth2.credentials import Credentials
     from google_auth_oauthlib.flow import InstalledAppFlow
-    from googleapiclient.discovery import build
 
     creds = None
     if cfg.token_file.exists():
@@ -46,15 +54,189 @@ def get_service(cfg: Config):
         cfg.token_file.parent.mkdir(parents=True, exist_ok=True)
         cfg.token_file.write_text(creds.to_json(), encoding="utf-8")
         log.info("Token OAuth enregistré dans %s", cfg.token_file)
-    return build("youtube", "v3", credentials=creds)
+    return creds
+
+
+def get_service(cfg: Config):
+    """Service YouTube authentifié. Ouvre le navigateur au premier lancement."""
+    from googleapiclient.discovery import build
+
+    return build("youtube", "v3", credentials=get_credentials(cfg))
+
+
+class UploadError(Exception):
+    """Refus du serveur pendant un upload résumable.
+
+    Expose `status` et `error_details` (les raisons Google : quotaExceeded…)
+    comme le `HttpError` de googleapiclient, pour que l'appelant traite le
+    quota de la même façon.
+    """
+
+    def __init__(self, status: int, message: str, error_details: list[dict] | None = None):
+        super().__init__(f"HTTP {status} : {message}")
+        self.status = status
+        self.error_details = error_details or []
+
+
+class _SessionExpiree(Exception):
+    """Le serveur ne connaît plus la session (404/410) : tout est à renvoyer."""
+
+
+def _http(methode: str, url: str, jeton: str, corps: bytes = b"",
+          entetes: dict | None = None, timeout: float = 300) -> tuple[int, dict, bytes]:
+    import http.client
+    from urllib.parse import urlsplit
+
+    u = urlsplit(url)
+    classe = http.client.HTTPSConnection if u.scheme == "https" else http.client.HTTPConnection
+    conn = classe(u.netloc, timeout=timeout)
+    try:
+        conn.request(methode, u.path + (f"?{u.query}" if u.query else ""), body=corps,
+                     headers={"Authorization": f"Bearer {jeton}",
+                              "Content-Length": str(len(corps)), **(entetes or {})})
+        rep = conn.getresponse()
+        return rep.status, {k.lower(): v for k, v in rep.getheaders()}, rep.read()
+    finally:
+        conn.close()
+
+
+def _erreur(status: int, corps: bytes) -> UploadError:
+    try:
+        err = json.loads(corps or b"{}").get("error") or {}
+    except ValueError:
+        err = {}
+    return UploadError(status, err.get("message") or corps[:200].decode("utf-8", "replace"),
+                       err.get("errors"))
+
+
+def _octets_acquis(entetes: dict) -> int:
+    """Prochain octet à envoyer, d'après l'en-tête `Range: bytes=0-N` d'un 308."""
+    plage = entetes.get("range")
+    return int(plage.rsplit("-", 1)[1]) + 1 if plage else 0
+
+
+def envoyer_resumable(path: str, metadonnees: dict, *, jeton: Callable[[bool], str],
+                      params: str, url: str = UPLOAD_URL,
+                      session: tuple[str, int] | None = None,
+                      memoriser: Callable[[str, int], None] | None = None,
+                      chunk: int = CHUNK_BYTES) -> dict:
+    """Protocole d'upload résumable de Google, morceau par morceau.
+
+    `session` = (URI, octets acquis) d'un envoi précédent : on demande
+    d'abord au serveur où il en est vraiment, puis on reprend de là. Si la
+    session a expiré, on rouvre une session neuve (une fois) et on renvoie
+    tout. `memoriser(uri, octets)` est appelé à chaque morceau accusé :
+    c'est ce qui permet de reprendre après un plantage du processus.
+    `jeton(renouveler)` fournit le jeton OAuth, rafraîchi après un 401.
+
+    Retourne la ressource vidéo créée (JSON décodé).
+    """
+    import socket
+    import ssl
+
+    taille = Path(path).stat().st_size
+    uri, offset = session or (None, 0)
+    a_synchroniser = uri is not None
+    relance_neuve = uri is None
+    retries = 0
+    renouvele = False
+    with open(path, "rb") as fichier:
+        while True:
+            try:
+                if uri is None:
+                    status, entetes, corps = _http(
+                        "POST", f"{url}?uploadType=resumable&{params}", jeton(False),
+                        json.dumps(metadonnees).encode("utf-8"),
+                        {"Content-Type": "application/json; charset=UTF-8",
+                         "X-Upload-Content-Length": str(taille),
+                         "X-Upload-Content-Type": "video/*"})
+                    if status != 200 or "location" not in entetes:
+                        raise _erreur(status, corps)
+                    uri, offset, a_synchroniser = entetes["location"], 0, False
+                    if memoriser:
+                        memoriser(uri, 0)
+                elif a_synchroniser:
+                    # Après une coupure, seul le serveur sait ce qu'il a gardé.
+                    status, entetes, corps = _http(
+                        "PUT", uri, jeton(False), entetes={"Content-Range": f"bytes */{taille}"})
+                    if status in (200, 201):
+                        return json.loads(corps)
+                    if status in (404, 410):
+                        raise _SessionExpiree
+                    if status != 308:
+                        raise _erreur(status, corps)
+                    offset, a_synchroniser = _octets_acquis(entetes), False
+                    log.info("Reprise de l'upload à %d Mo sur %d", offset >> 20, taille >> 20)
+                    if memoriser:
+                        memoriser(uri, offset)
+
+                fichier.seek(offset)
+                morceau = fichier.read(chunk)
+                status, entetes, corps = _http(
+                    "PUT", uri, jeton(False), morceau,
+                    {"Content-Range": f"bytes {offset}-{offset + len(morceau) - 1}/{taille}"})
+                if status in (200, 201):
+                    return json.loads(corps)
+                if status in (404, 410):
+                    raise _SessionExpiree
+                if status != 308:
+                    raise _erreur(status, corps)
+                offset = _octets_acquis(entetes)
+                retries, renouvele = 0, False
+                if memoriser:
+                    memoriser(uri, offset)
+            except _SessionExpiree:
+                if relance_neuve:
+                    raise UploadError(410, "session d'upload perdue pendant l'envoi")
+                log.warning("Session d'upload expirée — nouvel envoi depuis le début")
+                uri, offset, relance_neuve = None, 0, True
+            except UploadError as err:
+                if err.status == 401 and not renouvele:
+                    jeton(True)
+                    renouvele, a_synchroniser = True, uri is not None
+                elif err.status in (500, 502, 503, 504) and retries < 5:
+                    retries += 1
+                    wait = 2 ** retries
+                    log.warning("Erreur %s, nouvel essai dans %ss", err.status, wait)
+                    time.sleep(wait)
+                    a_synchroniser = uri is not None
+                else:
+                    raise
+            except (ConnectionError, socket.timeout, ssl.SSLError, OSError) as err:
+                # Coupure réseau passagère : l'upload résumable reprend où il en était.
+                if retries < 5:
+                    retries += 1
+                    wait = 2 ** retries
+                    log.warning("Erreur réseau (%s), reprise dans %ss", err, wait)
+                    time.sleep(wait)
+                    a_synchroniser = uri is not None
+                else:
+                    raise
+
+
+def _empreinte_envoi(path: str, body: dict) -> str:
+    """Ce qui doit être identique pour reprendre une session : fichier et
+    métadonnées, date de publication exceptée (reprogrammée après coup)."""
+    stat = Path(path).stat()
+    fige = {**body, "status": {k: v for k, v in body["status"].items() if k != "publishAt"}}
+    cle = json.dumps([str(path), stat.st_size, stat.st_mtime_ns, fige], sort_keys=True)
+    return hashlib.sha256(cle.encode("utf-8")).hexdigest()
 
 
 def upload_video(cfg: Config, service, *, path: str, title: str, description: str,
-                 tags: list[str], publish_at_utc: str, language: str = "fr") -> str:
-    """Upload résumable en privé + programmation. Retourne l'ID YouTube."""
-    from googleapiclient.errors import HttpError
-    from googleapiclient.http import MediaFileUpload
+                 tags: list[str], publish_at_utc: str, language: str = "fr",
+                 db=None, video_id: int | None = None, url: str = UPLOAD_URL,
+                 jeton: Callable[[bool], str] | None = None) -> str:
+    """Upload résumable en privé + programmation. Retourne l'ID YouTube.
 
+    Avec `db` et `video_id`, la session (URI + octets accusés) est gardée en
+    base : un envoi de 300 Mo coupé à 80 % reprend à 80 % au prochain
+    `publish --live`, au lieu de tout renvoyer sur notre petite liaison
+    montante. La session n'est reprise que pour le même fichier et les mêmes
+    métadonnées, et si sa date de publication n'est pas déjà trop proche ;
+    sinon, envoi neuf. `url` et `jeton` servent aux essais sur un serveur
+    local qui imite le protocole.
+    """
     body = {
         "snippet": {
             "title": title,
@@ -70,39 +252,52 @@ def upload_video(cfg: Config, service, *, path: str, title: str, description: st
             "selfDeclaredMadeForKids": cfg.made_for_kids,
         },
     }
-    media = MediaFileUpload(path, chunksize=8 * 1024 * 1024, resumable=True)
-    request = service.videos().insert(
-        part="snippet,status",
-        body=body,
-        media_body=media,
-        notifySubscribers=cfg.notify_subscribers,
-    )
-    import socket
-    import ssl
+    if jeton is None:
+        creds = get_credentials(cfg)
 
-    response = None
-    retries = 0
-    while response is None:
-        try:
-            _, response = request.next_chunk()
-        except HttpError as err:
-            if err.resp.status in (500, 502, 503, 504) and retries < 5:
-                retries += 1
-                wait = 2 ** retries
-                log.warning("Erreur %s, nouvel essai dans %ss", err.resp.status, wait)
-                time.sleep(wait)
-            else:
-                raise
-        except (ConnectionError, socket.timeout, ssl.SSLError, OSError) as err:
-            # Coupure réseau passagère : l'upload résumable reprend où il en était.
-            if retries < 5:
-                retries += 1
-                wait = 2 ** retries
-                log.warning("Erreur réseau (%s), reprise dans %ss", err, wait)
-                time.sleep(wait)
-            else:
-                raise
-    return response["id"]
+        def jeton(renouveler: bool) -> str:
+            if renouveler or not creds.valid:
+                from google.auth.transport.requests import Request
+                creds.refresh(Request())
+            return creds.token
+
+    empreinte = _empreinte_envoi(path, body)
+    session, publie_a = None, publish_at_utc
+    ancienne = db.session_upload(video_id) if db is not None and video_id is not None else None
+    if ancienne is not None:
+        # Le publishAt envoyé à l'ouverture est figé dans la session : s'il est
+        # passé (ou sur le point de l'être), la vidéo sortirait en public dès
+        # la fin de l'envoi. Mieux vaut renvoyer tout le fichier.
+        marge = (datetime.now(timezone.utc) + timedelta(minutes=30)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        if ancienne["empreinte"] == empreinte and ancienne["publish_at"] > marge:
+            session = (ancienne["session_uri"], ancienne["offset_bytes"])
+            publie_a = ancienne["publish_at"]
+            log.info("Session d'upload existante pour #%d : reprise à %d Mo",
+                     video_id, ancienne["offset_bytes"] >> 20)
+        else:
+            db.oublier_session_upload(video_id)
+
+    def _memoriser(uri: str, octets: int) -> None:
+        db.memoriser_session_upload(video_id, session_uri=uri, offset_bytes=octets,
+                                    empreinte=empreinte, publish_at=publie_a)
+
+    memoriser = _memoriser if db is not None and video_id is not None else None
+
+    params = f"part=snippet,status&notifySubscribers={str(bool(cfg.notify_subscribers)).lower()}"
+    try:
+        video = envoyer_resumable(path, body, jeton=jeton, params=params, url=url,
+                                  session=session, memoriser=memoriser)
+    except UploadError as err:
+        # Refus définitif (métadonnées, quota…) : la session ne resservira pas.
+        # Une coupure réseau, elle, la laisse en base pour la prochaine fois.
+        if db is not None and video_id is not None and 400 <= err.status < 500:
+            db.oublier_session_upload(video_id)
+        raise
+    if db is not None and video_id is not None:
+        db.oublier_session_upload(video_id)
+    if publie_a != publish_at_utc:
+        reprogrammer(service, video["id"], publish_at_utc)
+    return video["id"]
 
 
 def set_thumbnail(service, youtube_id: str, thumbnail_path: str) -> None:
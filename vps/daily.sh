@@ -61,5 +61,8 @@ python -m vortex render -n 8
 python -m vortex thumbs -n 8
 python -m vortex publish -n 5 --live
 python -m vortex engage
+# SHA-256 complets en fin de passage : le scan n'en calcule qu'en cas de
+# collision d'empreinte rapide, ceci rattrape le reste sans le ralentir.
+python -m vortex rehash -n 200
 python -m vortex status
 echo "=== [$(date)] FIN ROUTINE ==="
@@ -12,6 +12,14 @@ Trois familles de fichiers sont concernees :
    La suppression exige un `youtube_id` : sans preuve que l'upload a reussi, on
    garde le fichier, sinon un echec silencieux deviendrait irreversible.
 
+Le volume froid du cache de rendus (`render_cache_froid`) est borne a
+FROID_BUDGET : on y efface d'abord les copies des videos deja en ligne, puis
+celles qui se refont le plus vite par octet rendu (`cout_s` du manifeste).
+
+Les pistes de visages (`data/pistes_visage/*.json`, vortex/visage.py) dont la
+video a disparu sont effacees : rien d'autre ne les retire, et chaque extrait
+en laisse une.
+
 Jamais touche : `videos/tiktok_queue` (file en attente de l'approbation TikTok),
 les rendus dont la video n'est pas encore en ligne, les transcriptions, les
 assets et la base.
@@ -19,6 +27,7 @@ assets et la base.
 
 from __future__ import annotations
 
+import json
 import sqlite3
 import time
 from pathlib import Path
@@ -28,11 +37,17 @@ EXPORTS = Path("/app/data/exports")
 SOURCES = Path("/app/videos/sources")
 HEDJAV = Path("/app/videos/hedjav")
 TIKTOK = Path("/app/videos/tiktok_queue")
+PISTES = Path("/app/data/pistes_visage")
 DONE_STATES = ("PUBLISHED", "SCHEDULED")
 # La file TikTok n'a aucune sortie tant que l'API n'est pas approuvee : elle
 # grossit d'un vertical par extrait, indefiniment. On la borne en gardant les
 # plus recents, qui sont ceux qu'on publierait en premier.
 TIKTOK_BUDGET = 2 * 1024 ** 3   # 2 Gio
+# Rendus d'avance au-dela de la reserve (clean_renders_excedentaires) : on
+# garde jusque-la ceux qui coutent le plus cher a refaire.
+AVANCE_BUDGET = 2 * 1024 ** 3   # 2 Gio
+# Copies froides des rendus (manifeste `render_cache`). Au-dela, on evince.
+FROID_BUDGET = 20 * 1024 ** 3   # 20 Gio
 # Un .part inactif depuis six heures n'appartient plus a aucun telechargement :
 # yt-dlp ecrit en continu, et le pipeline lui-meme ne dure jamais aussi longtemps
 # sans toucher a son fichier.
@@ -69,17 +84,22 @@ def clean_exports(db: sqlite3.Connection) -> tuple[int, int]:
         return 0, 0
     freed = count = 0
     for mp4 in sorted(EXPORTS.glob("*_v.mp4")):
+        if mp4.name.startswith("story_"):
+            continue  # part avec son clip, ci-dessous
         name = mp4.stem[:-2]  # retire le suffixe _v
         row = db.execute(
             "SELECT state FROM videos WHERE name = ?", (name,)
         ).fetchone()
         if row is None or row["state"] not in DONE_STATES:
             continue
-        size = _drop(mp4)
-        if size:
-            freed += size
-            count += 1
-            print(f"  export {mp4.name} ({_mib(size)} Mio, {row['state']})")
+        # Story et apercu produits avec le rendu (vortex/plan_rendu.py).
+        for fichier in (mp4, EXPORTS / f"story_{mp4.stem}.mp4",
+                        EXPORTS / f"{name}_apercu.mp4"):
+            size = _drop(fichier)
+            if size:
+                freed += size
+                count += 1
+                print(f"  export {fichier.name} ({_mib(size)} Mio, {row['state']})")
     return freed, count
 
 
@@ -137,43 +157,141 @@ def clean_originals(db: sqlite3.Connection) -> tuple[int, int]:
     return freed, count
 
 
-def clean_renders_excedentaires(db: sqlite3.Connection,
-                                avance: int = 12) -> tuple[int, int]:
+def clean_renders_excedentaires(db: sqlite3.Connection, avance: int = 12,
+                                budget: int = AVANCE_BUDGET) -> tuple[int, int]:
     """Rendus des vidéos ENCORE EN ATTENTE, au-delà de la réserve utile.
 
-    Un rendu est entièrement reproductible : il se refait depuis l'extrait en
-    quelques minutes. En garder cent quarante-cinq d'avance quand on publie six
-    fois par jour immobilise plusieurs gigaoctets pour rien — c'est ce qui a
-    rempli le disque à 100 % le 29/07. On conserve donc les plus récents, qui
-    sortiront les premiers, et on efface le reste.
+    Un rendu est entièrement reproductible : il se refait depuis l'extrait,
+    ou se recopie depuis le volume froid s'il y est (même empreinte au
+    manifeste `render_cache`, voir vortex/render.py). En garder cent
+    quarante-cinq d'avance quand on publie six fois par jour immobilise
+    plusieurs gigaoctets pour rien — c'est ce qui a rempli le disque à 100 %
+    le 29/07.
+
+    Les `avance` plus récents, qui sortiront les premiers, ne sont jamais
+    touchés. Au-delà, on ramène le volume sous `budget` en effaçant d'abord
+    ce qui se refait le moins cher : les rendus qui ont une copie froide
+    (une simple recopie), puis le plus petit coût d'encodage par octet
+    libéré (`cout_s` du manifeste). Un rendu absent du manifeste, d'avant le
+    cache, prend le coût moyen.
+
+    Chaque nouvelle clé rendue vers le même export ajoute une ligne au
+    manifeste sous le même chemin : seule la dernière écrite (`used_at`)
+    décrit le fichier présent, et sa copie froide le seul contenu à jour.
+    Une ligne par vidéo, sans quoi la réserve compterait des lignes et non
+    des vidéos, et une taille comptée deux fois ferait trop effacer.
     """
-    lignes = db.execute(
-        "SELECT id, render_path FROM videos WHERE state = 'READY' "
-        "AND render_path IS NOT NULL AND render_path != '' "
-        "ORDER BY rowid DESC"
-    ).fetchall()
+    try:
+        lignes = db.execute(
+            "SELECT v.id, v.render_path, rc.froid, rc.cout_s FROM videos v "
+            "LEFT JOIN render_cache rc ON rc.cle = ("
+            "  SELECT cle FROM render_cache WHERE path = v.render_path "
+            "  ORDER BY used_at DESC, created_at DESC LIMIT 1) "
+            "WHERE v.state = 'READY' AND v.render_path IS NOT NULL "
+            "AND v.render_path != '' ORDER BY v.rowid DESC"
+        ).fetchall()
+        moyen = db.execute(
+            "SELECT AVG(cout_s) FROM render_cache WHERE cout_s > 0").fetchone()[0] or 0.0
+    except sqlite3.OperationalError:      # base d'avant le cache de rendus
+        lignes = db.execute(
+            "SELECT id, render_path, NULL AS froid, NULL AS cout_s FROM videos "
+            "WHERE state = 'READY' AND render_path IS NOT NULL AND render_path != '' "
+            "ORDER BY rowid DESC"
+        ).fetchall()
+        moyen = 0.0
 
-    freed = count = 0
-    for rang, ligne in enumerate(lignes):
-        if rang < avance:
-            continue                       # réserve : on n'y touche pas
+    candidats = []
+    for ligne in lignes[avance:]:          # réserve : on n'y touche pas
         rendu = Path(ligne["render_path"])
-        if not rendu.is_file():
+        try:
+            taille = rendu.stat().st_size
+        except OSError:
             continue
+        recopie = bool(ligne["froid"]) and Path(ligne["froid"]).is_file()
+        cout = ligne["cout_s"] if ligne["cout_s"] else moyen
+        candidats.append((not recopie, cout / max(taille, 1), taille, rendu, ligne["id"]))
+
+    cumul = sum(c[2] for c in candidats)
+    freed = count = 0
+    for _, _, taille, rendu, video_id in sorted(candidats, key=lambda c: c[:2]):
+        if cumul <= budget:
+            break
         size = _drop(rendu)
         if not rendu.exists():
+            cumul -= taille
             freed += size
             count += 1
             # Sans cet oubli en base, le pipeline croirait le rendu présent et
             # refuserait de le refaire.
-            db.execute("UPDATE videos SET render_path = NULL WHERE id = ?",
-                       (ligne["id"],))
+            db.execute("UPDATE videos SET render_path = NULL WHERE id = ?", (video_id,))
     if count:
         db.commit()
         print(f"  {count} rendu(s) d'avance effacé(s), refaits au besoin")
     return freed, count
 
 
+def clean_cache_froid(db: sqlite3.Connection) -> tuple[int, int]:
+    """Borne le volume froid des rendus en evincant ce qui se refait le moins cher.
+
+    Ordre d'eviction : copies des videos deja en ligne (elles ne resserviront
+    qu'en cas de doublon), puis le plus petit cout d'encodage par octet libere
+    — un rendu leger de deux minutes avant un rendu cinema d'un quart d'heure.
+    """
+    try:
+        lignes = db.execute(
+            "SELECT rc.cle, rc.froid, rc.taille, rc.cout_s, v.state FROM render_cache rc "
+            "LEFT JOIN videos v ON v.id = rc.video_id WHERE rc.froid IS NOT NULL"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return 0, 0                       # base d'avant le cache de rendus
+    cumul = sum(l["taille"] for l in lignes)
+    if cumul <= FROID_BUDGET:
+        return 0, 0
+    lignes = sorted(lignes, key=lambda l: (l["state"] not in DONE_STATES,
+                                           l["cout_s"] / max(l["taille"], 1)))
+    freed = count = 0
+    for ligne in lignes:
+        if cumul <= FROID_BUDGET:
+            break
+        copie = Path(ligne["froid"])
+        size = _drop(copie)
+        if not copie.exists():
+            cumul -= ligne["taille"]
+            freed += size
+            count += 1
+            db.execute("UPDATE render_cache SET froid = NULL WHERE cle = ?", (ligne["cle"],))
+    if count:
+        db.commit()
+        print(f"  {count} copie(s) froide(s) de rendu evincee(s)")
+    return freed, count
+
+
+def clean_pistes_orphelines() -> tuple[int, int]:
+    """Pistes de visages dont la video n'existe plus.
+
+    La piste note le chemin de sa video. Une piste sans ce champ est d'un
+    format anterieur : elle serait refaite a la premiere lecture, elle ne
+    vaut rien.
+    """
+    if not PISTES.is_dir():
+        return 0, 0
+    freed = count = 0
+    for fichier in PISTES.glob("*.json"):
+        try:
+            chemin = json.loads(fichier.read_text(encoding="utf-8")).get("chemin")
+        except (OSError, ValueError):
+            chemin = None                 # illisible : refaite de toute facon
+        if chemin and Path(chemin).exists():
+            continue
+        size = _drop(fichier)
+        if size:
+            freed += size
+            count += 1
+    if count:
+        print(f"  {count} piste(s) de visages orpheline(s)")
+    return freed, count
+
+
 def clean_avortes() -> tuple[int, int]:
     """Restes de telechargements ABANDONNES : .part et .ytdl.
 
@@ -259,17 +377,20 @@ def main() -> None:
         originals_freed, originals_n = clean_originals(db)
         tiktok_freed, tiktok_n = clean_tiktok(db)
         avance_freed, avance_n = clean_renders_excedentaires(db)
+        froid_freed, froid_n = clean_cache_froid(db)
     finally:
         db.close()
     avortes_freed, avortes_n = clean_avortes()
+    pistes_freed, pistes_n = clean_pistes_orphelines()
 
-    total = (exports_freed + sources_freed + originals_freed
-             + avortes_freed + tiktok_freed + avance_freed)
+    total = (exports_freed + sources_freed + originals_freed + avortes_freed
+             + tiktok_freed + avance_freed + froid_freed + pistes_freed)
     print(
         f"Libere : {_mib(total)} Mio "
         f"({exports_n} rendu(s), {sources_n} source(s), "
         f"{originals_n} original(aux), {avortes_n} avorte(s), "
-        f"{tiktok_n} de la file TikTok, {avance_n} rendu(s) d'avance)"
+        f"{tiktok_n} de la file TikTok, {avance_n} rendu(s) d'avance, "
+        f"{froid_n} copie(s) froide(s), {pistes_n} piste(s) de visages)"
     )
 
 